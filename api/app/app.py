@@ -1,11 +1,48 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.database import (
+    init_engine,
+    dispose_engine,
+    init_async_engine,
+    dispose_async_engine,
+)
+from app.email_outbox import email_outbox
+from app.embedding_backfill import embedding_backfill
+from app.message_events import message_events
+from app.passwords import password_hasher
+from app.query_metrics import QueryMetricsMiddleware
+from app.settings import settings
+from app.token_backfill import token_backfill
 from app.routers.v1 import ROUTERS as v1_routes
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """one connection pool for the life of the worker"""
+    init_engine()
+    if settings.db_async:
+        init_async_engine()
+    if settings.smtp_email_host:
+        await email_outbox.start()
+    if settings.embedding_provider:
+        await embedding_backfill.start()
+    await token_backfill.start()
+    yield
+    await token_backfill.stop()
+    await embedding_backfill.stop()
+    await email_outbox.stop()
+    await message_events.stop()
+    password_hasher.shutdown()
+    await dispose_async_engine()
+    dispose_engine()
+
+
 def create_app():
     app = FastAPI(
+        lifespan=lifespan,
         swagger_ui_parameters={"docExpansion": "none"},
         # openapi_tags=TAGS_METADATA,
         title="☯️ LangStory",
@@ -21,6 +58,7 @@ def create_app():
         allow_headers=["*"],
         allow_credentials=True,
     )
+    app.add_middleware(QueryMetricsMiddleware)
 
     for route in v1_routes:
         app.include_router(route, prefix="/v1")
@@ -1,35 +1,74 @@
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, Union
 
 import jwt
 from sqlalchemy.exc import MultipleResultsFound, NoResultFound
 
 from app.controllers.mixins.auth_mixin import AuthMixin
 from app.controllers.mixins.password_mixin import PasswordMixin
+from app.database import run_in_session
 from app.http_errors import forbidden, unauthorized
 from app.logger import get_logger
 from app.models.organization import Organization
 from app.models.user import User
+from app.passwords import password_hasher
 from app.schemas.jtw_schema import JWTBase, JWTResponse
 from app.schemas.user_schemas import ScopedUser
 from app.settings import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
 logger = get_logger(__name__)
 
 
 class AuthenticateUsernamePasswordFlow(AuthMixin, PasswordMixin):
     """authenticate the user with username and password"""
 
-    def authenticate(self, email_address: str, password: str) -> User:
-        """authenticate the user or raise an exception"""
+    def read_user(self, email_address: str) -> User:
+        """the user to check the password of, or raise an exception"""
         try:
-            user = User.read(self.db_session, email_address)
-            if self.password_context.verify(password, user.password):
-                return user
-            raise ValueError("password is incorrect")
+            return User.read(self.db_session, email_address)
         except (MultipleResultsFound, NoResultFound, ValueError) as e:
             unauthorized(e=e, message="User not found or password is incorrect")
 
+    def store_password_hash(self, user: User, password_hash: str) -> None:
+        """replace a hash made with outdated argon2 settings"""
+        # read in another session, or detached since; write through this one
+        user = self.db_session.merge(user)
+        user.password = password_hash
+        self.db_session.commit()
+
+
+async def authenticate(
+    db_session: Union["Session", "AsyncSession"], email_address: str, password: str
+) -> User:
+    """authenticate the user or raise an exception
+    the database work runs in the session, the argon2 check on the hashing pool;
+    a password hashed with outdated settings is rehashed on the way through
+    """
+
+    def _read_user(session: "Session") -> User:
+        return AuthenticateUsernamePasswordFlow(session).read_user(email_address)
+
+    user = await run_in_session(db_session, _read_user)
+    valid, new_hash = await password_hasher.verify(password, user.password)
+    if not valid:
+        unauthorized(
+            e=ValueError("password is incorrect"),
+            message="User not found or password is incorrect",
+        )
+    if new_hash:
+
+        def _store_password_hash(session: "Session") -> None:
+            flow = AuthenticateUsernamePasswordFlow(session)
+            flow.store_password_hash(user, new_hash)
+
+        logger.info("rehashing password for %s", user.id)
+        await run_in_session(db_session, _store_password_hash)
+    return user
+
 
 class JWTTokenFlow(AuthMixin):
     algorithm: str = "HS256"
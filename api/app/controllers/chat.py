@@ -1,28 +1,98 @@
-from typing import TYPE_CHECKING, List, Union, Optional
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Set,
+    Tuple,
+    Union,
+    Optional,
+)
+from uuid import UUID, uuid4
 
-from sqlalchemy import select
+from jsonschema.exceptions import SchemaError, best_match
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    bindparam,
+    case,
+    cast,
+    column,
+    false,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID as SQLUUID
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import NoResultFound, MultipleResultsFound
 
+from app.cache import TTLCache
 from app.controllers.mixins.database_mixin import DatabaseMixin
 from app.controllers.mixins.collection_mixin import CollectionMixin
 from app.controllers.project import ProjectController
-from app.http_errors import not_found
+from app.http_errors import bad_request, not_found
+from app.models.archives import ARCHIVED_CHAT_UID, ARCHIVED_MESSAGES, Archives
 from app.models.chat import Chat
-from app.models.message import Message
+from app.models.message import SEARCH_REGCONFIG, EventType, Message
+from app.models.message_embedding import MessageEmbedding
+from app.models.project import Project
+from app.models.persona import Persona
+from app.models.thread import Thread
+from app.models.tool import Tool
+from app.models.tool_call import ToolCall
 from app.schemas.chat_schemas import (
     MessageCreate,
     ChatCreate,
     ChatRead,
+    ChatTokenCount,
     ToolCallCreate,
     MessageRead,
+    MessageSearchResult,
     MessageUpdate,
+    SimilarMessage,
 )
 from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
+from app.settings import settings
+from app.tokenizers import get_tokenizer
+from app.tool_validators import get_validators
 
 if TYPE_CHECKING:
+    from sqlalchemy import ColumnElement, Values
+    from app.embeddings import EmbeddingProvider
     from app.schemas.user_schemas import ScopedUser
-    from app.models.tool_call import ToolCall
     from sqlalchemy.orm import Session
+    from sqlalchemy.sql.selectable import Select
+
+# the row version of a message: postgres gives every updated row a new xmin
+MESSAGE_ROW_VERSION = literal_column("message.xmin::text")
+# what an OpenAI style message name may contain
+TRANSCRIPT_NAME = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+@dataclass(frozen=True)
+class Transcript:
+    """a chat's rendered transcript and the (uid, row version) each entry came from"""
+
+    versions: Tuple[Tuple[UUID, str], ...] = ()
+    messages: Tuple[dict, ...] = ()
+
+
+# rendered transcripts keyed on chat uid, see MessageController.chat_transcript
+transcript_cache = TTLCache(maxsize=256)
 
 
 class ChatController(CollectionMixin, DatabaseMixin):
@@ -31,17 +101,17 @@ class ChatController(CollectionMixin, DatabaseMixin):
         super().__init__(db_session=db_session, ModelClass=Chat)
 
     def list_for_actor(self, request: "CollectionRequest") -> "CollectionResponse":
-        items, page_count = self.get_collection(request)
+        items, page_count, has_more = self.get_collection(request)
         refined_items = [
-            ChatRead(
+            ChatRead.model_construct(
                 id=item.id,
                 name=item.name,
                 project_id=item.project_id,
             )
             for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
 
     def get_chat_for_actor(self, chat_id: str, actor: "ScopedUser") -> Chat:
@@ -64,7 +134,7 @@ class ChatController(CollectionMixin, DatabaseMixin):
             creator_id=actor.id,
             editor_id=actor.id,
             project_id=project.id,
-            **chat_data.model_dump(exclude_none=True, exclude={"project_id"})
+            **chat_data.model_dump(exclude_none=True, exclude={"project_id"}),
         ).create(self.db_session)
 
     def update_chat_for_actor(self, chat_data: ChatCreate, actor: "ScopedUser") -> Chat:
@@ -79,6 +149,19 @@ class ChatController(CollectionMixin, DatabaseMixin):
         self, chat_id: str, message_data: MessageCreate, actor: "ScopedUser"
     ) -> Message:
         chat = self.get_chat_for_actor(chat_id, actor)
+        # the same reference and argument checks as a batch of one
+        tool_versions = self._check_batch_references(chat, [message_data], actor)
+        self._validate_tool_arguments(
+            [
+                self._tool_call_row(tool_call, None, actor)
+                for tool_call in [
+                    *(message_data.tool_calls_requested or []),
+                    message_data.tool_call_response,
+                ]
+                if tool_call is not None
+            ],
+            tool_versions,
+        )
 
         if message_data.type == "tool_message":
             message_data.tool_call_response = self._to_tool_call(
@@ -89,9 +172,10 @@ class ChatController(CollectionMixin, DatabaseMixin):
             chat_id=chat.id,
             creator_id=actor.id,
             editor_id=actor.id,
+            token_count=get_tokenizer().count([message_data.content])[0],
             **message_data.model_dump(
                 exclude={"tool_calls_requested"}, exclude_none=True
-            )
+            ),
         ).create(self.db_session)
 
         for tool_call in message_data.tool_calls_requested or []:
@@ -100,6 +184,203 @@ class ChatController(CollectionMixin, DatabaseMixin):
         self.db_session.refresh(message)
         return message
 
+    def add_messages(
+        self, chat_id: str, messages: List[MessageCreate], actor: "ScopedUser"
+    ) -> List[str]:
+        """insert a batch of messages in one transaction, returning ids in order
+        personas, threads and tools are checked with one query each, messages and
+        tool calls go in as multi-row INSERTs, and tool responses are linked to
+        their calls with a single executemany UPDATE
+        """
+        chat = self.get_chat_for_actor(chat_id, actor)
+        tool_versions = self._check_batch_references(chat, messages, actor)
+
+        message_rows = []
+        new_tool_calls: Dict[str, dict] = {}
+        responses: Dict[str, Tuple[UUID, ToolCallCreate]] = {}
+        token_counts = get_tokenizer().count([message.content for message in messages])
+        for message_data, token_count in zip(messages, token_counts):
+            uid = uuid4()
+            thread_uid = persona_uid = None
+            if message_data.thread_id:
+                thread_uid = Thread.to_uid(message_data.thread_id)
+            if message_data.persona_id:
+                persona_uid = Persona.to_uid(message_data.persona_id)
+            message_rows.append(
+                {
+                    "uid": uid,
+                    "_chat_uid": chat.uid,
+                    "_creator_uid": actor.uid,
+                    "_last_editor_uid": actor.uid,
+                    "type": message_data.type,
+                    "content": message_data.content,
+                    "token_count": token_count,
+                    "timestamp": message_data.timestamp,
+                    "display_name": message_data.name,
+                    "_thread_uid": thread_uid,
+                    "_user_message_persona_uid": persona_uid,
+                }
+            )
+            for tool_call in message_data.tool_calls_requested or []:
+                if tool_call is None:
+                    continue
+                new_tool_calls[str(tool_call.request_id)] = self._tool_call_row(
+                    tool_call, uid, actor
+                )
+            if response := message_data.tool_call_response:
+                responses[str(response.request_id)] = (uid, response)
+
+        # a response answers a call from this batch, an earlier call in the chat,
+        # or names the assistant message it answers so a new call can be recorded
+        existing_calls = self._get_chat_tool_calls(
+            chat, set(responses) - set(new_tool_calls)
+        )
+        linked_calls = []
+        answered_messages = set()
+        for request_id, (tool_message_uid, response) in responses.items():
+            if request_id in new_tool_calls:
+                new_tool_calls[request_id]["_tool_message_uid"] = tool_message_uid
+            elif request_id in existing_calls:
+                linked_calls.append(
+                    {
+                        "uid": existing_calls[request_id],
+                        "_tool_message_uid": tool_message_uid,
+                    }
+                )
+            elif response.assistant_message_id:
+                assistant_uid = Message.to_uid(
+                    response.assistant_message_id, prefix="assistantmessage"
+                )
+                answered_messages.add(assistant_uid)
+                new_tool_calls[request_id] = self._tool_call_row(
+                    response, assistant_uid, actor
+                ) | {"_tool_message_uid": tool_message_uid}
+            else:
+                bad_request(message=f"no tool call found for request {request_id}")
+
+        self._check_assistant_messages(chat, answered_messages)
+        self._validate_tool_arguments(new_tool_calls.values(), tool_versions)
+        if message_rows:
+            self.db_session.execute(insert(Message), message_rows)
+        if new_tool_calls:
+            self.db_session.execute(insert(ToolCall), list(new_tool_calls.values()))
+        if linked_calls:
+            self.db_session.execute(update(ToolCall), linked_calls)
+        self.db_session.commit()
+        return [f"message-{row['uid']}" for row in message_rows]
+
+    def _tool_call_row(
+        self, tool_call: ToolCallCreate, assistant_message_uid: Optional[UUID], actor
+    ) -> dict:
+        return {
+            "uid": uuid4(),
+            "request_id": str(tool_call.request_id),
+            "arguments": tool_call.parameters or {},
+            "_tool_uid": Tool.to_uid(tool_call.tool_id),
+            "_assistant_message_uid": assistant_message_uid,
+            "_tool_message_uid": None,
+            "_creator_uid": actor.uid,
+            "_last_editor_uid": actor.uid,
+        }
+
+    def _get_chat_tool_calls(
+        self, chat: Chat, request_ids: Set[str]
+    ) -> Dict[str, UUID]:
+        """tool call uids by request id for calls already recorded in this chat"""
+        if not request_ids:
+            return {}
+        query = (
+            select(ToolCall.request_id, ToolCall.uid)
+            .join(Message, ToolCall._assistant_message_uid == Message.uid)
+            .where(
+                Message._chat_uid == chat.uid,
+                ToolCall.request_id.in_(list(request_ids)),
+            )
+        )
+        return dict(self.db_session.execute(query).all())
+
+    def _check_assistant_messages(self, chat: Chat, message_uids: Set[UUID]) -> None:
+        """the assistant messages tool responses name must be in this chat"""
+        if not message_uids:
+            return
+        query = select(Message.uid).where(
+            Message.uid.in_(list(message_uids)),
+            Message._chat_uid == chat.uid,
+            Message.type == EventType.assistant_message,
+        )
+        if set(self.db_session.scalars(query)) != message_uids:
+            not_found(message="One or more assistant messages were not found")
+
+    def _check_batch_references(
+        self, chat: Chat, messages: List[MessageCreate], actor: "ScopedUser"
+    ) -> Dict[UUID, datetime]:
+        """one query per referenced model instead of one per message, returning the
+        referenced tools' versions (uid: updated_at)"""
+        persona_uids = {
+            Persona.to_uid(message.persona_id)
+            for message in messages
+            if message.persona_id
+        }
+        thread_uids = {
+            Thread.to_uid(message.thread_id)
+            for message in messages
+            if message.thread_id
+        }
+        tool_uids = {
+            Tool.to_uid(tool_call.tool_id)
+            for message in messages
+            for tool_call in [
+                *(message.tool_calls_requested or []),
+                message.tool_call_response,
+            ]
+            if tool_call is not None
+        }
+        for message in messages:
+            if message.persona_id and message.type != EventType.user_message:
+                bad_request(message="persona_id is only valid for user messages")
+        checks = (
+            (Persona, persona_uids, select(Persona.uid)),
+            (
+                Thread,
+                thread_uids,
+                select(Thread.uid).where(Thread._chat_uid == chat.uid),
+            ),
+            (Tool, tool_uids, select(Tool.uid, Tool.updated_at)),
+        )
+        tool_versions = {}
+        for ModelClass, uids, query in checks:
+            if not uids:
+                continue
+            query = ModelClass.apply_access_predicate(query, actor, ["read"]).where(
+                ModelClass.uid.in_(list(uids))
+            )
+            rows = self.db_session.execute(query).all()
+            if {row[0] for row in rows} != uids:
+                name = ModelClass.__tablename__
+                not_found(message=f"One or more {name}s were not found")
+            if ModelClass is Tool:
+                tool_versions = dict(rows)
+        return tool_versions
+
+    def _validate_tool_arguments(
+        self, tool_calls: Iterable[dict], tool_versions: Dict[UUID, datetime]
+    ) -> None:
+        """check new tool calls' arguments against their tools' schemas, compiled
+        once per tool version (see app.tool_validators)"""
+        try:
+            validators = get_validators(self.db_session, tool_versions)
+        except SchemaError as e:
+            bad_request(e=e, message=f"A tool has an invalid json schema: {e.message}")
+        for tool_call in tool_calls:
+            validator = validators[tool_call["_tool_uid"]]
+            if validator.is_valid(tool_call["arguments"]):
+                continue
+            error = best_match(validator.iter_errors(tool_call["arguments"]))
+            bad_request(
+                message=f"Invalid arguments for tool call {tool_call['request_id']}: "
+                f"{error.message}"
+            )
+
     def _to_tool_call(
         self,
         tool_call: Union[ToolCallCreate, str],
@@ -148,9 +429,10 @@ class MessageController(CollectionMixin):
         chat = ChatController(self.db_session).get_chat_for_actor(
             chat_id, request.actor
         )
-        items, page_count = self.get_collection(request, select_=chat.messages)
+        select_ = select(Message).where(Message._chat_uid == chat.uid)
+        items, page_count, has_more = self.get_collection(request, select_=select_)
         refined_items = [
-            MessageRead(
+            MessageRead.model_construct(
                 id=item.id,
                 type=item.type,
                 timestamp=item.timestamp,
@@ -160,9 +442,547 @@ class MessageController(CollectionMixin):
             )
             for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
+        )
+
+    def search_messages_for_actor(
+        self,
+        actor: "ScopedUser",
+        search: str,
+        project_id: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 10,
+    ) -> CollectionResponse:
+        """full text search over a chat's or a project's messages, best match first
+        matches come off ix_message_search_vector; snippets are only built for the
+        page returned, ts_headline re-parses the content. no page count, ranking
+        every match to total them would cost more than the page
+        """
+        query = Message.search_query(search)
+        rank = func.ts_rank_cd(Message.search_vector, query)
+        matches = select(Message.uid, rank.label("rank")).where(
+            Message.search_lookup(search), Message.deleted == False
+        )
+        if chat_id:
+            chat = ChatController(self.db_session).get_chat_for_actor(chat_id, actor)
+            matches = matches.where(Message._chat_uid == chat.uid)
+        else:
+            project_uid = self._get_project_uid_for_actor(project_id, actor)
+            matches = matches.join(Chat, Chat.uid == Message._chat_uid).where(
+                Chat._project_uid == project_uid
+            )
+        page_ = (
+            matches.order_by(rank.desc(), Message.timestamp.desc(), Message.uid)
+            .offset((page - 1) * per_page)
+            .limit(per_page + 1)
+            .subquery()
+        )
+        snippet = func.ts_headline(
+            SEARCH_REGCONFIG,
+            Message.content,
+            query,
+            "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5",
+        )
+        rows = self.db_session.execute(
+            select(Message, page_.c.rank, snippet)
+            .join(page_, page_.c.uid == Message.uid)
+            .order_by(page_.c.rank.desc(), Message.timestamp.desc(), Message.uid)
+        ).all()
+        items = [
+            MessageSearchResult.model_construct(
+                id=message.id,
+                type=message.type,
+                timestamp=message.timestamp,
+                role=message.role,
+                content=message.content,
+                chat_id=message.chat_id,
+                rank=rank_,
+                snippet=snippet_,
+            )
+            for message, rank_, snippet_ in rows[:per_page]
+        ]
+        return CollectionResponse(items=items, page=page, has_more=len(rows) > per_page)
+
+    def similar_messages_for_actor(
+        self,
+        actor: "ScopedUser",
+        project_id: str,
+        search: str,
+        provider: "EmbeddingProvider",
+        limit: int = 10,
+    ) -> CollectionResponse:
+        """the project's messages closest in meaning to the search, nearest first
+        off ix_message_embedding_hnsw, so approximate. the index is walked before
+        the project filter applies; a wider ef_search keeps enough candidates for it
+        """
+        project_uid = self._get_project_uid_for_actor(project_id, actor)
+        [vector] = provider.embed([search])
+        distance = MessageEmbedding.embedding.cosine_distance(vector)
+        query = Message.apply_access_predicate(
+            select(Message, distance.label("distance")).select_from(Message),
+            actor,
+            ["read"],
         )
+        query = (
+            query.join(MessageEmbedding, MessageEmbedding._message_uid == Message.uid)
+            .where(
+                Chat._project_uid == project_uid,
+                Message.deleted == False,
+                MessageEmbedding.model == provider.name,
+            )
+            .order_by(distance)
+            .limit(limit)
+        )
+        ef_search = min(max(limit * 10, 100), 1000)
+        self.db_session.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+        items = [
+            SimilarMessage.model_construct(
+                id=message.id,
+                type=message.type,
+                timestamp=message.timestamp,
+                role=message.role,
+                content=message.content,
+                chat_id=message.chat_id,
+                distance=distance_,
+            )
+            for message, distance_ in self.db_session.execute(query).all()
+        ]
+        return CollectionResponse(items=items, page=1, has_more=False)
+
+    def _get_project_uid_for_actor(self, project_id: str, actor: "ScopedUser") -> UUID:
+        try:
+            project_uid = Project.to_uid(project_id)
+        except ValueError as e:
+            not_found(e=e)
+        query = Project.apply_access_predicate(select(Project.uid), actor, ["read"])
+        try:
+            return self.db_session.execute(
+                query.where(Project.uid == project_uid)
+            ).scalar_one()
+        except NoResultFound as e:
+            not_found(e=e)
+
+    def export_chat_messages(
+        self, chat_uid: UUID, batch_size: int = 500
+    ) -> Iterator[dict]:
+        """every message in the chat in timestamp order, as plain dicts
+        rows come off a server-side cursor batch_size at a time; personas and tool
+        calls are fetched once per batch and the identity map is cleared after each,
+        so memory stays flat however long the chat is. access must already be checked
+        """
+        query = (
+            select(Message)
+            .where(Message._chat_uid == chat_uid, Message.deleted == False)
+            .order_by(Message.timestamp, Message.uid)
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in self.db_session.scalars(query).partitions():
+            personas, tool_calls = self._get_export_relations(batch)
+            for message in batch:
+                yield self._to_export_record(message, personas, tool_calls)
+            self.db_session.expunge_all()
+
+    def chat_history(
+        self, chat_uid: UUID, at: datetime, batch_size: int = 500
+    ) -> Iterator[dict]:
+        """the chat's messages as they stood at `at`, rebuilt from the archive and
+        shaped like export_chat_messages
+        the latest archived version of each message recorded by then comes off
+        ix_archives_message_chat with DISTINCT ON, so only this chat's history is
+        read. tool calls are never edited, so the current ones made by `at` stand in
+        for theirs. access must already be checked
+        """
+        query = self._history_query(chat_uid, at).execution_options(
+            yield_per=batch_size
+        )
+        for batch in self.db_session.scalars(query).partitions():
+            messages = [archived.restore(Message) for archived in batch]
+            personas, tool_calls = self._get_export_relations(messages, at)
+            for message in messages:
+                yield self._to_export_record(message, personas, tool_calls)
+            self.db_session.expunge_all()
+
+    def _history_query(self, chat_uid: UUID, at: datetime) -> "Select":
+        """the latest archived version of each of the chat's messages by `at`,
+        leaving out deleted ones, in timestamp order"""
+        latest = (
+            select(Archives)
+            .where(
+                ARCHIVED_MESSAGES,
+                ARCHIVED_CHAT_UID == bindparam("chat_uid", str(chat_uid)),
+                Archives.recorded_at <= at,
+            )
+            .order_by(Archives.record_id, Archives.version.desc())
+            .distinct(Archives.record_id)
+            .subquery()
+        )
+        snapshot = aliased(Archives, latest)
+        timestamp = cast(snapshot.new_values["timestamp"].astext, DateTime(True))
+        return (
+            select(snapshot)
+            .where(
+                # deleted by then, hard or soft
+                snapshot.operation != "DELETE",
+                snapshot.new_values["deleted"].as_boolean().is_not(True),
+            )
+            .order_by(timestamp, snapshot.record_id)
+        )
+
+    def chat_transcript(
+        self,
+        chat_uid: UUID,
+        max_tokens: Optional[int] = None,
+        truncate: Literal["tail", "keep_system"] = "tail",
+    ) -> List[dict]:
+        """the chat as OpenAI style chat completion messages, in timestamp order
+        rendered entries are cached per chat with the row version each came from.
+        every call reads the chat's (uid, version) list, keeps the longest cached
+        prefix that still matches and renders only the messages after it: appending
+        a message renders that one, an edit re-renders from the edit on. five
+        queries at most whatever the length; persona and tool renames show once the
+        entry expires. access must already be checked
+        Args:
+            max_tokens: cut the transcript to fit, see _fit_to_tokens
+            truncate: "tail" keeps the latest messages that fit, "keep_system" keeps
+                the system messages whatever they cost and fills the rest with the
+                latest. nothing is summarised, what doesn't fit is left out
+        """
+        rows = self.db_session.execute(
+            select(Message.uid, MESSAGE_ROW_VERSION, Message.timestamp)
+            .where(Message._chat_uid == chat_uid, Message.deleted == False)
+            .order_by(Message.timestamp, Message.uid)
+        ).all()
+        versions = [(uid, version) for uid, version, _ in rows]
+        cached = transcript_cache.get(chat_uid, Transcript())
+        reused = 0
+        for cached_version, version in zip(cached.versions, versions):
+            if cached_version != version:
+                break
+            reused += 1
+        transcript = Transcript(cached.versions[:reused], cached.messages[:reused])
+        if reused < len(versions):
+            after = None
+            if reused:
+                uid, _, timestamp = rows[reused - 1]
+                after = (timestamp, uid)
+            transcript = self._extend_transcript(transcript, chat_uid, after)
+        transcript_cache.set(chat_uid, transcript, settings.transcript_cache_ttl)
+        if max_tokens is None:
+            return list(transcript.messages)
+        kept = self._fit_to_tokens(chat_uid, max_tokens, truncate == "keep_system")
+        return [
+            message
+            for (uid, _), message in zip(transcript.versions, transcript.messages)
+            if uid in kept
+        ]
+
+    def chat_token_count(self, chat_uid: UUID) -> ChatTokenCount:
+        """the tokens the chat takes up, summed from the stored counts"""
+        tokenizer = get_tokenizer()
+        token_count, counted = self._token_counts(chat_uid)
+        query = (
+            select(func.count(), func.coalesce(func.sum(token_count), 0))
+            .select_from(Message)
+            .where(Message._chat_uid == chat_uid, Message.deleted == False)
+        )
+        if counted is not None:
+            query = query.outerjoin(counted, counted.c.uid == Message.uid)
+        message_count, token_count = self.db_session.execute(query).one()
+        return ChatTokenCount(
+            tokenizer=tokenizer.name,
+            message_count=message_count,
+            token_count=token_count + message_count * tokenizer.message_overhead,
+        )
+
+    def _fit_to_tokens(
+        self, chat_uid: UUID, max_tokens: int, pin_system: bool
+    ) -> Set[UUID]:
+        """the messages of the longest tail that fits in max_tokens
+        one query: running sums of the stored counts from the newest message back,
+        so nothing is tokenized again. pinned system messages are kept whatever
+        they cost, and the tail gets what they leave
+        """
+        token_count, counted = self._token_counts(chat_uid)
+        tokens = token_count + get_tokenizer().message_overhead
+        pinned = Message.type == EventType.system_message if pin_system else false()
+        windowed = (
+            select(
+                Message.uid,
+                pinned.label("pinned"),
+                func.sum(case((pinned, tokens), else_=0)).over().label("pinned_tokens"),
+                func.sum(case((pinned, 0), else_=tokens))
+                .over(order_by=(Message.timestamp.desc(), Message.uid.desc()))
+                .label("from_end"),
+            )
+            .select_from(Message)
+            .where(Message._chat_uid == chat_uid, Message.deleted == False)
+        )
+        if counted is not None:
+            windowed = windowed.outerjoin(counted, counted.c.uid == Message.uid)
+        windowed = windowed.subquery()
+        return set(
+            self.db_session.scalars(
+                select(windowed.c.uid).where(
+                    or_(
+                        windowed.c.pinned,
+                        windowed.c.pinned_tokens + windowed.c.from_end <= max_tokens,
+                    )
+                )
+            )
+        )
+
+    def _token_counts(
+        self, chat_uid: UUID
+    ) -> Tuple["ColumnElement", Optional["Values"]]:
+        """the chat's token counts as a column, and the VALUES to outer join for it
+        messages stored without a count (see app.token_backfill) are counted here
+        and sent along with the query; reads never write them back
+        """
+        missing = self.db_session.execute(
+            select(Message.uid, Message.content).where(
+                Message._chat_uid == chat_uid,
+                Message.deleted == False,
+                Message.token_count.is_(None),
+            )
+        ).all()
+        if not missing:
+            return Message.token_count, None
+        counts = get_tokenizer().count([content for _, content in missing])
+        counted = values(
+            column("uid", SQLUUID()), column("token_count", Integer()), name="counted"
+        ).data([(uid, count) for (uid, _), count in zip(missing, counts)])
+        return func.coalesce(Message.token_count, counted.c.token_count), counted
+
+    def _extend_transcript(
+        self,
+        transcript: Transcript,
+        chat_uid: UUID,
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> Transcript:
+        """render the chat's messages past `after`, a (timestamp, uid) position,
+        onto the end of the transcript
+        the messages and their relations are selected by chat and position, not by
+        uid, so a cold build of a long chat binds two values rather than every uid
+        """
+        in_range = select(Message).where(
+            Message._chat_uid == chat_uid, Message.deleted == False
+        )
+        if after is not None:
+            timestamp, uid = after
+            in_range = in_range.where(
+                tuple_(Message.timestamp, Message.uid)
+                > tuple_(
+                    literal(timestamp, Message.timestamp.type),
+                    literal(uid, Message.uid.type),
+                )
+            )
+        rows = self.db_session.execute(
+            in_range.add_columns(MESSAGE_ROW_VERSION).order_by(
+                Message.timestamp, Message.uid
+            )
+        ).all()
+        messages = [message for message, _ in rows]
+        personas, tool_calls = self._get_transcript_relations(in_range, messages)
+        tool_uids = {
+            tool_call._tool_uid for calls in tool_calls.values() for tool_call in calls
+        }
+        tool_names = {}
+        if tool_uids:
+            tool_names = dict(
+                self.db_session.execute(
+                    select(Tool.uid, Tool.name).where(Tool.uid.in_(tool_uids))
+                ).all()
+            )
+        return Transcript(
+            transcript.versions
+            + tuple((message.uid, version) for message, version in rows),
+            transcript.messages
+            + tuple(
+                self._to_transcript_message(message, personas, tool_calls, tool_names)
+                for message in messages
+            ),
+        )
+
+    def _to_transcript_message(
+        self,
+        message: Message,
+        personas: Dict[UUID, str],
+        tool_calls: Dict[UUID, List[ToolCall]],
+        tool_names: Dict[UUID, str],
+    ) -> dict:
+        entry = {"role": message.role.value, "content": message.content}
+        name = message.display_name
+        if not name and message.type == EventType.user_message:
+            name = personas.get(message._user_message_persona_uid)
+        related = tool_calls.get(message.uid, [])
+        match message.type:
+            case EventType.assistant_message:
+                requested = [
+                    tool_call
+                    for tool_call in related
+                    if tool_call._assistant_message_uid == message.uid
+                ]
+                if requested:
+                    entry["tool_calls"] = [
+                        {
+                            "id": tool_call.request_id,
+                            "type": "function",
+                            "function": {
+                                "name": tool_names.get(tool_call._tool_uid),
+                                "arguments": json.dumps(tool_call.arguments),
+                            },
+                        }
+                        for tool_call in requested
+                    ]
+            case EventType.tool_message:
+                name = None
+                for tool_call in related:
+                    if tool_call._tool_message_uid == message.uid:
+                        entry["tool_call_id"] = tool_call.request_id
+        if name:
+            entry["name"] = TRANSCRIPT_NAME.sub("_", name)[:64]
+        return entry
+
+    def get_records(self, message_uids: List[UUID]) -> Dict[UUID, dict]:
+        """export records for the given messages, deleted ones included, in one
+        query plus the relation lookups. access must already be checked
+        """
+        messages = self.db_session.scalars(
+            select(Message).where(Message.uid.in_(message_uids))
+        ).all()
+        personas, tool_calls = self._get_export_relations(messages)
+        return {
+            message.uid: self._to_export_record(message, personas, tool_calls)
+            for message in messages
+        }
+
+    def _get_export_relations(
+        self, messages: List[Message], at: Optional[datetime] = None
+    ) -> Tuple[Dict[UUID, str], Dict[UUID, List[ToolCall]]]:
+        """persona names and tool calls for a batch of messages, two queries
+        at: leave out tool calls made after this
+        """
+        message_uids = [message.uid for message in messages]
+        persona_uids = list(
+            {
+                message._user_message_persona_uid
+                for message in messages
+                if message._user_message_persona_uid
+            }
+        )
+        personas = {}
+        if persona_uids:
+            personas = dict(
+                self.db_session.execute(
+                    select(Persona.uid, Persona.name).where(
+                        Persona.uid.in_(persona_uids)
+                    )
+                ).all()
+            )
+        query = select(ToolCall).where(
+            or_(
+                ToolCall._assistant_message_uid.in_(message_uids),
+                ToolCall._tool_message_uid.in_(message_uids),
+            )
+        )
+        if at is not None:
+            query = query.where(ToolCall.created_at <= at)
+        return personas, self._group_tool_calls(query)
+
+    def _get_transcript_relations(
+        self, in_range: "Select", messages: List[Message]
+    ) -> Tuple[Dict[UUID, str], Dict[UUID, List[ToolCall]]]:
+        """persona names and tool calls for the messages in_range selects, two
+        queries that take it as a subquery instead of listing its uids
+        messages: what in_range returned, the persona query is skipped if none has one
+        """
+        message_uids = in_range.with_only_columns(Message.uid)
+        personas = {}
+        if any(message._user_message_persona_uid for message in messages):
+            persona_uids = in_range.with_only_columns(Message._user_message_persona_uid)
+            personas = dict(
+                self.db_session.execute(
+                    select(Persona.uid, Persona.name).where(
+                        Persona.uid.in_(persona_uids)
+                    )
+                ).all()
+            )
+        query = select(ToolCall).where(
+            or_(
+                ToolCall._assistant_message_uid.in_(message_uids),
+                ToolCall._tool_message_uid.in_(message_uids),
+            )
+        )
+        return personas, self._group_tool_calls(query)
+
+    def _group_tool_calls(self, query: "Select") -> Dict[UUID, List[ToolCall]]:
+        """the tool calls query returns, under each message they belong to"""
+        tool_calls: Dict[UUID, List[ToolCall]] = {}
+        for tool_call in self.db_session.scalars(query):
+            for message_uid in (
+                tool_call._assistant_message_uid,
+                tool_call._tool_message_uid,
+            ):
+                if message_uid:
+                    tool_calls.setdefault(message_uid, []).append(tool_call)
+        return tool_calls
+
+    def _to_export_record(
+        self,
+        message: Message,
+        personas: Dict[UUID, str],
+        tool_calls: Dict[UUID, List[ToolCall]],
+    ) -> dict:
+        persona_uid = message._user_message_persona_uid
+        thread_uid = message._thread_uid
+        name = message.display_name
+        if not name:
+            match message.type:
+                case EventType.user_message:
+                    name = personas.get(persona_uid, "User")
+                case EventType.assistant_message:
+                    name = "Assistant"
+        record = {
+            "id": message.id,
+            "chatId": message.chat_id,
+            "threadId": f"thread-{thread_uid}" if thread_uid else None,
+            "type": message.type.value,
+            "role": message.role.value,
+            "name": name,
+            "content": message.content,
+            "timestamp": message.timestamp.isoformat(),
+        }
+        related = tool_calls.get(message.uid, [])
+        match message.type:
+            case EventType.user_message:
+                record["personaId"] = f"persona-{persona_uid}" if persona_uid else None
+            case EventType.assistant_message:
+                record["toolCallsRequested"] = [
+                    self._to_export_tool_call(tool_call)
+                    for tool_call in related
+                    if tool_call._assistant_message_uid == message.uid
+                ]
+            case EventType.tool_message:
+                record["toolCallResponse"] = next(
+                    (
+                        self._to_export_tool_call(tool_call)
+                        for tool_call in related
+                        if tool_call._tool_message_uid == message.uid
+                    ),
+                    None,
+                )
+        return record
+
+    def _to_export_tool_call(self, tool_call: ToolCall) -> dict:
+        return {
+            "id": f"toolcall-{tool_call.uid}",
+            "toolId": tool_call.tool_id,
+            "requestId": tool_call.request_id,
+            "parameters": tool_call.arguments,
+            "assistantMessageId": tool_call.assistant_message_id,
+        }
 
     def update_message_for_actor(
         self, message_data: MessageUpdate, actor: "ScopedUser"
@@ -178,6 +998,8 @@ class MessageController(CollectionMixin):
             exclude_none=True, exclude=["id", "chat_id"]
         ).items():
             setattr(message, key, value)
+        if message_data.content is not None:
+            message.token_count = get_tokenizer().count([message.content])[0]
         self.db_session.add(chat)
         self.db_session.add(message)
         _ = chat.update(self.db_session)
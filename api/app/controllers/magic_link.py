@@ -1,4 +1,5 @@
-from typing import Tuple
+from functools import cache
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 from secrets import token_urlsafe
 from datetime import datetime, timezone
 from base64 import b64encode, b64decode
@@ -6,19 +7,24 @@ import binascii
 from uuid import UUID
 from pathlib import Path
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 
 
+from app.database import run_in_session
+from app.email_outbox import email_outbox
 from app.logger import get_logger
+from app.passwords import password_hasher
 from app.settings import settings
 from app.models.user import User
 from app.models.magic_link import MagicLink
+from app.models.outbound_email import OutboundEmail
 from app.controllers.mixins.auth_mixin import AuthMixin
 from app.controllers.mixins.password_mixin import PasswordMixin
 from app.http_errors import bad_request
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
 
 logger = get_logger(__name__)
 
@@ -26,8 +32,21 @@ logger = get_logger(__name__)
 class MagicLinkFlow(AuthMixin, PasswordMixin):
     """create, store, and validate magic links"""
 
-    def send_magic_link(self, email_address: str):
-        """send a magic link to the user"""
+    @classmethod
+    async def new_token(cls) -> Tuple[str, str]:
+        """a random magic link password and its hash, hashed on the password pool"""
+        raw_password = token_urlsafe(16)
+        return raw_password, await cls.password_hasher.hash(raw_password)
+
+    def send_magic_link(
+        self, email_address: str, token: Optional[Tuple[str, str]] = None
+    ):
+        """send a magic link to the user
+        Args:
+            email_address: who to send it to
+            token: (raw password, hash) from new_token; made here, on the calling
+                thread, when not given
+        """
         if not self._validate_email_settings():
             logger.error("cannot send magic link, email settings not configured")
             raise NotImplementedError("email settings are not configured")
@@ -37,18 +56,21 @@ class MagicLinkFlow(AuthMixin, PasswordMixin):
         except (NoResultFound, MultipleResultsFound):
             logger.error("user not found for email %s", email_address)
             return
-        raw_password = token_urlsafe(16)
+        if token is None:
+            raw_password = token_urlsafe(16)
+            token = raw_password, self.password_hasher.context.hash(raw_password)
+        raw_password, token_hash = token
         slug = self._make_slug(user.uid, raw_password)
         logger.debug("removing all existing magic links for user %s", user.id)
         _ = MagicLink.clear_for_user(self.db_session, user.uid)
         logger.debug("creating magic link for user %s", user.id)
         _ = MagicLink(
             _user_uid=user.uid,
-            token_hash=self.password_context.hash(raw_password),
+            token_hash=token_hash,
         ).create(self.db_session)
         logger.info("new magic link created for user %s", user.id)
         self.send_email(email_address, slug)
-        logger.info("magic link sent to %s", email_address)
+        logger.info("magic link queued for %s", email_address)
 
     def _make_slug(cls, user_uid: "UUID", raw_password: str) -> str:
         """generate a magic link slug"""
@@ -65,38 +87,18 @@ class MagicLinkFlow(AuthMixin, PasswordMixin):
             logger.error("magic link decode error: %s", e)
             raise bad_request(e=e, message="Invalid magic link")
 
-    def send_email(self, email_address: str, slug: str):
-        """send the magic link to the user"""
-        logger.info("sending magic link to %s", email_address)
-        msg = MIMEMultipart()
-        msg["From"] = settings.smtp_email_user
-        msg["To"] = email_address
-        msg["Subject"] = "Reset your LangStory password"
-        text, html = self._get_templates()
+    def send_email(self, email_address: str, slug: str) -> OutboundEmail:
+        """queue the magic link email, the outbox sends it in the background"""
+        logger.info("queueing magic link for %s", email_address)
+        text, html = _get_templates()
         link = f"{settings.canonical_url}/auth/magic-link/login/{slug}"
-        msg.attach(MIMEText(text.format(link=link), "plain"))
-        msg.attach(MIMEText(html.format(link=link), "html"))
-
-        mailserver = smtplib.SMTP(settings.smtp_email_host, settings.smtp_email_port)
-        mailserver.ehlo()
-        mailserver.starttls()
-        mailserver.ehlo()
-        try:
-            logger.debug("logging into smtp server...")
-            mailserver.login(settings.smtp_email_user, settings.smtp_email_password)
-            logger.debug("logged in. Sending email to %s...", email_address)
-            mailserver.sendmail(
-                settings.smtp_email_user, email_address, msg.as_string()
-            )
-            logger.debug("Sent.")
-        finally:
-            mailserver.quit()
-
-    def _get_templates(self) -> Tuple[str, str]:
-        templates_dir = Path(__file__).parent.parent / "templates"
-        text = (templates_dir / "magic_link.txt").read_text()
-        html = (templates_dir / "magic_link.html").read_text()
-        return text, html
+        return email_outbox.enqueue(
+            self.db_session,
+            to_address=email_address,
+            subject="Reset your LangStory password",
+            text_body=text.format(link=link),
+            html_body=html.format(link=link),
+        )
 
     def _validate_email_settings(cls) -> bool:
         """for email to work settings needs to have email creds"""
@@ -111,8 +113,9 @@ class MagicLinkFlow(AuthMixin, PasswordMixin):
                 return False
         return True
 
-    def validate_magic_link(self, slug: str) -> User:
-        """validate the magic link and return the user validated"""
+    def read_magic_link(self, slug: str) -> Tuple[MagicLink, str]:
+        """use up the magic link for the slug, returning it and the raw password to
+        check against it"""
         user_uid, raw_password = self._decode_slug(slug)
 
         try:
@@ -123,7 +126,32 @@ class MagicLinkFlow(AuthMixin, PasswordMixin):
             raise bad_request(e=e, message="Invalid magic link")
         if magic_link.is_expired:
             raise bad_request(message="Magic link expired")
-        if not self.password_context.verify(raw_password, magic_link.token_hash):
-            e = ValueError("hash from magic link does not match")
-            raise bad_request(e=e, message="Invalid magic link")
+        return magic_link, raw_password
+
+
+@cache
+def _get_templates() -> Tuple[str, str]:
+    """read once per process, not once per email"""
+    templates_dir = Path(__file__).parent.parent / "templates"
+    text = (templates_dir / "magic_link.txt").read_text()
+    html = (templates_dir / "magic_link.html").read_text()
+    return text, html
+
+
+async def validate_magic_link(
+    db_session: Union["Session", "AsyncSession"], slug: str
+) -> User:
+    """validate the magic link and return the user validated"""
+
+    def _read_magic_link(session: "Session") -> Tuple[MagicLink, str]:
+        return MagicLinkFlow(session).read_magic_link(slug)
+
+    def _user(session: "Session") -> User:
         return magic_link.user
+
+    magic_link, raw_password = await run_in_session(db_session, _read_magic_link)
+    valid, _ = await password_hasher.verify(raw_password, magic_link.token_hash)
+    if not valid:
+        e = ValueError("hash from magic link does not match")
+        raise bad_request(e=e, message="Invalid magic link")
+    return await run_in_session(db_session, _user)
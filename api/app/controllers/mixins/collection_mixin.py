@@ -1,12 +1,20 @@
-from typing import List, Optional, Tuple, Type, TYPE_CHECKING, Union
-from sqlalchemy import select, func, and_, or_
-from sqlalchemy.orm import aliased
-from sqlalchemy.orm.properties import ColumnProperty
-from shlex import split
-from dateutil import parser
+from typing import Any, Hashable, List, Optional, Tuple, Type, TYPE_CHECKING, Union
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import date, datetime
+from logging import DEBUG
+from json import dumps, loads
+from uuid import UUID
+from sqlalchemy import select, func, and_, or_, literal, tuple_, text
 
 from app.logger import get_logger
+from app.cache import TTLCache
 from app.controllers.mixins.database_mixin import DatabaseMixin
+from app.database import explain
+from app.http_errors import bad_request
+from app.power_filter import PowerFilterError, compile_filter, parse_for_model
+from app.settings import settings
+from app.schemas.collection_schemas import CollectionResponse
 
 if TYPE_CHECKING:
     from app.models.base import Base
@@ -14,15 +22,23 @@ if TYPE_CHECKING:
     from app.schemas.user_schemas import ScopedUser
     from sqlalchemy.sql.selectable import Select
     from sqlalchemy import Column
-    from app.schemas.collection_schemas import CollectionRequest, CollectionResponse
+    from app.schemas.base_schema import BaseSchema
+    from app.schemas.collection_schemas import CollectionRequest
     from sqlalchemy.orm import Session
 
 logger = get_logger(__name__)
 
+# exact totals keyed on the compiled filter and actor org, see _get_exact_count
+count_cache = TTLCache(maxsize=4096)
+
 
 class CollectionMixin(DatabaseMixin):
     """supports listing, pagination, and searching of object collections"""
 
+    # loader options (selectinload etc) applied to every page query, so controllers
+    # can declare what their read schemas touch instead of lazy loading per row
+    loader_options: Tuple = ()
+
     def __init__(self, db_session: "Session", ModelClass: Type["Base"]):
         super().__init__(db_session)
         self.ModelClass = ModelClass
@@ -36,9 +52,17 @@ class CollectionMixin(DatabaseMixin):
             self.ModelClass,
             actor=request.actor,
             select_=select_,
-            **request.model_dump(exclude_none=True, exclude=["actor"]),
+            **self._collection_args(request),
         )
 
+    @staticmethod
+    def _collection_args(request: "CollectionRequest") -> dict:
+        """the request as get_paginated_collection arguments, query is the filter"""
+        args = request.model_dump(exclude_none=True, exclude=["actor"])
+        if "query" in args:
+            args["power_filter"] = args.pop("query")
+        return args
+
     def get_paginated_collection(
         self,
         ModelClass: Type["Base"],
@@ -49,38 +73,80 @@ class CollectionMixin(DatabaseMixin):
         order_dir: Optional[str] = None,
         power_filter: Optional[str] = None,
         select_: Optional["Select"] = None,
-    ) -> Tuple[List[Type["Base"]], int]:
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        count: Optional[str] = None,
+    ) -> Tuple[List[Type["Base"]], Optional[int], bool]:
         """DEPRECATED: use get_collection, which will eventually replace this method
         select_: a pre-built select query to use instead of building a new one
+        after, before: keyset cursors from a previous response, used instead of page
+        count: how pages is computed - exact, estimated (planner) or none
+        Returns:
+            - the page of instances, the page count (None when not counted), and
+              whether more items follow the page
         """
-        # defaults post-none, as upstream may set these to None
-        page = max(
-            (
-                page or 1,
-                1,
-            )
+        query, final_query, per_page = self._build_paginated_query(
+            ModelClass,
+            actor,
+            page,
+            per_page,
+            order_by,
+            order_dir,
+            power_filter,
+            select_,
+            after,
+            before,
+        )
+        match count:
+            case "none":
+                page_count = None
+            case "estimated":
+                page_count = self._to_pages(self._get_estimated_count(query), per_page)
+            case _:
+                total = self._get_exact_count(query, actor)
+                page_count = self._to_pages(total, per_page)
+        instances, has_more = self._trim_lookahead(
+            self._get_results(final_query), per_page, before
         )
-        per_page = per_page or 25
-        order_dir = order_dir or "asc"
-        order_by = order_by or getattr(ModelClass, "__order_by_default__")
-
-        orderable = self._get_orderable(ModelClass, order_by, order_dir)
-        query = select_ if select_ is not None else select(ModelClass)
-        if hasattr(ModelClass, "deleted"):
-            query = query.where(ModelClass.deleted == False)
-        query = ModelClass.apply_access_predicate(query, actor, "read")
-
-        if power_filter:
-            query = self.apply_power_filter(ModelClass, query, power_filter)
 
-        page_count = (self._get_total_count(query) + per_page - 1) // per_page
+        return instances, page_count, has_more
 
-        final_query = (
-            query.order_by(orderable).limit(per_page).offset((page - 1) * per_page)
+    def to_collection_response(
+        self,
+        request: "CollectionRequest",
+        items: List[Type["Base"]],
+        refined_items: List["BaseSchema"],
+        page_count: Optional[int],
+        has_more: bool,
+    ) -> "CollectionResponse":
+        """wraps a page of refined items, adding keyset cursors built from the raw items
+        Args:
+            - request: the request the page was fetched for
+            - items: the model instances, in page order
+            - refined_items: the schemas returned to the caller
+            - page_count: the total number of pages, None when not counted
+            - has_more: whether items follow this page in the direction it was read
+        """
+        order_by = request.order_by or self.ModelClass.__order_by_default__
+        keyset = bool(request.after or request.before)
+        next_cursor = prev_cursor = None
+        # a before page is read backwards, so has_more is about the earlier items
+        if items and (request.before or has_more):
+            next_cursor = self._encode_cursor(items[-1], order_by)
+        if items and (
+            request.after
+            or (request.before and has_more)
+            or (not keyset and (request.page or 1) > 1)
+        ):
+            prev_cursor = self._encode_cursor(items[0], order_by)
+        return CollectionResponse(
+            items=refined_items,
+            page=None if keyset else request.page,
+            pages=page_count,
+            has_more=bool(next_cursor),
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
         )
-        instances = self._get_results(final_query)
-
-        return instances, page_count
 
     def apply_power_filter(
         self, model: Type["Base"], statement: "Select", power_filter: str
@@ -89,98 +155,219 @@ class CollectionMixin(DatabaseMixin):
         Args:
             - model: the base model that is being queried
             - statement: the sqlalchemy query object
-            - power_filter: a power query string
+            - power_filter: a power query string, see app.power_filter
         Returns:
             - a sqlalchemy query object with filters applied
         Note: If ANY of the filters are "bad" (not valid for the object) scopes 'where 1=0' to kill the query
         """
-        # break out the filter elements
-        filter_elements = split(power_filter)
-        bare_elements = []
-        groupings = []
-
-        # anything inside a grouping is searched with "and"
-        grouping_markers = self._get_grouping_markers(filter_elements)
-        if len(grouping_markers) % 2 != 0:
-            logger.error("unbalanced parenthesis in query: %s", power_filter)
+        try:
+            tree = parse_for_model(power_filter, model)
+        except PowerFilterError as e:
+            logger.error("bad power filter %s: %s", power_filter, e)
             return statement.where(False)
-        marker_pairs = self._get_marker_pairs(grouping_markers)
-
-        bare_elements, groupings = self._assemble_elements(
-            filter_elements, marker_pairs
-        )
-        logger.debug("groupings: %s", groupings)
-        logger.debug("bare_elements: %s", bare_elements)
-
-        statement_predicates = []
-        statement_predicates.append(
-            self._get_groupings_predicates(model, statement, groupings)
-        )
-        statement_predicates.append(
-            self._get_bare_predicates(model, statement, bare_elements)
-        )
-        statement = statement.where(or_(*statement_predicates))
-        logger.debug("final arguments: %s", statement.compile().params)
-        logger.debug("final statement: %s", statement)
+        if not tree:
+            return statement
+        statement, predicate = compile_filter(tree, model, statement)
+        statement = statement.where(predicate)
+        # compiling is the expensive part, only pay for it when someone is looking
+        if logger.isEnabledFor(DEBUG):
+            logger.debug("final arguments: %s", statement.compile().params)
+            logger.debug("final statement: %s", statement)
         return statement
 
-    def build_predicate(
-        self, ModelClass: Type["Base"], statement: "Select", element: str
-    ) -> Tuple["Select", List]:
-        """constructs a filter predicate for a given element, that can be assembled into a select.where() clause
-        Args:
-            - model: the base model that is being queried
-            - statement: the sqlalchemy select query object
-            - element: a single element from a power query string
+    # private methods
+
+    def _build_paginated_query(
+        self,
+        ModelClass: Type["Base"],
+        actor: Union["ScopedUser", "User"],
+        page: int,
+        per_page: Optional[int],
+        order_by: Optional[str],
+        order_dir: Optional[str],
+        power_filter: Optional[str],
+        select_: Optional["Select"],
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Tuple["Select", "Select", int]:
+        """builds the filtered query and the page query
+        Note: with a cursor the page query seeks on (order_by, uid) instead of using
+        OFFSET, so deep pages cost the same as the first. The page query reads one
+        lookahead row, and `before` pages come back reversed; _trim_lookahead fixes
+        both.
         Returns:
-            - The modified select (with needed joins etc) and list of sqlalchemy filter predicates to be assembed into a WHERE clause
+            - the filtered query (for counting), the ordered page query, and per_page
         """
-        try:
-            attribute, operator, value = self._get_core_components(element)
-        except ValueError as e:
-            return statement.where(False), []
+        # defaults post-none, as upstream may set these to None
+        page = max(
+            (
+                page or 1,
+                1,
+            )
+        )
+        per_page = per_page or 25
+        order_dir = order_dir or "asc"
+        order_by = order_by or getattr(ModelClass, "__order_by_default__")
 
-        value = self._set_wildcards(value)
-        try:
-            value = self._cast_timestamps(attribute, value)
-        except parser._parser.ParserError:
-            return statement.where(False), []
-
-        if self._attempted_to_search_secrets(attribute):
-            return statement.where(False), []
-
-        predicates = []
-        col = getattr(ModelClass, attribute, None)
-        if not col:
-            logger.error("bad filter attribute: %s", attribute)
-            return statement.where(False), []
-
-        if self._column_is_native_to_model(col):
-            modifier = getattr(col, operator)(value)
-            predicates.append(modifier)
-            return statement, predicates
-        try:
-            target_class = aliased(col.property.mapper.class_)
-            statement = self._apply_related_object_predicate(
-                target_class, attribute, ModelClass, statement
+        if after and before:
+            bad_request(message="only one of after or before can be used at a time")
+        query = select_ if select_ is not None else select(ModelClass)
+        if hasattr(ModelClass, "deleted"):
+            query = query.where(ModelClass.deleted == False)
+        query = ModelClass.apply_access_predicate(query, actor, "read")
+
+        if power_filter:
+            query = self.apply_power_filter(ModelClass, query, power_filter)
+
+        if before:
+            order_dir = "asc" if order_dir.lower() == "desc" else "desc"
+        # uid breaks ties so rows sharing an order_by value page deterministically
+        # and one row past the page tells us if there is more without a count
+        final_query = query.order_by(
+            self._get_orderable(ModelClass, order_by, order_dir),
+            self._get_orderable(ModelClass, "uid", order_dir),
+        ).limit(per_page + 1)
+        if self.loader_options:
+            final_query = final_query.options(*self.loader_options)
+        if cursor := after or before:
+            value, uid = self._decode_cursor(cursor, order_by)
+            final_query = final_query.where(
+                self._get_keyset_predicate(ModelClass, order_by, order_dir, value, uid)
             )
-            modifier = target_class.related_lookup(value)
-            predicates.append(modifier)
-            return statement, predicates
-        except (ValueError, AttributeError) as e:
-            logger.error("bad filter attribute: %s : %s", attribute, e)
-            return statement.where(False), []
+        else:
+            final_query = final_query.offset((page - 1) * per_page)
+        return query, final_query, per_page
 
-    # private methods
+    def _get_keyset_predicate(
+        self,
+        ModelClass: Type["Base"],
+        order_by: str,
+        order_dir: str,
+        value: Any,
+        uid: UUID,
+    ):
+        """rows strictly past the cursor position in the direction of travel
+        Note: NULLs sort last ascending and first descending (see _get_orderable).
+        A row comparison against NULL is NULL, so on nullable columns they are
+        matched on their own rather than silently dropped.
+        """
+        column = getattr(ModelClass, order_by)
+        descending = order_dir.lower() == "desc"
+        uid_position = literal(uid, ModelClass.uid.type)
+        if value is None:
+            # within the NULLs only uid orders; descending, the rest still follow
+            past_uid = (
+                ModelClass.uid < uid_position
+                if descending
+                else ModelClass.uid > uid_position
+            )
+            among_nulls = and_(column.is_(None), past_uid)
+            return or_(among_nulls, column.is_not(None)) if descending else among_nulls
+        keys = tuple_(column, ModelClass.uid)
+        position = tuple_(literal(value, column.type), uid_position)
+        if descending:
+            return keys < position
+        if getattr(column.expression, "nullable", True):
+            return or_(keys > position, column.is_(None))
+        return keys > position
+
+    def _encode_cursor(self, item: Type["Base"], order_by: str) -> str:
+        """an opaque token for the item's position: the order_by value plus uid"""
+        value = getattr(item, order_by)
+        if isinstance(value, datetime):
+            kind, value = "datetime", value.isoformat()
+        elif isinstance(value, date):
+            kind, value = "date", value.isoformat()
+        elif isinstance(value, UUID):
+            kind, value = "uuid", str(value)
+        else:
+            kind = "value"
+        token = dumps([order_by, kind, value, str(item.uid)], default=str)
+        return urlsafe_b64encode(token.encode()).decode()
+
+    def _decode_cursor(self, cursor: str, order_by: str) -> Tuple[Any, UUID]:
+        """reverse of _encode_cursor, rejecting tokens minted for another ordering"""
+        try:
+            cursor_order_by, kind, value, uid = loads(urlsafe_b64decode(cursor))
+            match kind:
+                case "datetime":
+                    value = datetime.fromisoformat(value)
+                case "date":
+                    value = date.fromisoformat(value)
+                case "uuid":
+                    value = UUID(value)
+            uid = UUID(uid)
+        except (Base64Error, ValueError, TypeError) as e:
+            bad_request(e=e, message="invalid pagination cursor")
+        if cursor_order_by != order_by:
+            bad_request(message="pagination cursor does not match orderBy")
+        return value, uid
 
     def _get_results(self, query: "Select") -> List[Type["Base"]]:
         cursor = self.db_session.execute(query)
 
         return cursor.scalars().unique().all()
 
+    def _trim_lookahead(
+        self, instances: List[Type["Base"]], per_page: int, before: Optional[str]
+    ) -> Tuple[List[Type["Base"]], bool]:
+        """drop the lookahead row and put a before page back in order"""
+        has_more = len(instances) > per_page
+        instances = instances[:per_page]
+        if before:
+            # walked backwards from the cursor
+            instances = instances[::-1]
+        return instances, has_more
+
+    def _to_pages(self, total: int, per_page: int) -> int:
+        return (total + per_page - 1) // per_page
+
     def _get_total_count(self, query: "Select") -> int:
         return self.db_session.scalar(select(func.count()).select_from(query))
 
+    def _get_exact_count(
+        self, query: "Select", actor: Union["ScopedUser", "User"]
+    ) -> int:
+        """count(*) of the filtered query, cached for collection_count_cache_ttl"""
+        if not settings.collection_count_cache_ttl:
+            return self._get_total_count(query)
+        key = self._count_cache_key(query, actor)
+        if (total := count_cache.get(key)) is None:
+            total = self._get_total_count(query)
+            count_cache.set(key, total, settings.collection_count_cache_ttl)
+        return total
+
+    def _count_cache_key(
+        self, query: "Select", actor: Union["ScopedUser", "User"]
+    ) -> Hashable:
+        """the compiled sql and its parameters, scoped to the actor's organization"""
+        compiled = query.compile(dialect=self.db_session.get_bind().dialect)
+        org_uid = self.ModelClass.organization_uid_for(actor)
+        return (str(compiled), repr(sorted(compiled.params.items())), org_uid)
+
+    def _get_estimated_count(self, query: "Select") -> int:
+        """the planner's row estimate, so nothing is scanned to count
+        Note: an unfiltered query reads pg_class.reltuples, which is only as fresh
+        as the last ANALYZE; scoped queries are always filtered and use EXPLAIN.
+        """
+        if query.whereclause is None:
+            estimate = self.db_session.scalar(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = CAST(:name AS regclass)"
+                ),
+                {"name": self.ModelClass.__tablename__},
+            )
+            if estimate is not None and estimate >= 0:
+                return estimate
+        return self._plan_rows(self.db_session.scalar(explain(query)))
+
+    def _plan_rows(self, plan: Union[str, list]) -> int:
+        # psycopg2 decodes the json plan, asyncpg hands back the text
+        if isinstance(plan, str):
+            plan = loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
     def _get_orderable(
         self, ModelClass: Type["Base"], order_by: str, dir: str
     ) -> "Column":
@@ -195,135 +382,7 @@ class CollectionMixin(DatabaseMixin):
         orderable = getattr(ModelClass, order_by)
         if orderable is None:
             orderable = getattr(ModelClass, "__order_by_default__", "created_at")
+        # spelled out so keyset cursors can rely on them, these are postgres' defaults
         if dir.lower() == "desc":
-            orderable = orderable.desc()
-        return orderable
-
-    def _get_grouping_markers(self, filter_elements: List[str]):
-        grouping_markers = []
-        for index, element in enumerate(filter_elements):
-            if element.startswith("("):
-                filter_elements[index] = element[1:]
-                grouping_markers.append(index)
-            if element.endswith(")"):
-                filter_elements[index] = element[:-1]
-                grouping_markers.append(index)
-        return grouping_markers
-
-    def _get_marker_pairs(self, grouping_markers: List[int]):
-        marker_pairs = list(zip(grouping_markers[::2], grouping_markers[1::2]))
-        logger.debug("marker_pairs: %s", marker_pairs)
-        return marker_pairs
-
-    def _assemble_elements(
-        self, filter_elements: List, marker_pairs: List[str]
-    ) -> Tuple[List[str], List[str]]:
-        """builds the bare elements and groupings from a list of filter elements"""
-        bare_elements = []
-        groupings = []
-        for index, pair in enumerate(marker_pairs):
-            start, end = pair
-            if not groupings and start > 0:
-                bare_elements.append(filter_elements[:start])
-            groupings.append(filter_elements[start : end + 1])
-            if (index < len(marker_pairs) - 1) and marker_pairs[index + 1][0] - end > 1:
-                bare_elements.append(
-                    filter_elements[end + 1 : marker_pairs[index + 1][0]]
-                )
-            if index == len(marker_pairs) - 1:
-                bare_elements.append(filter_elements[end + 1 :])
-        if not groupings:
-            bare_elements.append(filter_elements)
-        return bare_elements, groupings
-
-    def _get_groupings_predicates(
-        self, ModelClass: Type["Base"], statement: "Select", groupings: List[str]
-    ) -> "Select":
-        for grouping in groupings:
-            grouping_predicates = []
-            for element in [e for e in grouping if e]:
-                logger.debug("building grouping predicate: %s", element)
-                statement, predicates = self.build_predicate(
-                    ModelClass, statement, element
-                )
-                grouping_predicates.extend(predicates)
-            if not predicates:
-                continue
-            return and_(*grouping_predicates)
-
-    def _get_bare_predicates(
-        self, ModelClass: Type["Base"], statement: "Select", bare_elements: List[str]
-    ) -> "Select":
-        for bare_group in bare_elements:
-            bare_group_predicates = []
-            for element in [e for e in bare_group if e]:
-                logger.debug("building bare predicate: %s", element)
-                statement, predicates = self.build_predicate(
-                    ModelClass, statement, element
-                )
-                bare_group_predicates.extend(predicates)
-                if not predicates:
-                    continue
-        return and_(*bare_group_predicates)
-
-    def _attempted_to_search_secrets(self, attribute: str) -> bool:
-        """Don't let people search by secrets"""
-        return attribute in (
-            "password",
-            "token_hash",
-        )
-
-    def _get_core_components(cls, element: str) -> Tuple[str, str, str]:
-        """parses the element and returns a tuple of attribute, operator, and value"""
-        ops = {
-            "==": "ilike",
-            "!=": "__ne__",
-            "<": "__lt__",
-            "<=": "__le__",
-            ">": "__gt__",
-            ">=": "__ge__",
-        }
-        if ":" not in element:
-            message = f"bad filter element, no colon separator: {element}"
-            logger.error(message)
-            raise ValueError(message)
-        attribute, value = element.split(":", 1)
-        operator = "ilike"
-        for operator_symbol in (
-            "<=",
-            ">=",
-            "!=",
-            "<",
-            ">",
-        ):
-            if value.startswith(operator_symbol):
-                value = value[len(operator_symbol) :]
-                operator = ops[operator_symbol]
-                return attribute, operator, value
-        raise ValueError(f"bad filter element, no recognized operator: {element}")
-
-    def _set_wildcards(cls, value: str) -> str:
-        """use a wildcard character that humans can understand, remove string wrappers"""
-        return value.replace("*", "%").replace("'", "").replace('"', "").strip()
-
-    def _cast_timestamps(cls, attribute: str, value: str) -> str:
-        """this is not the best solution for typing but works in the moment"""
-        if attribute.endswith("_at"):
-            value = parser.parse(value).date()
-
-    def _column_is_native_to_model(cls, col) -> bool:
-        return isinstance(col.property, ColumnProperty)
-
-    def _apply_related_object_predicate(
-        cls,
-        target_class,
-        attribute: str,
-        ModelClass: Type["Base"],
-        statement: "Select",
-    ) -> "Select":
-        source_id = getattr(ModelClass, f"{attribute}_id", None)
-        if not source_id:
-            message = f"There is no standard id pattern for accessing {attribute} on {ModelClass}. Please create a standard id pattern."
-            logger.error(message)
-            raise ValueError(message)
-        return statement.join(target_class, onclause=target_class._id == source_id)
+            return orderable.desc().nulls_first()
+        return orderable.asc().nulls_last()
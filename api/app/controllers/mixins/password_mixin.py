@@ -1,5 +1,5 @@
-from passlib.context import CryptContext
+from app.passwords import PasswordHasher, password_hasher
 
 
 class PasswordMixin:
-    password_context: CryptContext = CryptContext(schemes=["argon2"])
+    password_hasher: PasswordHasher = password_hasher
@@ -1,11 +1,13 @@
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 from sqlalchemy.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from app.models.project import Project
+from app.models.tool import Tool
 from app.controllers.mixins.collection_mixin import CollectionMixin
+from app.controllers.tool import ToolController
 from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
-from app.schemas.tool_schemas import ToolRead
 from app.schemas.user_schemas import ScopedUser
 from app.schemas.project_schemas import ProjectRead
 from app.http_errors import bad_request, not_found
@@ -19,30 +21,46 @@ class ProjectController(CollectionMixin):
     def __init__(self, db_session: "Session"):
         super().__init__(db_session=db_session, ModelClass=Project)
 
+    @property
+    def loader_options(self) -> Tuple:
+        """tools in one extra query for the whole page, only the columns ToolRead reads
+        built on use, building it configures the mappers and that can't happen at import
+        """
+        return (
+            selectinload(Project.tools).load_only(
+                Tool.uid,
+                Tool.name,
+                Tool.description,
+                Tool.json_schema,
+                Tool._project_uid,
+            ),
+        )
+
     def list_for_actor(self, request: "CollectionRequest") -> "CollectionResponse":
-        items, page_count = self.get_collection(request)
+        items, page_count, has_more = self.get_collection(request)
         refined_items = [
-            ProjectRead(
+            ProjectRead.model_construct(
                 id=item.id,
                 name=item.name,
-                avatarUrl=item.avatar_url,
+                avatar_url=item.avatar_url,
                 description=item.description,
-                organizationId=item.organization.id,
-                tools=[ToolRead.model_validate(tool) for tool in item.tools],
+                organization_id=item.organization_id,
+                tools=[ToolController.to_tool_read(tool) for tool in item.tools],
             )
             for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
 
     def read_for_actor(
         self, actor: ScopedUser, project_id: str
     ) -> Optional["ProjectRead"]:
-        self.db_session.merge(actor.organization)
         try:
             project_uid = Project.to_uid(project_id)
-            query = Project.apply_access_predicate(select(Project), actor, ["read"])
+            query = Project.apply_access_predicate(
+                select(Project).options(*self.loader_options), actor, ["read"]
+            )
             project = self.db_session.execute(
                 query.where(Project.uid == project_uid)
             ).scalar_one()
@@ -52,14 +70,14 @@ class ProjectController(CollectionMixin):
             message = (
                 "Project is not in the organization the actor is currently bound to"
             )
-            assert project.organization_id == actor.organization.id, message
+            assert project.organization_id == actor.organization_id, message
             return ProjectRead(
                 id=project.id,
                 name=project.name,
                 avatarUrl=project.avatar_url,
                 description=project.description,
-                organizationId=project.organization.id,
-                tools=[ToolRead.model_validate(tool) for tool in project.tools],
+                organizationId=project.organization_id,
+                tools=[ToolController.to_tool_read(tool) for tool in project.tools],
             )
         except AssertionError as e:
             bad_request(e=e, message=message)
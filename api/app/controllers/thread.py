@@ -1,6 +1,7 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Optional
 from sqlalchemy.exc import NoResultFound, MultipleResultsFound
-from sqlalchemy import select
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 
 from app.controllers.mixins.collection_mixin import CollectionMixin
@@ -15,6 +16,7 @@ from app.controllers.chat import MessageController
 
 
 if TYPE_CHECKING:
+    from uuid import UUID
     from sqlalchemy.orm import Session
     from app.schemas.user_schemas import ScopedUser
 
@@ -25,18 +27,13 @@ class ThreadController(CollectionMixin):
         super().__init__(db_session=db_session, ModelClass=Thread)
 
     def list_for_actor(self, request: "CollectionRequest") -> "CollectionResponse":
-        items, page_count = self.get_collection(request)
+        items, page_count, has_more = self.get_collection(request)
+        message_ids = self.get_message_ids([item.uid for item in items])
         refined_items = [
-            ThreadRead(
-                id=item.id,
-                name=item.name,
-                chatId=item.chat_id,
-                message_ids=[message.id for message in item.messages],
-            )
-            for item in items
+            self.to_thread_read(item, message_ids.get(item.uid, [])) for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
 
     def _get_for_actor(self, actor: "ScopedUser", thread_id: str) -> "ThreadRead":
@@ -49,34 +46,50 @@ class ThreadController(CollectionMixin):
         except (NoResultFound, MultipleResultsFound) as e:
             not_found(e=e)
 
-    def read_for_actor(self, actor: "ScopedUser", thread_id: str) -> "ThreadRead":
-        thread = self._get_for_actor(actor, thread_id)
-        return ThreadRead(
+    def get_message_ids(self, thread_uids: List["UUID"]) -> Dict["UUID", List[str]]:
+        """message ids for each thread from a single aggregate query
+        only the uid column is read, so message content is never loaded
+        """
+        if not thread_uids:
+            return {}
+        query = (
+            select(
+                Message._thread_uid,
+                func.array_agg(aggregate_order_by(Message.uid, Message.timestamp)),
+            )
+            .where(Message._thread_uid.in_(thread_uids), Message.deleted == False)
+            .group_by(Message._thread_uid)
+        )
+        return {
+            thread_uid: [f"message-{uid}" for uid in message_uids]
+            for thread_uid, message_uids in self.db_session.execute(query)
+        }
+
+    def to_thread_read(
+        self, thread: Thread, message_ids: Optional[List[str]] = None
+    ) -> "ThreadRead":
+        """message_ids are looked up when not given"""
+        if message_ids is None:
+            message_ids = self.get_message_ids([thread.uid]).get(thread.uid, [])
+        return ThreadRead.model_construct(
             id=thread.id,
             name=thread.name,
-            chatId=thread.chat_id,
-            messageIds=[message.id for message in thread.messages],
+            chat_id=thread.chat_id,
+            message_ids=message_ids,
         )
 
+    def read_for_actor(self, actor: "ScopedUser", thread_id: str) -> "ThreadRead":
+        return self.to_thread_read(self._get_for_actor(actor, thread_id))
+
     def create_for_actor(
         self, actor: "ScopedUser", thread_data: ThreadCreate
     ) -> "ThreadRead":
         thread = Thread(
             **thread_data.model_dump(exclude_none=True, exclude=["id", "message_ids"])
         ).create(self.db_session)
-        message_controller = MessageController(self.db_session)
-        current_messages = []
-        for message_id in thread_data.message_ids:
-            message = message_controller._get_for_actor(actor, message_id)
-            current_messages.append(message)
-        thread.messages = current_messages
+        self._set_messages(actor, thread, thread_data.message_ids)
         thread = thread.update(self.db_session)
-        return ThreadRead(
-            id=thread.id,
-            name=thread.name,
-            chatId=thread.chat_id,
-            messageIds=[message.id for message in thread.messages],
-        )
+        return self.to_thread_read(thread)
 
     def update_for_actor(
         self, actor: "ScopedUser", thread_id: str, thread_data: ThreadUpdate
@@ -86,25 +99,42 @@ class ThreadController(CollectionMixin):
             exclude_none=True, exclude=["id", "chat_id", "message_ids"]
         ).items():
             setattr(thread, key, value)
-        message_controller = MessageController(self.db_session)
-        current_messages = []
-        for message_id in thread_data.message_ids:
-            message = message_controller._get_for_actor(actor, message_id)
-            current_messages.append(message)
-        thread.messages = current_messages
+        self._set_messages(actor, thread, thread_data.message_ids)
         thread = thread.update(self.db_session)
-        return ThreadRead(
-            id=thread_id,
-            name=thread.name,
-            chatId=thread.chat_id,
-            messageIds=[message.id for message in thread.messages],
-        )
+        return self.to_thread_read(thread)
 
     def delete_for_actor(self, actor: "ScopedUser", thread_id: str) -> None:
         thread = self._get_for_actor(actor, thread_id)
         thread.deleted = True
         thread.update(self.db_session)
 
+    def _set_messages(
+        self, actor: "ScopedUser", thread: Thread, message_ids: List[str]
+    ) -> None:
+        """point exactly these messages at the thread with two UPDATEs
+        the collection is never loaded, and access is checked in one query
+        """
+        message_uids = list(
+            {Message.to_uid(message_id) for message_id in message_ids or []}
+        )
+        if message_uids:
+            query = Message.apply_access_predicate(
+                select(Message.uid), actor, ["read"]
+            ).where(Message.uid.in_(message_uids))
+            if set(self.db_session.scalars(query)) != set(message_uids):
+                not_found(message="One or more messages were not found")
+        self.db_session.execute(
+            update(Message)
+            .where(Message._thread_uid == thread.uid, Message.uid.not_in(message_uids))
+            .values(_thread_uid=None)
+        )
+        if message_uids:
+            self.db_session.execute(
+                update(Message)
+                .where(Message.uid.in_(message_uids))
+                .values(_thread_uid=thread.uid)
+            )
+
 
 class ThreadMessageController(CollectionMixin):
 
@@ -115,46 +145,44 @@ class ThreadMessageController(CollectionMixin):
         self, thread_id: str, request: "CollectionRequest"
     ) -> "CollectionResponse":
         select_ = select(Message).where(Message._thread_uid == Thread.to_uid(thread_id))
-        items, page_count = self.get_collection(request, select_=select_)
+        items, page_count, has_more = self.get_collection(request, select_=select_)
         refined_items = [
-            MessageRead(
+            MessageRead.model_construct(
                 id=item.id,
                 type=item.type,
                 timestamp=item.timestamp,
+                role=item.role,
                 content=item.content,
                 chat_id=item.chat_id,
             )
             for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
 
     def add_message_for_actor(
         self, thread_id: str, message_id: str, actor: "ScopedUser"
     ) -> "ThreadRead":
-        thread = ThreadController(self.db_session)._get_for_actor(actor, thread_id)
+        thread_controller = ThreadController(self.db_session)
+        thread = thread_controller._get_for_actor(actor, thread_id)
         message = MessageController(self.db_session)._get_for_actor(actor, message_id)
-        thread.messages.append(message)
-        thread.update(self.db_session)
-        return ThreadRead(
-            id=thread.id,
-            name=thread.name,
-            chatId=thread.chat_id,
-            messageIds=[message.id for message in thread.messages],
-        )
+        message._thread_uid = thread.uid
+        self.db_session.commit()
+        return thread_controller.to_thread_read(thread)
 
     def remove_message_for_actor(
         self, thread_id: str, message_id: str, actor: "ScopedUser"
     ) -> "ThreadRead":
-        thread = ThreadController(self.db_session)._get_for_actor(actor, thread_id)
-        for message in thread.messages:
-            if message.id == message_id:
-                thread.messages.remove(message)
-        thread.update(self.db_session)
-        return ThreadRead(
-            id=thread.id,
-            name=thread.name,
-            chatId=thread.chat_id,
-            messageIds=[message.id for message in thread.messages],
+        thread_controller = ThreadController(self.db_session)
+        thread = thread_controller._get_for_actor(actor, thread_id)
+        self.db_session.execute(
+            update(Message)
+            .where(
+                Message.uid == Message.to_uid(message_id),
+                Message._thread_uid == thread.uid,
+            )
+            .values(_thread_uid=None)
         )
+        self.db_session.commit()
+        return thread_controller.to_thread_read(thread)
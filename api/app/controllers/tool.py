@@ -1,13 +1,15 @@
 from typing import TYPE_CHECKING
+from jsonschema.exceptions import SchemaError
 from sqlalchemy.exc import NoResultFound, MultipleResultsFound
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 
 from app.controllers.mixins.collection_mixin import CollectionMixin
 from app.models.tool import Tool
 from app.schemas.tool_schemas import ToolRead, ToolCreate, ToolUpdate
 from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
-from app.http_errors import not_found
+from app.http_errors import bad_request, not_found
+from app.tool_validators import compile_validator, invalidate
 
 
 if TYPE_CHECKING:
@@ -21,19 +23,10 @@ class ToolController(CollectionMixin):
         super().__init__(db_session=db_session, ModelClass=Tool)
 
     def list_for_actor(self, request: "CollectionRequest") -> "CollectionResponse":
-        items, page_count = self.get_collection(request)
-        refined_items = [
-            ToolRead(
-                id=item.id,
-                name=item.name,
-                description=item.description,
-                projectId=item.project_id,
-                jsonSchema=item.json_schema,
-            )
-            for item in items
-        ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        items, page_count, has_more = self.get_collection(request)
+        refined_items = [self.to_tool_read(item) for item in items]
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
 
     def _get_for_actor(self, actor: "ScopedActor", tool_id: str) -> "ToolRead":
@@ -47,18 +40,23 @@ class ToolController(CollectionMixin):
             not_found(e=e)
 
     def read_for_actor(self, actor: "ScopedActor", tool_id: str) -> "ToolRead":
-        tool = self._get_for_actor(actor, tool_id)
-        return ToolRead(
+        return self.to_tool_read(self._get_for_actor(actor, tool_id))
+
+    @staticmethod
+    def to_tool_read(tool: Tool) -> "ToolRead":
+        """a loaded row is already valid, so skip re-validating it"""
+        return ToolRead.model_construct(
             id=tool.id,
             name=tool.name,
-            projectId=tool.project_id,
+            project_id=tool.project_id,
             description=tool.description,
-            jsonSchema=tool.json_schema,
+            json_schema=tool.json_schema,
         )
 
     def create_for_actor(
         self, actor: "ScopedActor", tool_data: ToolCreate
     ) -> "ToolRead":
+        self._check_json_schema(tool_data.json_schema)
         tool = Tool(**tool_data.model_dump(exclude_none=True)).create(self.db_session)
         self.db_session.add(tool)
         self.db_session.refresh(tool)
@@ -73,12 +71,17 @@ class ToolController(CollectionMixin):
     def update_for_actor(
         self, actor: "ScopedActor", tool_id: str, tool_data: ToolUpdate
     ) -> "ToolRead":
+        if tool_data.json_schema is not None:
+            self._check_json_schema(tool_data.json_schema)
         tool = self._get_for_actor(actor, tool_id)
         for key, value in tool_data.model_dump(
             exclude_none=True, exclude=["id", "project_id"]
         ).items():
             setattr(tool, key, value)
+        # a new version for every worker's cached validator, and none for this one
+        tool.updated_at = func.now()
         tool = tool.update(self.db_session)
+        invalidate(tool.uid)
         return ToolRead(
             id=tool_id,
             name=tool.name,
@@ -87,6 +90,14 @@ class ToolController(CollectionMixin):
             jsonSchema=tool.json_schema,
         )
 
+    @staticmethod
+    def _check_json_schema(json_schema: dict) -> None:
+        """tool calls are validated against the schema, so it has to be one"""
+        try:
+            compile_validator(json_schema)
+        except SchemaError as e:
+            bad_request(e=e, message=f"Invalid json schema: {e.message}")
+
     def delete_for_actor(self, actor: "ScopedActor", tool_id: str) -> None:
         tool = self._get_for_actor(actor, tool_id)
         tool.deleted = True
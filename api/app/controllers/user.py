@@ -1,6 +1,7 @@
 """Business logic for user related operations."""
 
-from typing import TYPE_CHECKING
+from dataclasses import replace
+from typing import TYPE_CHECKING, Optional
 
 from sqlalchemy.exc import IntegrityError
 
@@ -12,10 +13,10 @@ from app.http_errors import bad_request
 from app.models.organization import Organization
 from app.models.user import User
 from app.schemas.collection_schemas import CollectionResponse
-from app.schemas.user_schemas import UserRead
+from app.schemas.user_schemas import ScopedUser, UserRead
 
 if TYPE_CHECKING:
-    from app.schemas.user_schemas import NewUser, ScopedUser, PydanticScopedUser
+    from app.schemas.user_schemas import NewUser, PydanticScopedUser
 
 
 class CreateNewUserFlow(AuthMixin, PasswordMixin):
@@ -29,8 +30,9 @@ class CreateNewUserFlow(AuthMixin, PasswordMixin):
         self.db_session.refresh(user)
         return user
 
-    def create_user_with_username_password(self, user: "NewUser") -> User:
-        """create a new user"""
+    @staticmethod
+    def validate_new_user(user: "NewUser") -> None:
+        """raise before anything is hashed or stored"""
         if not settings.allow_new_users:
             bad_request(
                 message="Adding new users has been disabled, contact your administrator"
@@ -38,8 +40,13 @@ class CreateNewUserFlow(AuthMixin, PasswordMixin):
         if not user.password or len(user.password) < 8:
             bad_request(message="Password must be at least 8 characters long")
 
+    def create_user_with_username_password(
+        self, user: "NewUser", password_hash: str
+    ) -> User:
+        """create a new user, the password already hashed by the password pool"""
+        self.validate_new_user(user)
         user.email_address = self.standardized_email(user.email_address)
-        user.password = self.password_context.hash(user.password)
+        user.password = password_hash
         try:
             user = User(**user.model_dump(exclude_none=True)).create(self.db_session)
             user = self.add_user_to_default_org(user)
@@ -53,23 +60,29 @@ class UpdateUserFlow(AuthMixin, PasswordMixin):
     """update a user"""
 
     def update_user(
-        self, user: "ScopedUser", updates: "NewUser"
+        self,
+        user: "ScopedUser",
+        updates: "NewUser",
+        password_hash: Optional[str] = None,
     ) -> "PydanticScopedUser":
-        """set the values of a user"""
-        sql_user = User.read(self.db_session, uid=user.user.uid)
+        """set the values of a user, a new password arrives already hashed"""
+        sql_user = User.read(self.db_session, user.id)
         for key, value in updates.model_dump(
-            exclude_none=True, exclude=["uid", "id"]
+            exclude_none=True, exclude=["uid", "id", "password"]
         ).items():
-            if key == "password":
-                value = self.password_context.hash(value)
             if key == "email_address":
                 value = self.standardized_email(value)
             setattr(sql_user, key, value)
+        if password_hash:
+            sql_user.password = password_hash
         self.db_session.add(sql_user)
         self.db_session.commit()
         self.db_session.refresh(sql_user)
-        user.user = sql_user
-        return user.to_pydantic()
+        return replace(
+            ScopedUser.from_models(sql_user),
+            organization_uid=user.organization_uid,
+            organization_name=user.organization_name,
+        ).to_pydantic()
 
 
 class UserController(CollectionMixin):
@@ -80,17 +93,17 @@ class UserController(CollectionMixin):
 
     def list_for_actor(self, request):
         """list users"""
-        items, page_count = self.get_collection(request)
+        items, page_count, has_more = self.get_collection(request)
         refined_items = [
-            UserRead(
+            UserRead.model_construct(
                 id=item.id,
-                emailAddress=item.email_address,
-                firstName=item.first_name,
-                lastName=item.last_name,
-                avatarUrl=item.avatar_url,
+                email_address=item.email_address,
+                first_name=item.first_name,
+                last_name=item.last_name,
+                avatar_url=item.avatar_url,
             )
             for item in items
         ]
-        return CollectionResponse(
-            items=refined_items, page=request.page, pages=page_count
+        return self.to_collection_response(
+            request, items, refined_items, page_count, has_more
         )
@@ -0,0 +1,230 @@
+"""process-wide database engine and session lifecycle"""
+
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Any, Callable, Optional, TypeVar, Union
+
+from sqlalchemy import create_engine, event, URL
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from app.logger import get_logger
+from app.query_metrics import instrument_queries
+from app.settings import settings
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PoolMetrics:
+    """running counters for the connection pool, fed by pool events"""
+
+    connects: int = 0
+    checkouts: int = 0
+    checkins: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+_engine: Optional[Engine] = None
+_sessionmaker: Optional[sessionmaker] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+_engine_lock = Lock()
+pool_metrics = PoolMetrics()
+
+T = TypeVar("T")
+
+
+def database_url(database: Optional[str] = None, drivername: str = "postgresql") -> URL:
+    """the connection url for the configured database"""
+    return URL.create(
+        drivername=drivername,
+        host=settings.db_host,
+        port=settings.db_port,
+        username=settings.db_user,
+        password=settings.db_password,
+        database=database or settings.db_name,
+    )
+
+
+def instrument_pool(engine: Engine, metrics: Optional[PoolMetrics] = None) -> Engine:
+    """attach pool event listeners that keep the given metrics current"""
+    metrics = metrics or pool_metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(*_):
+        metrics.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(*_):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(*_):
+        metrics.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(*_):
+        metrics.invalidations += 1
+
+    return engine
+
+
+def _pool_kwargs(**kwargs) -> dict:
+    """pool arguments from settings, unless the caller brings its own pool"""
+    engine_kwargs = {}
+    if "poolclass" not in kwargs:
+        engine_kwargs = {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_pool_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+        }
+    engine_kwargs.update(kwargs)
+    return engine_kwargs
+
+
+def create_pooled_engine(database: Optional[str] = None, **kwargs) -> Engine:
+    """build an engine with a QueuePool sized from settings
+    Args:
+        database (Optional[str], optional): override the configured database name
+        kwargs: passed through to create_engine, overriding the pool settings
+    """
+    engine_kwargs = _pool_kwargs(**kwargs)
+    if "poolclass" not in kwargs:
+        engine_kwargs["poolclass"] = QueuePool
+    engine = create_engine(database_url(database), **engine_kwargs)
+    return instrument_queries(instrument_pool(engine))
+
+
+def create_pooled_async_engine(database: Optional[str] = None, **kwargs) -> AsyncEngine:
+    """the asyncpg counterpart of create_pooled_engine, sharing the pool settings"""
+    engine = create_async_engine(
+        database_url(database, drivername="postgresql+asyncpg"),
+        **_pool_kwargs(**kwargs),
+    )
+    instrument_queries(instrument_pool(engine.sync_engine))
+    return engine
+
+
+def init_engine() -> Engine:
+    """create the application-lifetime engine, once per process"""
+    global _engine, _sessionmaker
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_pooled_engine()
+            _sessionmaker = sessionmaker(bind=_engine)
+            logger.info(
+                "database pool created: size=%s overflow=%s",
+                settings.db_pool_size,
+                settings.db_pool_max_overflow,
+            )
+    return _engine
+
+
+def get_engine() -> Engine:
+    """the shared engine, created on first use if startup has not run"""
+    return _engine or init_engine()
+
+
+def get_sessionmaker() -> sessionmaker:
+    """the shared session factory bound to the application engine"""
+    if _sessionmaker is None:
+        init_engine()
+    return _sessionmaker
+
+
+def init_async_engine() -> AsyncEngine:
+    """create the application-lifetime async engine, once per process"""
+    global _async_engine, _async_sessionmaker
+    with _engine_lock:
+        if _async_engine is None:
+            _async_engine = create_pooled_async_engine()
+            _async_sessionmaker = async_sessionmaker(bind=_async_engine)
+            logger.info("async database pool created")
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """the shared async session factory bound to the asyncpg engine"""
+    if _async_sessionmaker is None:
+        init_async_engine()
+    return _async_sessionmaker
+
+
+def dispose_engine() -> None:
+    """close every pooled connection, called on shutdown"""
+    global _engine, _sessionmaker
+    with _engine_lock:
+        if _engine is not None:
+            logger.info("disposing database pool: %s", pool_status())
+            _engine.dispose()
+        _engine = None
+        _sessionmaker = None
+
+
+async def dispose_async_engine() -> None:
+    """close every pooled asyncpg connection, called on shutdown"""
+    global _async_engine, _async_sessionmaker
+    engine, _async_engine, _async_sessionmaker = _async_engine, None, None
+    if engine is not None:
+        await engine.dispose()
+
+
+class explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) for a statement, executable like any select
+    Args:
+        statement: the select to plan, with its bound parameters
+        analyze (bool): run the statement and report actual rows and timings
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: ClauseElement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element: explain, compiler, **kw) -> str:
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+def pool_status() -> dict:
+    """a snapshot of the pool for logging and diagnostics"""
+    status = pool_metrics.as_dict()
+    if _engine is not None:
+        status["pool"] = _engine.pool.status()
+    return status
+
+
+async def run_in_session(
+    db_session: Union[Session, AsyncSession],
+    fn: Callable[..., T],
+    *args: Any,
+) -> T:
+    """run sync ORM code against either kind of session without blocking the loop
+    Args:
+        db_session: the request session, sync or async depending on settings.db_async
+        fn: called as fn(session, *args) with a sync Session
+    Note: an AsyncSession runs fn through run_sync, so lazy loads and commits inside fn
+    are awaited on asyncpg; a sync Session runs fn in the threadpool as before.
+    """
+    if isinstance(db_session, AsyncSession):
+        return await db_session.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db_session, *args)
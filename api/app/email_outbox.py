@@ -0,0 +1,205 @@
+"""outbound email, queued in the database and sent by a background worker
+
+requests only insert into the outbox table, so they return without waiting on
+smtp. each worker process runs one sender that claims batches of due emails
+(SKIP LOCKED, so several workers never claim the same row), sends them over one
+kept-alive smtp connection and retries failures with exponential backoff.
+"""
+
+import asyncio
+import smtplib
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from time import monotonic
+from typing import Callable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_sessionmaker
+from app.logger import get_logger
+from app.models.outbound_email import PENDING, OutboundEmail
+from app.settings import settings
+
+logger = get_logger(__name__)
+
+
+class EmailOutbox:
+    """queue emails and send them in the background
+    Args:
+        session_factory: opens the sessions the sender works in, defaults to the
+            application sessionmaker
+        batch_size (int): emails claimed and sent per transaction
+        poll_interval (float): seconds between checks for due retries when idle
+        max_attempts (int): sends tried before an email is given up on
+        backoff (float): seconds before the first retry, doubled for each after
+        idle_timeout (float): seconds an unused smtp connection is kept open
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: int = 20,
+        poll_interval: float = 5,
+        max_attempts: int = 5,
+        backoff: float = 30,
+        idle_timeout: float = 60,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(
+        self,
+        db_session: Session,
+        to_address: str,
+        subject: str,
+        text_body: str,
+        html_body: Optional[str] = None,
+    ) -> OutboundEmail:
+        """store the email for sending and nudge the sender, commits the session"""
+        email = OutboundEmail(
+            to_address=to_address,
+            subject=subject,
+            text_body=text_body,
+            html_body=html_body,
+        ).create(db_session)
+        self.wake()
+        return email
+
+    def wake(self) -> None:
+        """have the sender look now rather than at the next poll, from any thread"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("email outbox sender started")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await run_in_threadpool(self.close)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await run_in_threadpool(self.send_batch)
+            except Exception:
+                logger.exception("email outbox batch failed")
+                sent = 0
+            if sent == self.batch_size:
+                # there is probably more waiting
+                continue
+            idle = monotonic() - self._last_used
+            if self._smtp is not None and idle > self.idle_timeout:
+                await run_in_threadpool(self.close)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def send_batch(self) -> int:
+        """claim and send the emails that are due, returning how many were claimed"""
+        session_factory = self.session_factory or get_sessionmaker()
+        with session_factory() as session:
+            emails = session.scalars(
+                select(OutboundEmail)
+                .where(
+                    PENDING, OutboundEmail.next_attempt_at <= datetime.now(timezone.utc)
+                )
+                .order_by(OutboundEmail.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            for email in emails:
+                self._attempt(email)
+            session.commit()
+            return len(emails)
+
+    def close(self) -> None:
+        """hang up the smtp connection, if there is one"""
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except smtplib.SMTPException:
+            smtp.close()
+
+    def _attempt(self, email: OutboundEmail) -> None:
+        now = datetime.now(timezone.utc)
+        email.attempts += 1
+        try:
+            self._connection().sendmail(
+                settings.smtp_email_user, email.to_address, self._render(email)
+            )
+        except (smtplib.SMTPException, OSError) as e:
+            # the connection may be the problem, the next attempt starts a new one
+            self.close()
+            email.last_error = str(e)
+            if email.attempts >= self.max_attempts:
+                logger.error("giving up on email %s: %s", email.id, e)
+                email.failed_at = now
+                return
+            delay = self.backoff * 2 ** (email.attempts - 1)
+            logger.warning("email %s failed, retrying in %ds: %s", email.id, delay, e)
+            email.next_attempt_at = now + timedelta(seconds=delay)
+            return
+        self._last_used = monotonic()
+        email.sent_at = now
+        email.last_error = None
+        logger.info("sent email %s to %s", email.id, email.to_address)
+
+    def _connection(self) -> smtplib.SMTP:
+        """the kept-alive connection, checked with a NOOP before reuse"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self.close()
+        smtp = smtplib.SMTP(settings.smtp_email_host, settings.smtp_email_port)
+        smtp.ehlo()
+        if settings.smtp_email_starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if settings.smtp_email_user and settings.smtp_email_password:
+            logger.debug("logging into smtp server...")
+            smtp.login(settings.smtp_email_user, settings.smtp_email_password)
+        self._smtp = smtp
+        return smtp
+
+    def _render(self, email: OutboundEmail) -> str:
+        msg = MIMEMultipart()
+        msg["From"] = settings.smtp_email_user
+        msg["To"] = email.to_address
+        msg["Subject"] = email.subject
+        msg.attach(MIMEText(email.text_body, "plain"))
+        if email.html_body:
+            msg.attach(MIMEText(email.html_body, "html"))
+        return msg.as_string()
+
+
+email_outbox = EmailOutbox()
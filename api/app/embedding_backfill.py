@@ -0,0 +1,150 @@
+"""embeds messages in the background, for similarity search
+
+each worker process runs one job that walks the message table in primary key
+order, a batch at a time, and embeds the messages whose embedding is missing or
+stale (edited since, or made by another provider). a pass that finds nothing to
+do costs one index range scan per batch; the job then sleeps until the next.
+"""
+
+import asyncio
+from hashlib import md5
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_sessionmaker
+from app.embeddings import EmbeddingProvider, get_embedding_provider
+from app.logger import get_logger
+from app.models.message import Message
+from app.models.message_embedding import MessageEmbedding
+from app.settings import settings
+
+logger = get_logger(__name__)
+
+
+class EmbeddingBackfill:
+    """keep MessageEmbedding up to date with the messages
+    Args:
+        session_factory: opens the sessions the job works in, defaults to the
+            application sessionmaker
+        provider (Optional[EmbeddingProvider]): defaults to the configured one
+        batch_size (Optional[int]): messages read per batch, defaults to
+            settings.embedding_batch_size
+        poll_interval (float): seconds between passes over the messages
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        provider: Optional[EmbeddingProvider] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: float = 60,
+    ):
+        self.session_factory = session_factory
+        self.provider = provider
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.poll_interval = poll_interval
+        # the last message uid looked at, None between passes
+        self._cursor: Optional[UUID] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("embedding backfill started")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                embedded = await run_in_threadpool(self.embed_batch)
+            except Exception:
+                logger.exception("embedding backfill batch failed")
+                self._cursor = None
+                embedded = 0
+            if embedded:
+                logger.info("embedded %d messages", embedded)
+            if self._cursor is None:
+                await asyncio.sleep(self.poll_interval)
+
+    def run_pass(self) -> int:
+        """embed everything missing or stale, returning how many were embedded"""
+        embedded = self.embed_batch()
+        while self._cursor is not None:
+            embedded += self.embed_batch()
+        return embedded
+
+    def embed_batch(self) -> int:
+        """look at the next batch of messages and embed the ones that need it
+        the provider is called with no connection held, remote ones may be slow
+        """
+        provider = self.provider or get_embedding_provider()
+        session_factory = self.session_factory or get_sessionmaker()
+        with session_factory() as session:
+            batch = self._read_batch(session, provider)
+        self._cursor = batch[-1][0] if len(batch) == self.batch_size else None
+        stale = [(uid, content) for uid, content, is_stale in batch if is_stale]
+        if not stale:
+            return 0
+        vectors = provider.embed([content for _, content in stale])
+        rows = [
+            dict(
+                uid=uuid4(),
+                _message_uid=uid,
+                model=provider.name,
+                content_hash=md5(content.encode()).hexdigest(),
+                embedding=vector,
+            )
+            for (uid, content), vector in zip(stale, vectors)
+        ]
+        upsert = insert(MessageEmbedding)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[MessageEmbedding._message_uid],
+            set_=dict(
+                model=upsert.excluded.model,
+                content_hash=upsert.excluded.content_hash,
+                embedding=upsert.excluded.embedding,
+                updated_at=func.now(),
+            ),
+        )
+        with session_factory() as session:
+            session.execute(upsert, rows)
+            session.commit()
+        return len(rows)
+
+    def _read_batch(
+        self, session: Session, provider: EmbeddingProvider
+    ) -> List[Tuple[UUID, str, bool]]:
+        """(uid, content, needs embedding) for the next batch_size messages"""
+        is_stale = or_(
+            MessageEmbedding.uid.is_(None),
+            MessageEmbedding.model != provider.name,
+            MessageEmbedding.content_hash != func.md5(Message.content),
+        )
+        query = (
+            select(Message.uid, Message.content, is_stale)
+            .outerjoin(MessageEmbedding, MessageEmbedding._message_uid == Message.uid)
+            .where(Message.deleted == False)
+            .order_by(Message.uid)
+            .limit(self.batch_size)
+        )
+        if self._cursor is not None:
+            query = query.where(Message.uid > self._cursor)
+        return session.execute(query).all()
+
+
+embedding_backfill = EmbeddingBackfill()
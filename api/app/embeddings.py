@@ -0,0 +1,67 @@
+"""text to vectors, for similarity search over messages
+
+a provider turns a batch of texts into EMBEDDING_DIMENSIONS sized vectors. the
+configured one (settings.embedding_provider) is looked up in EMBEDDING_PROVIDERS,
+add an entry there to plug in another. the hashing embedder needs nothing but
+python, it is what tests and offline installs use.
+"""
+
+import re
+from functools import lru_cache
+from hashlib import blake2b
+from math import sqrt
+from typing import Callable, Dict, List, Optional
+
+from app.models.message_embedding import EMBEDDING_DIMENSIONS
+from app.settings import settings
+
+WORD = re.compile(r"\w+")
+
+
+class EmbeddingProvider:
+    """embeds texts, one vector per text and in the same order
+    name is stored with every embedding, so messages embedded by another provider
+    (or another version of one) are embedded again
+    """
+
+    name: str = "base"
+    dimensions: int = EMBEDDING_DIMENSIONS
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """feature hashing of words and word pairs, deterministic and offline
+    texts sharing words land close together; it knows nothing of meaning
+    """
+
+    name = f"hashing-{EMBEDDING_DIMENSIONS}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        words = WORD.findall(text.lower())
+        pairs = [f"{first} {second}" for first, second in zip(words, words[1:])]
+        for feature in words + pairs:
+            digest = blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # the top bit picks the sign, so collisions tend to cancel out
+            vector[value % self.dimensions] += -1.0 if value >> 63 else 1.0
+        norm = sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], EmbeddingProvider]] = {
+    "hashing": HashingEmbedder,
+}
+
+
+@lru_cache
+def get_embedding_provider() -> Optional[EmbeddingProvider]:
+    """the configured provider, None when similarity search is turned off"""
+    if not settings.embedding_provider:
+        return None
+    return EMBEDDING_PROVIDERS[settings.embedding_provider]()
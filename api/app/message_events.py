@@ -0,0 +1,156 @@
+"""new and edited chat messages, pushed to subscribers as server-sent events
+
+each worker holds one LISTEN connection (asyncpg) on the channel the message
+trigger notifies. notifications for chats nobody here is watching are dropped;
+the rest are loaded once per burst and the rendered event is handed to every
+subscriber of that chat.
+"""
+
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from json import dumps, loads
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import database_url, get_sessionmaker
+from app.logger import get_logger
+from app.models.message import MESSAGE_EVENTS_CHANNEL
+
+logger = get_logger(__name__)
+
+
+class MessageEvents:
+    """fans message notifications out to per-chat subscriber queues
+    Args:
+        session_factory: opens the sessions events are loaded with, defaults to the
+            application sessionmaker
+        database (Optional[str]): override the configured database name
+        queue_size (int): events buffered per subscriber before new ones are dropped
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        database: Optional[str] = None,
+        queue_size: int = 100,
+    ):
+        self.session_factory = session_factory
+        self.database = database
+        self.queue_size = queue_size
+        self._subscribers: Dict[UUID, Set[asyncio.Queue]] = defaultdict(set)
+        self._pending: Optional[asyncio.Queue] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._pump: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, chat_uid: UUID) -> AsyncIterator[asyncio.Queue]:
+        """a queue of rendered events for the chat, None when the stream has ended"""
+        await self.start()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[chat_uid].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[chat_uid].discard(queue)
+            if not self._subscribers[chat_uid]:
+                del self._subscribers[chat_uid]
+
+    async def start(self) -> None:
+        """connect and LISTEN, once; the first subscriber calls this"""
+        async with self._lock:
+            if self._connection is not None:
+                return
+            url = database_url(self.database)
+            self._connection = await asyncpg.connect(
+                url.render_as_string(hide_password=False)
+            )
+            self._connection.add_termination_listener(self._on_terminate)
+            await self._connection.add_listener(MESSAGE_EVENTS_CHANNEL, self._on_notify)
+            self._pending = asyncio.Queue()
+            self._pump = asyncio.create_task(self._pump_events())
+            logger.info("listening for message events")
+
+    async def stop(self) -> None:
+        """close the listener and end every open stream, called on shutdown"""
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if self._pump is not None:
+                self._pump.cancel()
+                self._pump = None
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+            self._end_streams()
+
+    def _on_notify(self, connection, pid, channel: str, payload: str) -> None:
+        event = loads(payload)
+        if UUID(event["chat_uid"]) in self._subscribers:
+            self._pending.put_nowait(event)
+
+    def _on_terminate(self, connection) -> None:
+        # clients reconnect (EventSource does so itself) and the next subscriber
+        # opens a fresh listener
+        logger.warning("message event listener disconnected")
+        self._connection = None
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        self._end_streams()
+
+    def _end_streams(self) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, None)
+
+    async def _pump_events(self) -> None:
+        """one load per burst of notifications, in the order they arrived"""
+        while True:
+            events = [await self._pending.get()]
+            while not self._pending.empty():
+                events.append(self._pending.get_nowait())
+            try:
+                records = await run_in_threadpool(
+                    self._load, [UUID(event["uid"]) for event in events]
+                )
+            except Exception:
+                logger.exception("could not load %d message events", len(events))
+                continue
+            for event in events:
+                record = records.get(UUID(event["uid"]))
+                if record is None:
+                    continue
+                rendered = self._render(event, record)
+                for queue in self._subscribers.get(UUID(event["chat_uid"]), ()):
+                    self._offer(queue, rendered)
+
+    def _load(self, message_uids: List[UUID]) -> Dict[UUID, dict]:
+        # controllers need every model mapped, which app.app hasn't done yet when
+        # it imports this module
+        from app.controllers.chat import MessageController
+
+        session_factory = self.session_factory or get_sessionmaker()
+        with session_factory() as session:
+            return MessageController(session).get_records(message_uids)
+
+    def _render(self, event: dict, record: dict) -> str:
+        kind = (
+            "deleted"
+            if event["deleted"]
+            else {"insert": "created"}.get(event["op"], "updated")
+        )
+        data = dumps(record, default=str)
+        return f"id: {record['id']}\nevent: message.{kind}\ndata: {data}\n\n"
+
+    def _offer(self, queue: asyncio.Queue, event: Optional[str]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("message event subscriber is not keeping up, dropped")
+
+
+message_events = MessageEvents()
@@ -1,4 +1,5 @@
-from typing import Optional, Type
+from functools import cache
+from typing import Optional, Tuple, Type
 from uuid import UUID
 from sqlalchemy import UUID as SQLUUID, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
@@ -10,9 +11,14 @@ class MalformedIdError(Exception):
     pass
 
 
+@cache
+def _relation_names(prop: str) -> Tuple[str, str]:
+    """the id prefix and uid column name for a relation, e.g. chat -> chat, _chat_uid"""
+    return prop.replace("_", ""), f"_{prop}_uid"
+
+
 def _relation_getter(instance: "Base", prop: str) -> Optional[str]:
-    prefix = prop.replace("_", "")
-    formatted_prop = f"_{prop}_uid"
+    prefix, formatted_prop = _relation_names(prop)
     try:
         uuid_ = getattr(instance, formatted_prop)
         return f"{prefix}-{uuid_}"
@@ -21,8 +27,7 @@ def _relation_getter(instance: "Base", prop: str) -> Optional[str]:
 
 
 def _relation_setter(instance: Type["Base"], prop: str, value: str) -> None:
-    formatted_prop = f"_{prop}_uid"
-    prefix = prop.replace("_", "")
+    prefix, formatted_prop = _relation_names(prop)
     if not value:
         setattr(instance, formatted_prop, None)
         return
@@ -9,4 +9,6 @@ from app.models.persona import Persona
 from app.models.tool import Tool
 from app.models.tool_call import ToolCall
 from app.models.project import Project
+from app.models.outbound_email import OutboundEmail
+from app.models.message_embedding import MessageEmbedding
 from app.models.base import Base
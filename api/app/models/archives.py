@@ -1,24 +1,173 @@
 from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Type, TypeVar
 from uuid import UUID
 
-from sqlalchemy import Integer, UUID as SQLUUID, BOOLEAN
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    Index,
+    Integer,
+    UUID as SQLUUID,
+    event,
+    literal_column,
+    text,
+)
 from sqlalchemy.dialects.postgresql import JSONB, TEXT, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import AbsoluteBase
 
+if TYPE_CHECKING:
+    from app.models.base import Base
+
+ModelT = TypeVar("ModelT", bound="Base")
+
+# the chat an archived message belonged to (messages never move chat), and the
+# filter for message rows. literal sql rather than bound parameters, so the planner
+# can match them to ix_archives_message_chat whatever the driver
+ARCHIVED_CHAT_UID = literal_column(
+    "coalesce(archives.new_values, archives.old_values) ->> '_chat_uid'"
+)
+ARCHIVED_MESSAGES = literal_column("archives.table_name = 'message'")
+
 
 class Archives(AbsoluteBase):
-    """Reflection of table created manually by migration"""
+    """Reflection of table created manually by migration
+    append-only: every insert, update and delete of an archived table adds a row with
+    the next version for its record, the latest is the highest version
+    """
 
     __tablename__ = "archives"
+    __table_args__ = (
+        Index(
+            "ix_archives_record_version",
+            "table_name",
+            "record_id",
+            "version",
+            unique=True,
+        ),
+        Index("ix_archives_recorded_at", "recorded_at", postgresql_using="brin"),
+        # a chat's messages as of a point in time: DISTINCT ON (record_id) off this
+        Index(
+            "ix_archives_message_chat",
+            text("(coalesce(new_values, old_values) ->> '_chat_uid')"),
+            "record_id",
+            text("version DESC"),
+            postgresql_where=text("table_name = 'message'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     table_name: Mapped[str] = mapped_column(TEXT, nullable=False)
     record_type: Mapped[str] = mapped_column(TEXT, nullable=False)
     record_id: Mapped[UUID] = mapped_column(SQLUUID, nullable=False)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False)
     operation: Mapped[str] = mapped_column(TEXT, nullable=False)
     old_values: Mapped[dict] = mapped_column(JSONB, nullable=True)
     new_values: Mapped[dict] = mapped_column(JSONB, nullable=True)
-    most_recent: Mapped[bool] = mapped_column(BOOLEAN, nullable=False, default=True)
     recorded_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
+
+    def restore(self, ModelClass: Type[ModelT]) -> ModelT:
+        """the archived row as a transient instance of its model, never added to a
+        session. a deleted record is restored as it was just before the delete
+        """
+        values = self.new_values if self.new_values is not None else self.old_values
+        return ModelClass(
+            **{
+                column.key: _from_json(column, values[column.key])
+                for column in ModelClass.__table__.columns
+                if column.key in values and column.computed is None
+            }
+        )
+
+
+def _from_json(column: Column, value: Any) -> Any:
+    """undo to_jsonb for one column"""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is UUID:
+        return UUID(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if issubclass(python_type, Enum):
+        # sqlalchemy stores enums by name
+        return python_type[value]
+    return value
+
+
+# (table, record_type) of every table whose changes are archived
+ARCHIVED_TABLES = (
+    ("user", "User"),
+    ("organization", "Organization"),
+    ("chat", "Chat"),
+    ("project", "Project"),
+    ("persona", "Persona"),
+    ("tool", "Tool"),
+    ("message", "Message"),
+    ("tool_call", "ToolCall"),
+)
+
+MAKE_ARCHIVE_OF_CHANGES = """\
+CREATE OR REPLACE FUNCTION make_archive_of_changes() RETURNS TRIGGER AS $$
+  -- Expects one argument, the record_type, the model class name e.g. 'User'
+  -- Append-only: the next version comes off ix_archives_record_version.
+  -- The write holds the row lock on the record until commit, so concurrent
+  -- changes to one record take their versions in turn
+  DECLARE
+    _record_id uuid;
+    _version bigint;
+  BEGIN
+    IF TG_OP = 'DELETE' THEN
+      _record_id := OLD.uid;
+    ELSE
+      _record_id := NEW.uid;
+    END IF;
+
+    SELECT coalesce(max(version), 0) + 1 INTO _version
+    FROM archives
+    WHERE table_name = TG_TABLE_NAME AND record_id = _record_id;
+
+    INSERT INTO archives (
+      table_name, record_type, record_id, version, operation,
+      old_values, new_values, recorded_at
+    )
+    VALUES (
+      TG_TABLE_NAME, TG_ARGV[0], _record_id, _version, TG_OP,
+      CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE to_jsonb(OLD) END,
+      CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE to_jsonb(NEW) END,
+      now()
+    );
+
+    IF TG_OP = 'DELETE' THEN
+      RETURN OLD;
+    END IF;
+    RETURN NEW;
+  END;
+$$ language plpgsql;
+"""
+
+
+def archive_trigger(table: str, record_type: str) -> str:
+    return f"""\
+CREATE OR REPLACE TRIGGER trg_make_archive_of_changes_for_{table}
+AFTER INSERT OR DELETE OR UPDATE ON "{table}"
+FOR EACH ROW EXECUTE FUNCTION make_archive_of_changes('{record_type}');
+"""
+
+
+@event.listens_for(AbsoluteBase.metadata, "after_create")
+def _create_archive_triggers(target, connection, **kw):
+    """create_all (tests, fresh databases) archives like a migrated database does"""
+    tables = {table.name for table in kw.get("tables") or target.sorted_tables}
+    if connection.dialect.name != "postgresql" or "archives" not in tables:
+        return
+    connection.execute(DDL(MAKE_ARCHIVE_OF_CHANGES))
+    for table, record_type in ARCHIVED_TABLES:
+        if table in tables:
+            connection.execute(DDL(archive_trigger(table, record_type)))
@@ -33,9 +33,14 @@ class Base(AbsoluteBase):
     )
     deleted: Mapped[bool] = mapped_column(Boolean, server_default=text("FALSE"))
 
-    @property
-    def __prefix__(self) -> str:
-        return depascalize(self.__class__.__name__)
+    # id prefixes, worked out once per class as it is mapped rather than per read
+    __prefix__ = "base"
+    __uid_prefix__ = "base-"
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        cls.__prefix__ = depascalize(cls.__name__)
+        cls.__uid_prefix__ = f"{cls.__name__.lower()}-"
+        super().__init_subclass__(**kwargs)
 
     @property
     def id(self) -> Optional[str]:
@@ -81,18 +86,30 @@ class Base(AbsoluteBase):
             identifier (Union[str, UUID]): the flexible identifier to convert
             prefix (Optional[str], optional): makes it possible to set the class name and avoid circular imports
         """
-        try:
-            # a valid ID for the class was passed, or the uid was passed as a string
-            prefix = prefix or cls.__name__.lower()
-            uid = UUID(identifier.split(f"{prefix}-")[-1])
-        except AttributeError:
+        if not isinstance(identifier, str):
             # a UUID was passed
-            uid = identifier
+            return identifier
+        # a valid ID for the class was passed, or the uid was passed as a string
+        prefix = f"{prefix}-" if prefix else cls.__uid_prefix__
+        try:
+            return UUID(identifier.removeprefix(prefix))
         except ValueError as e:
             raise ValueError(
                 f"{identifier} is not a valid id for {cls.__name__}"
             ) from e
-        return uid
+
+    @staticmethod
+    def organization_uid_for(actor: Union["ScopedUser", "Base"]) -> UUID:
+        """the organization an actor is acting in
+        a ScopedUser carries it as a claim; organization-owned models (anything with
+        _organization_uid) can act for their own organization.
+        """
+        org_uid = getattr(actor, "organization_uid", None) or getattr(
+            actor, "_organization_uid", None
+        )
+        if not org_uid:
+            raise ValueError("object %s has no organization accessor", actor)
+        return org_uid
 
     @classmethod
     def apply_access_predicate(
@@ -104,11 +121,7 @@ class Base(AbsoluteBase):
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
         # by default, just check for matching organizations
-        org_uid = getattr(
-            actor, "_organization_uid", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         return query.where(cls._organization_uid == org_uid)
 
     @classmethod
@@ -1,5 +1,5 @@
 from typing import Optional, Union, List, Literal, TYPE_CHECKING
-from sqlalchemy import TEXT
+from sqlalchemy import TEXT, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import AuditedBase
@@ -15,6 +15,14 @@ if TYPE_CHECKING:
 
 class Chat(AuditedBase, ProjectMixin):
     __tablename__ = "chat"
+    __table_args__ = (
+        Index(
+            "ix_chat_project_created_at",
+            "_project_uid",
+            "created_at",
+            postgresql_where=text("NOT deleted"),
+        ),
+    )
 
     name: Mapped[str] = mapped_column(
         TEXT(), nullable=False, doc="The name of the chat"
@@ -39,9 +47,5 @@ class Chat(AuditedBase, ProjectMixin):
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
         # by default, just check for matching organizations
-        org_uid = getattr(
-            actor, "_organization_uid", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         return query.join(Project).where(Project._organization_uid == org_uid)
@@ -2,8 +2,18 @@ from typing import Optional, TYPE_CHECKING, List, Union, Literal
 from datetime import datetime
 from enum import Enum
 from uuid import UUID
-from sqlalchemy import ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as SQLUUID
+from sqlalchemy import (
+    DDL,
+    Computed,
+    ForeignKey,
+    Index,
+    Integer,
+    event,
+    func,
+    literal_column,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID as SQLUUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import AuditedBase
@@ -35,8 +45,38 @@ class MessageRole(str, Enum):
     tool = "tool"
 
 
+# the text search configuration content is indexed with, queries must use the same
+SEARCH_CONFIG = "english"
+# inlined rather than bound, a REGCONFIG bind has no literal renderer
+SEARCH_REGCONFIG = literal_column(f"'{SEARCH_CONFIG}'")
+
+
 class Message(AuditedBase, ChatMixin, ThreadMixin):
     __tablename__ = "message"
+    __table_args__ = (
+        # chat history pages and exports, in timestamp order with a uid tiebreak
+        Index(
+            "ix_message_chat_timestamp",
+            "_chat_uid",
+            "timestamp",
+            "uid",
+            postgresql_where=text("NOT deleted"),
+        ),
+        Index(
+            "ix_message_thread_timestamp",
+            "_thread_uid",
+            "timestamp",
+            postgresql_where=text("_thread_uid IS NOT NULL"),
+        ),
+        # full text search, and substring (ilike '%...%') search via pg_trgm
+        Index("ix_message_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_message_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+    )
 
     type: Mapped[EventType] = mapped_column(nullable=False, doc="The type of message")
     display_name: Mapped[Optional[str]] = mapped_column(
@@ -51,6 +91,20 @@ class Message(AuditedBase, ChatMixin, ThreadMixin):
         doc="The timestamp of the event in the chat. This is used as the chat index and controls the order in which chat messages are displayed.",
     )
 
+    token_count: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        nullable=True,
+        doc="The tokens in the content, counted when written. See app.tokenizers",
+    )
+
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', content)", persisted=True),
+        # only search reads it, everything else would just carry it around
+        deferred=True,
+        doc="The content as a text search document, maintained by postgres",
+    )
+
     # overload thread mixin to make it optional
     _thread_uid: Mapped[Optional[UUID]] = mapped_column(
         SQLUUID(), ForeignKey("thread.uid"), nullable=True
@@ -184,6 +238,16 @@ class Message(AuditedBase, ChatMixin, ThreadMixin):
     def name(self, value: str) -> None:
         self.display_name = value
 
+    @classmethod
+    def search_query(cls, search: str):
+        """the tsquery for a web-search style string: words, "quoted phrases", -not"""
+        return func.websearch_to_tsquery(SEARCH_REGCONFIG, search)
+
+    @classmethod
+    def search_lookup(cls, search: str):
+        """the power filter's search: term"""
+        return cls.search_vector.op("@@")(cls.search_query(search))
+
     @classmethod
     def apply_access_predicate(
         cls,
@@ -193,12 +257,51 @@ class Message(AuditedBase, ChatMixin, ThreadMixin):
     ) -> "Select":
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
-        org_uid = getattr(
-            actor, "_organization_uid", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         # TODO: access roles on chats goes here!
         return (
             query.join(Chat).join(Project).where(Project._organization_uid == org_uid)
         )
+
+
+# new and edited messages are announced on this channel, see app.message_events.
+# the payload is ids only: NOTIFY payloads are capped at 8000 bytes
+MESSAGE_EVENTS_CHANNEL = "message_events"
+NOTIFY_MESSAGE_CHANGE = f"""\
+CREATE OR REPLACE FUNCTION notify_message_change() RETURNS TRIGGER AS $$
+  BEGIN
+    PERFORM pg_notify(
+      '{MESSAGE_EVENTS_CHANNEL}',
+      json_build_object(
+        'op', lower(TG_OP),
+        'uid', NEW.uid,
+        'chat_uid', NEW._chat_uid,
+        'deleted', NEW.deleted
+      )::text
+    );
+    RETURN NEW;
+  END;
+$$ language plpgsql;
+"""
+NOTIFY_MESSAGE_CHANGE_TRIGGER = """\
+CREATE OR REPLACE TRIGGER trg_notify_message_change
+AFTER INSERT OR UPDATE ON "message"
+FOR EACH ROW EXECUTE FUNCTION notify_message_change();
+"""
+
+# ix_message_content_trgm needs pg_trgm; in public, so its operator classes resolve
+# whatever the search_path
+event.listen(
+    Message.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public").execute_if(
+        dialect="postgresql"
+    ),
+)
+# create_all (tests, fresh databases) gets the trigger too, migrations add it elsewhere
+for statement in (NOTIFY_MESSAGE_CHANGE, NOTIFY_MESSAGE_CHANGE_TRIGGER):
+    event.listen(
+        Message.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
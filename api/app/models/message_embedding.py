@@ -0,0 +1,62 @@
+from typing import List
+from uuid import UUID
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import DDL, ForeignKey, Index, String, event
+from sqlalchemy.dialects.postgresql import UUID as SQLUUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+# every provider embeds to this size; changing it needs a migration and a re-embed
+EMBEDDING_DIMENSIONS = 384
+
+
+class MessageEmbedding(Base):
+    """a message's content as a vector, written by app.embedding_backfill"""
+
+    __tablename__ = "message_embedding"
+    __table_args__ = (
+        Index("ix_message_embedding_message", "_message_uid", unique=True),
+        # approximate nearest neighbours by cosine distance
+        Index(
+            "ix_message_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
+    _message_uid: Mapped[UUID] = mapped_column(
+        SQLUUID(),
+        ForeignKey(
+            "message.uid",
+            name="fk_message_embedding_message_id",
+            onupdate="CASCADE",
+            ondelete="CASCADE",
+        ),
+        nullable=False,
+        doc="The message embedded",
+    )
+    model: Mapped[str] = mapped_column(
+        String, nullable=False, doc="The provider that embedded it, see app.embeddings"
+    )
+    content_hash: Mapped[str] = mapped_column(
+        String,
+        nullable=False,
+        doc="md5 of the content embedded, edited messages are embedded again",
+    )
+    embedding: Mapped[List[float]] = mapped_column(
+        Vector(EMBEDDING_DIMENSIONS), nullable=False
+    )
+
+
+# the vector type lives in public, so it resolves whatever the search_path
+event.listen(
+    MessageEmbedding.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS vector WITH SCHEMA public").execute_if(
+        dialect="postgresql"
+    ),
+)
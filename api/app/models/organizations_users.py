@@ -1,5 +1,5 @@
 from uuid import UUID
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID as SQLUUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -11,3 +11,7 @@ class OrganizationsUsers(UserMixin, OrganizationMixin, Base):
     """associates users with organizations"""
 
     __tablename__ = "organizations_users"
+    __table_args__ = (
+        Index("ix_organizations_users_organization", "_organization_uid"),
+        Index("ix_organizations_users_user", "_user_uid"),
+    )
@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+# waiting to be sent: not sent, not given up on
+PENDING = text("sent_at IS NULL AND failed_at IS NULL")
+
+
+class OutboundEmail(Base):
+    """an email waiting in (or sent from) the outbox, see app.email_outbox"""
+
+    __tablename__ = "outbound_email"
+    __table_args__ = (
+        Index("ix_outbound_email_pending", "next_attempt_at", postgresql_where=PENDING),
+    )
+
+    to_address: Mapped[str] = mapped_column(String, doc="The recipient")
+    subject: Mapped[str] = mapped_column(String, doc="The subject line")
+    text_body: Mapped[str] = mapped_column(Text, doc="The plain text part")
+    html_body: Mapped[Optional[str]] = mapped_column(
+        Text, default=None, doc="The html part, if any"
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer, default=0, doc="How many times sending has been tried"
+    )
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        doc="The earliest the next send may be tried",
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(
+        String, default=None, doc="Why the last attempt failed"
+    )
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), default=None, doc="When the email was accepted"
+    )
+    failed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), default=None, doc="When sending was given up on"
+    )
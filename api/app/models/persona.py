@@ -1,6 +1,6 @@
 from typing import Optional, TYPE_CHECKING
 from pydantic import HttpUrl
-from sqlalchemy import String
+from sqlalchemy import Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -12,6 +12,13 @@ if TYPE_CHECKING:
 
 class Persona(OrganizationMixin, Base):
     __tablename__ = "persona"
+    __table_args__ = (
+        Index(
+            "ix_persona_organization",
+            "_organization_uid",
+            postgresql_where=text("NOT deleted"),
+        ),
+    )
 
     name: Mapped[str] = mapped_column(nullable=False, doc="The name of the persona")
     description: Mapped[Optional[str]] = mapped_column(
@@ -1,6 +1,6 @@
 from typing import Optional, TYPE_CHECKING, List
 
-from sqlalchemy import String
+from sqlalchemy import Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models._mixins import OrganizationMixin
@@ -14,6 +14,14 @@ if TYPE_CHECKING:
 
 class Project(OrganizationMixin, AuditedBase):
     __tablename__ = "project"
+    __table_args__ = (
+        Index(
+            "ix_project_organization_created_at",
+            "_organization_uid",
+            "created_at",
+            postgresql_where=text("NOT deleted"),
+        ),
+    )
 
     name: Mapped[str] = mapped_column(
         String, nullable=False, doc="The name of the project"
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING, List, Any, Union, Literal
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String
+from sqlalchemy import Index, String, text
 
 
 from app.models.base import Base
@@ -17,14 +17,18 @@ if TYPE_CHECKING:
 
 class Thread(ChatMixin, Base):
     __tablename__ = "thread"
+    __table_args__ = (
+        Index("ix_thread_chat", "_chat_uid", postgresql_where=text("NOT deleted")),
+    )
 
     name: Mapped[str] = mapped_column(
         String, nullable=False, doc="The name of the thread"
     )
 
     # relationships
+    # not eager: thread endpoints only need message ids, see ThreadController
     messages: Mapped[List["Message"]] = relationship(
-        "Message", back_populates="thread", lazy="selectin"
+        "Message", back_populates="thread", lazy="select"
     )
 
     @classmethod
@@ -37,11 +41,7 @@ class Thread(ChatMixin, Base):
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
         # by default, just check for matching organizations
-        org_uid = getattr(
-            actor, "_organization_uid", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         return (
             query.join(Chat).join(Project).where(Project._organization_uid == org_uid)
         )
@@ -1,5 +1,5 @@
 from typing import Optional, List, Literal, Union, Any
-from sqlalchemy import String
+from sqlalchemy import Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -12,6 +12,9 @@ class Tool(ProjectMixin, Base):
     """The callable function as presented to the LLM"""
 
     __tablename__ = "tool"
+    __table_args__ = (
+        Index("ix_tool_project", "_project_uid", postgresql_where=text("NOT deleted")),
+    )
 
     name: Mapped[str] = mapped_column(String, doc="The name of the tool to be called")
     json_schema: Mapped[dict] = mapped_column(
@@ -34,11 +37,7 @@ class Tool(ProjectMixin, Base):
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
         # by default, just check for matching organizations
-        org_uid = getattr(
-            actor, "_organization_uid", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         return query.join(Project).where(Project._organization_uid == org_uid)
 
     @classmethod
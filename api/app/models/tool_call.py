@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING, Optional
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Index, String, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID as SQLUUID
 from uuid import UUID
 
@@ -16,6 +16,14 @@ class ToolCall(AuditedBase, ToolMixin):
     """A called instance of a tool"""
 
     __tablename__ = "tool_call"
+    __table_args__ = (
+        Index("ix_tool_call_assistant_message", "_assistant_message_uid"),
+        Index(
+            "ix_tool_call_tool_message",
+            "_tool_message_uid",
+            postgresql_where=text("_tool_message_uid IS NOT NULL"),
+        ),
+    )
 
     request_id: Mapped[str] = mapped_column(
         String, nullable=False, doc="a unique identifier to link calls to responses"
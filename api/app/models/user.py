@@ -59,11 +59,7 @@ class User(Base):
         """applies a WHERE clause restricting results to the given actor and access level"""
         del access  # not used by default, will be used for more complex access control
         # by default, just check for matching organizations
-        org_uid = getattr(
-            actor, "organization_id", getattr(actor.organization, "uid", None)
-        )
-        if not org_uid:
-            raise ValueError("object %s has no organization accessor", actor)
+        org_uid = cls.organization_uid_for(actor)
         query = query.join(OrganizationsUsers).where(
             OrganizationsUsers._organization_uid == org_uid
         )
@@ -0,0 +1,127 @@
+"""argon2 hashing and verification, off the request threadpool
+
+argon2 is slow and memory hungry on purpose, so a burst of logins hashing on
+starlette's shared threadpool starves every other endpoint. hashes run on a small
+pool of their own instead and callers await them. argon2-cffi releases the GIL, so
+threads hash in parallel without the memory cost of extra processes.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from app.logger import get_logger
+from app.settings import settings
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class HashPoolMetrics:
+    """running counters for the hashing pool"""
+
+    submitted: int = 0
+    started: int = 0
+    completed: int = 0
+    rehashed: int = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """hashes waiting for a thread"""
+        return self.submitted - self.started
+
+    @property
+    def running(self) -> int:
+        return self.started - self.completed
+
+    def as_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "queue_depth": self.queue_depth,
+            "running": self.running,
+        }
+
+
+class PasswordHasher:
+    """argon2 on a bounded thread pool
+    Args:
+        workers (int): threads hashing at once, further hashes queue behind them
+        time_cost, memory_cost, parallelism: argon2 parameters for new hashes;
+            stored hashes made with others are replaced on the next verify
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        time_cost: Optional[int] = None,
+        memory_cost: Optional[int] = None,
+        parallelism: Optional[int] = None,
+    ):
+        self.workers = workers or settings.password_hash_workers
+        self.context = CryptContext(
+            schemes=["argon2"],
+            argon2__time_cost=time_cost or settings.argon2_time_cost,
+            argon2__memory_cost=memory_cost or settings.argon2_memory_cost,
+            argon2__parallelism=parallelism or settings.argon2_parallelism,
+        )
+        self.metrics = HashPoolMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+
+    async def hash(self, secret: str) -> str:
+        return await self._run(self.context.hash, secret)
+
+    async def verify(
+        self, secret: str, hashed: Optional[str]
+    ) -> Tuple[bool, Optional[str]]:
+        """whether the secret matches, and its new hash if the stored one is stale"""
+        if not hashed:
+            return False, None
+        valid, new_hash = await self._run(
+            self.context.verify_and_update, secret, hashed
+        )
+        if new_hash:
+            with self._lock:
+                self.metrics.rehashed += 1
+        return valid, new_hash
+
+    def status(self) -> dict:
+        return {"workers": self.workers, **self.metrics.as_dict()}
+
+    def shutdown(self) -> None:
+        """stop the pool, hashes already queued still finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            logger.info("stopping password hashing pool: %s", self.status())
+            executor.shutdown(wait=True)
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="argon2"
+                )
+            self.metrics.submitted += 1
+            executor = self._executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(self._counted, fn, *args))
+
+    def _counted(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            self.metrics.started += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.metrics.completed += 1
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,212 @@
+"""the power query language used to search collections
+
+    name:bob* created_at:>2024-01-01 (status:active owner:alice)
+    search:"refund request" type:user_message
+
+terms at the same level are and-ed together and each parenthesised group is an
+alternative to them, so the example reads
+(name ilike bob% and created_at > 2024-01-01) or (status ilike active and owner ...).
+search: is full text search on models that have it (Model.search_lookup), the
+value read like a web search box. parsing is cached per query string and model;
+compiling to sql is cheap.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from shlex import shlex
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Type
+
+from dateutil import parser
+from sqlalchemy import Date, and_, cast, inspect, or_
+from sqlalchemy.orm import aliased
+
+if TYPE_CHECKING:
+    from sqlalchemy import ColumnElement
+    from sqlalchemy.sql.selectable import Select
+    from app.models.base import Base
+
+# longest first, so "<=" is not read as "<"
+OPERATORS = (
+    ("<=", "__le__"),
+    (">=", "__ge__"),
+    ("!=", "__ne__"),
+    ("==", "ilike"),
+    ("<", "__lt__"),
+    (">", "__gt__"),
+)
+DEFAULT_OPERATOR = "ilike"
+# never searchable, whatever the model
+SECRET_ATTRIBUTES = ("password", "token_hash")
+# full text search rather than an attribute
+SEARCH_ATTRIBUTE = "search"
+
+
+class PowerFilterError(ValueError):
+    """the query can't be parsed, or doesn't fit the model"""
+
+
+@dataclass(frozen=True)
+class Term:
+    attribute: str
+    operator: str
+    value: Any
+    related: bool = False
+
+
+@dataclass(frozen=True)
+class Group:
+    terms: Tuple[Term, ...] = ()
+    groups: Tuple["Group", ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.terms or self.groups)
+
+
+def tokenize(power_filter: str) -> List[str]:
+    """whitespace separated, quotes respected, every paren its own token"""
+    lexer = shlex(power_filter, posix=True, punctuation_chars="()")
+    lexer.whitespace_split = True
+    tokens = []
+    try:
+        for token in lexer:
+            # runs of punctuation come back together, e.g. "(("
+            if set(token) <= {"(", ")"}:
+                tokens.extend(token)
+            else:
+                tokens.append(token)
+    except ValueError as e:
+        raise PowerFilterError(f"bad query: {e}") from e
+    return tokens
+
+
+@lru_cache(maxsize=1024)
+def parse(power_filter: str) -> Group:
+    """the query as a tree of raw terms, independent of any model"""
+    stack: List[Tuple[List[Term], List[Group]]] = [([], [])]
+    for token in tokenize(power_filter):
+        if token == "(":
+            stack.append(([], []))
+            continue
+        if token == ")":
+            if len(stack) == 1:
+                raise PowerFilterError("unbalanced parenthesis in query")
+            terms, groups = stack.pop()
+            if not (terms or groups):
+                raise PowerFilterError("empty group in query")
+            stack[-1][1].append(Group(tuple(terms), tuple(groups)))
+            continue
+        stack[-1][0].append(_parse_term(token))
+    if len(stack) != 1:
+        raise PowerFilterError("unbalanced parenthesis in query")
+    terms, groups = stack[0]
+    return Group(tuple(terms), tuple(groups))
+
+
+@lru_cache(maxsize=1024)
+def parse_for_model(power_filter: str, ModelClass: Type["Base"]) -> Group:
+    """the parsed query checked against the model, with values cast for it"""
+    return _bind_group(parse(power_filter), ModelClass)
+
+
+def compile_filter(
+    tree: Group, ModelClass: Type["Base"], statement: "Select"
+) -> Tuple["Select", "ColumnElement"]:
+    """the statement with any joins the tree needs, and the predicate for it"""
+    joins: Dict[str, Any] = {}
+
+    def _compile_term(term: Term) -> "ColumnElement":
+        nonlocal statement
+        if term.operator == SEARCH_ATTRIBUTE:
+            return ModelClass.search_lookup(term.value)
+        if not term.related:
+            column = getattr(ModelClass, term.attribute)
+            if isinstance(term.value, date):
+                column = cast(column, Date)
+            return getattr(column, term.operator)(term.value)
+        if term.attribute not in joins:
+            target = aliased(_related_class(ModelClass, term.attribute))
+            source_uid = getattr(ModelClass, f"_{term.attribute}_uid")
+            statement = statement.join(target, onclause=target.uid == source_uid)
+            joins[term.attribute] = target
+        return joins[term.attribute].related_lookup(term.value)
+
+    def _compile_group(group: Group) -> "ColumnElement":
+        alternatives = [_compile_group(nested) for nested in group.groups]
+        if group.terms:
+            alternatives.insert(0, and_(*[_compile_term(t) for t in group.terms]))
+        return or_(*alternatives)
+
+    predicate = _compile_group(tree)
+    return statement, predicate
+
+
+def _parse_term(token: str) -> Term:
+    if ":" not in token:
+        raise PowerFilterError(f"bad filter element, no colon separator: {token}")
+    attribute, value = token.split(":", 1)
+    if attribute == SEARCH_ATTRIBUTE:
+        # websearch_to_tsquery syntax, no operators or wildcards to read
+        return Term(attribute=attribute, operator=SEARCH_ATTRIBUTE, value=value.strip())
+    operator = DEFAULT_OPERATOR
+    for symbol, method in OPERATORS:
+        if value.startswith(symbol):
+            operator = method
+            value = value[len(symbol) :]
+            break
+    # a wildcard character that humans can understand
+    value = value.replace("*", "%").strip()
+    return Term(attribute=attribute, operator=operator, value=value)
+
+
+def _bind_group(group: Group, ModelClass: Type["Base"]) -> Group:
+    return Group(
+        terms=tuple(_bind_term(term, ModelClass) for term in group.terms),
+        groups=tuple(_bind_group(nested, ModelClass) for nested in group.groups),
+    )
+
+
+def _bind_term(term: Term, ModelClass: Type["Base"]) -> Term:
+    if term.attribute in SECRET_ATTRIBUTES:
+        raise PowerFilterError(f"{term.attribute} is not searchable")
+    if term.attribute == SEARCH_ATTRIBUTE:
+        if not hasattr(ModelClass, "search_lookup"):
+            raise PowerFilterError(f"{ModelClass.__name__} has no full text search")
+        return term
+    mapper = inspect(ModelClass)
+    if term.attribute in mapper.column_attrs:
+        operator, value = term.operator, term.value
+        if term.attribute.endswith("_at"):
+            # dates are compared by day, there is nothing to pattern match
+            try:
+                value = parser.parse(value).date()
+            except (parser.ParserError, OverflowError) as e:
+                raise PowerFilterError(f"bad date for {term.attribute}: {e}") from e
+            if operator == "ilike":
+                operator = "__eq__"
+        return Term(term.attribute, operator, value)
+    if f"_{term.attribute}_uid" in mapper.column_attrs:
+        # chat: on a model with _chat_uid, whether or not it maps the relationship
+        _related_class(ModelClass, term.attribute)
+        return Term(term.attribute, term.operator, term.value, related=True)
+    if term.attribute in mapper.relationships:
+        raise PowerFilterError(
+            f"There is no standard uid pattern for accessing {term.attribute} "
+            f"on {ModelClass.__name__}"
+        )
+    raise PowerFilterError(f"bad filter attribute: {term.attribute}")
+
+
+@lru_cache(maxsize=256)
+def _related_class(ModelClass: Type["Base"], attribute: str) -> Type["Base"]:
+    """the model _{attribute}_uid points at, from the relationship when it's mapped
+    and otherwise from the column's foreign key
+    """
+    mapper = inspect(ModelClass)
+    if attribute in mapper.relationships:
+        return mapper.relationships[attribute].mapper.class_
+    (foreign_key,) = mapper.columns[f"_{attribute}_uid"].foreign_keys
+    for related in mapper.registry.mappers:
+        if related.local_table is foreign_key.column.table:
+            return related.class_
+    raise PowerFilterError(f"bad filter attribute: {attribute}")
@@ -0,0 +1,125 @@
+"""per-request SQL statement counts and timings"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Generator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logger import get_logger
+from app.settings import settings
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """statements executed while this tracker was active"""
+
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+    parent: Optional["QueryStats"] = field(default=None, repr=False)
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        """the Server-Timing header value, milliseconds per the spec"""
+        return (
+            f'db;dur={self.total_ms:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_ms:.2f}"
+        )
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries() -> Generator[QueryStats, None, None]:
+    """count statements run in this context, nested trackers all see them
+    the stats object is shared, so statements run in the threadpool or through
+    AsyncSession.run_sync are counted against the request that started them
+    """
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def instrument_queries(engine: Engine) -> Engine:
+    """time every cursor execute on the engine into the active trackers"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (perf_counter() - conn.info["query_start"].pop()) * 1000
+        if elapsed_ms >= settings.db_slow_query_ms:
+            logger.warning("slow query (%.1fms): %s", elapsed_ms, statement)
+        stats = _current_stats.get()
+        while stats is not None:
+            stats.record(statement, elapsed_ms)
+            stats = stats.parent
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        # a statement that raised never reaches _after_execute, so its start time
+        # would sit on the pooled connection and skew every later timing
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+
+    return engine
+
+
+class QueryMetricsMiddleware:
+    """adds Server-Timing for database work and logs a summary line per request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        logger.info(
+            "%s %s: %d queries in %.1fms",
+            scope["method"],
+            scope["path"],
+            stats.count,
+            stats.total_ms,
+            extra={
+                "db_queries": stats.count,
+                "db_total_ms": round(stats.total_ms, 2),
+                "db_slowest_ms": round(stats.slowest_ms, 2),
+                "db_slowest_statement": stats.slowest_statement,
+            },
+        )
@@ -1,11 +1,32 @@
-from typing import Generator, Optional, TYPE_CHECKING, Annotated, Callable, Any, Type
-from sqlalchemy import create_engine, URL
-from sqlalchemy.orm import sessionmaker
+from typing import (
+    AsyncGenerator,
+    Optional,
+    TYPE_CHECKING,
+    Annotated,
+    Callable,
+    Any,
+    Literal,
+    Type,
+)
+from hashlib import sha256
+from time import time
+
 from sqlalchemy.engine import Engine
 from fastapi import Depends
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import ExpiredSignatureError
 
+from app.database import (
+    create_pooled_engine,
+    get_sessionmaker,
+    get_async_sessionmaker,
+    run_in_session,
+)
+from app.cache import TTLCache
+from app.message_events import MessageEvents, message_events
 from app.settings import settings
 from app.http_errors import auth_expired
 from app.controllers.auth import JWTTokenFlow
@@ -14,28 +35,58 @@ from app.schemas.collection_schemas import CollectionRequest
 
 
 if TYPE_CHECKING:
-    from sqlalchemy.orm import Session
+    from sqlalchemy.orm import Session, sessionmaker
     from app.schemas.base_schema import BaseSchema
 
 
-def _create_engine(database: Optional[str] = None) -> Engine:
-    database = database or settings.db_name
-    return create_engine(
-        URL.create(
-            drivername="postgresql",
-            host=settings.db_host,
-            port=settings.db_port,
-            username=settings.db_user,
-            password=settings.db_password,
-            database=database,
-        )
-    )
+# decoded actors keyed on the token digest, each kept until its token expires
+actor_cache = TTLCache(maxsize=4096)
+
 
+def _create_engine(database: Optional[str] = None, **kwargs) -> Engine:
+    return create_pooled_engine(database, **kwargs)
 
-def get_db_session() -> Generator:
-    bound_session = sessionmaker(bind=_create_engine())
-    with bound_session() as session:
+
+async def get_db_session() -> AsyncGenerator:
+    """a session from the process-wide pool, see app.database
+    yields an AsyncSession when settings.db_async is set, otherwise a Session;
+    handlers hand it to run_in_session so either kind works.
+    """
+    if settings.db_async:
+        async with get_async_sessionmaker()() as session:
+            yield session
+        return
+    session = get_sessionmaker()()
+    try:
         yield session
+    finally:
+        await run_in_threadpool(session.close)
+
+
+def get_session_factory() -> "sessionmaker":
+    """a sessionmaker for work that outlives the request, e.g. streaming responses
+    yield dependencies are closed before a StreamingResponse body is sent, so the
+    body has to open (and close) its own session.
+    """
+    return get_sessionmaker()
+
+
+def get_message_events() -> MessageEvents:
+    """the worker's message event listener, shared by every open stream"""
+    return message_events
+
+
+class SchemaResponse(JSONResponse):
+    """a schema rendered straight to JSON by pydantic's serializer
+    returning a Response skips FastAPI's response_model round trip (dump, validate,
+    encode); keep response_model on the route for the docs.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            # rows are built with model_construct, so urls etc. may be plain strings
+            return content.model_dump_json(by_alias=True, warnings=False).encode()
+        return super().render(content)
 
 
 def get_current_user(
@@ -43,46 +94,71 @@ def get_current_user(
         str, Depends(OAuth2PasswordBearer(tokenUrl="/auth/username-password/dev-login"))
     ]
 ) -> "ScopedUser":
-    """decode the user from the JWT"""
+    """decode the user from the JWT
+    the same token comes back on every call a client makes, so the verified actor
+    is cached (by digest, never the raw token) until the token's exp.
+    """
+    key = sha256(token.encode()).digest()
+    if actor := actor_cache.get(key):
+        return actor
     try:
         decoded = JWTTokenFlow.decode_token(token)
-        return ScopedUser.from_jwt(decoded)
     except ExpiredSignatureError as e:
         auth_expired(e=e)
+    actor = ScopedUser.from_jwt(decoded)
+    actor_cache.set(key, actor, ttl=decoded.get("exp", 0) - time())
+    return actor
 
 
 def list_router_for_actor_factory(controller_model: Any) -> Callable:
     """since the list router is always the same, we can create a factory"""
 
-    def list_collection(
+    async def list_collection(
         perPage: int = None,
         page: int = None,
         query: str = None,
         orderBy: str = None,
         orderDir: str = None,
+        after: str = None,
+        before: str = None,
+        count: Literal["exact", "estimated", "none"] = None,
         db_session: "Session" = Depends(get_db_session),
         actor: "ScopedUser" = Depends(get_current_user),
     ):
         query_args = {}
         # drop the None values
-        for key in ["perPage", "page", "orderBy", "orderDir"]:
+        for key in [
+            "perPage",
+            "page",
+            "query",
+            "orderBy",
+            "orderDir",
+            "after",
+            "before",
+            "count",
+        ]:
             if locals()[key] is not None:
                 query_args[key] = locals()[key]
         request = CollectionRequest(actor=actor, **query_args)
-        controller = controller_model(db_session)
-        return controller.list_for_actor(request)
+        collection = await run_in_session(
+            db_session,
+            lambda session: controller_model(session).list_for_actor(request),
+        )
+        return SchemaResponse(collection)
 
     return list_collection
 
 
 def read_router_for_actor_factory(controller_model: Any) -> Callable:
-    def read_object(
+    async def read_object(
         object_id: str,
         actor: "ScopedUser" = Depends(get_current_user),
         db_session: "Session" = Depends(get_db_session),
     ):
-        controller = controller_model(db_session)
-        return controller.read_for_actor(actor, object_id)
+        return await run_in_session(
+            db_session,
+            lambda session: controller_model(session).read_for_actor(actor, object_id),
+        )
 
     return read_object
 
@@ -91,13 +167,17 @@ def create_router_for_actor_factory(
     controller_model: Any, object_schema: Type["BaseSchema"]
 ) -> Callable:
 
-    def create_object(
+    async def create_object(
         object_data: object_schema,
         actor: "ScopedUser" = Depends(get_current_user),
         db_session: "Session" = Depends(get_db_session),
     ):
-        controller = controller_model(db_session)
-        return controller.create_for_actor(actor, object_data)
+        return await run_in_session(
+            db_session,
+            lambda session: controller_model(session).create_for_actor(
+                actor, object_data
+            ),
+        )
 
     return create_object
 
@@ -106,26 +186,34 @@ def update_router_for_actor_factory(
     controller_model: Any, object_schema: Type["BaseSchema"]
 ) -> Callable:
 
-    def update_object(
+    async def update_object(
         object_id: str,
         object_data: object_schema,
         actor: "ScopedUser" = Depends(get_current_user),
         db_session: "Session" = Depends(get_db_session),
     ):
-        controller = controller_model(db_session)
-        return controller.update_for_actor(actor, object_id, object_data)
+        return await run_in_session(
+            db_session,
+            lambda session: controller_model(session).update_for_actor(
+                actor, object_id, object_data
+            ),
+        )
 
     return update_object
 
 
 def delete_router_for_actor_factory(controller_model: Any) -> Callable:
 
-    def delete_object(
+    async def delete_object(
         object_id: str,
         actor: "ScopedUser" = Depends(get_current_user),
         db_session: "Session" = Depends(get_db_session),
     ):
-        controller = controller_model(db_session)
-        return controller.delete_for_actor(actor, object_id)
+        return await run_in_session(
+            db_session,
+            lambda session: controller_model(session).delete_for_actor(
+                actor, object_id
+            ),
+        )
 
     return delete_object
@@ -1,8 +1,9 @@
 from typing import Annotated, Generator, Optional
 from fastapi import APIRouter, Depends
 
+from app.database import run_in_session
 from app.routers.utilities import get_db_session
-from app.controllers.magic_link import MagicLinkFlow
+from app.controllers.magic_link import MagicLinkFlow, validate_magic_link
 from app.controllers.auth import JWTTokenFlow
 from app.http_errors import bad_request
 from app.schemas.jtw_schema import JWTResponse
@@ -16,8 +17,14 @@ async def get_magic_link(
     db_session: Annotated["Generator", Depends(get_db_session)],
 ):
     """send a magic link to the user"""
+    token = await MagicLinkFlow.new_token()
     try:
-        MagicLinkFlow(db_session).send_magic_link(email_address)
+        await run_in_session(
+            db_session,
+            lambda session: MagicLinkFlow(session).send_magic_link(
+                email_address, token
+            ),
+        )
     except NotImplementedError as e:
         bad_request(
             e=e,
@@ -32,5 +39,10 @@ async def login_with_magic_link(
     db_session: Annotated["Generator", Depends(get_db_session)],
 ) -> Optional[JWTResponse]:
     """login with a magic link"""
-    user = MagicLinkFlow(db_session).validate_magic_link(slug)
-    return JWTTokenFlow(db_session).get_refresh_token(user)
+
+    user = await validate_magic_link(db_session, slug)
+
+    def _login(session):
+        return JWTTokenFlow(session).get_refresh_token(user)
+
+    return await run_in_session(db_session, _login)
@@ -4,11 +4,13 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from app.settings import settings
 from app.schemas.jtw_schema import JWTResponse
+from app.database import run_in_session
 from app.routers.utilities import get_db_session
 from app.schemas.user_schemas import NewUser
 from app.models.all import Organization
-from app.controllers.auth import JWTTokenFlow, AuthenticateUsernamePasswordFlow
+from app.controllers.auth import JWTTokenFlow, authenticate
 from app.controllers.user import CreateNewUserFlow
+from app.passwords import password_hasher
 
 
 router = APIRouter(prefix="/auth/username-password", tags=["auth"])
@@ -20,8 +22,16 @@ async def sign_up(
     db_session: Annotated["Generator", Depends(get_db_session)],
 ) -> Optional[JWTResponse]:
     """register a new user"""
-    user = CreateNewUserFlow(db_session).create_user_with_username_password(new_user)
-    return JWTTokenFlow(db_session).get_refresh_token(user)
+    CreateNewUserFlow.validate_new_user(new_user)
+    password_hash = await password_hasher.hash(new_user.password)
+
+    def _sign_up(session):
+        user = CreateNewUserFlow(session).create_user_with_username_password(
+            new_user, password_hash
+        )
+        return JWTTokenFlow(session).get_refresh_token(user)
+
+    return await run_in_session(db_session, _sign_up)
 
 
 @router.post("/login")
@@ -30,10 +40,14 @@ async def login(
     db_session: Annotated["Generator", Depends(get_db_session)],
 ) -> Optional[JWTResponse]:
     """use standard U/P to exchange for a refresh JWT"""
-    user = AuthenticateUsernamePasswordFlow(db_session).authenticate(
-        email_address=form_data.username, password=form_data.password
+    user = await authenticate(
+        db_session, email_address=form_data.username, password=form_data.password
     )
-    return JWTTokenFlow(db_session).get_refresh_token(user)
+
+    def _login(session):
+        return JWTTokenFlow(session).get_refresh_token(user)
+
+    return await run_in_session(db_session, _login)
 
 
 @router.post("/dev-login")
@@ -44,13 +58,18 @@ async def development_only_login(
     """for local development only! get a long-running primary auth token"""
     if not settings.environment == "dev":
         raise ValueError("this endpoint is only available in local development")
-    user = AuthenticateUsernamePasswordFlow(db_session).authenticate(
-        email_address=form_data.username, password=form_data.password
+
+    user = await authenticate(
+        db_session, email_address=form_data.username, password=form_data.password
     )
-    flow = JWTTokenFlow(db_session)
-    refresh = flow.get_refresh_token(user)
-    org = Organization.default(db_session)
-    auth_token = flow.get_auth_token(
-        refresh, org=org.id, expire_min=(60 * 24 * 365)
-    ).token
+
+    def _dev_login(session):
+        flow = JWTTokenFlow(session)
+        refresh = flow.get_refresh_token(user)
+        org = Organization.default(session)
+        return flow.get_auth_token(
+            refresh, org=org.id, expire_min=(60 * 24 * 365)
+        ).token
+
+    auth_token = await run_in_session(db_session, _dev_login)
     return {"access_token": auth_token, "token_type": "bearer"}
@@ -1,15 +1,32 @@
-from typing import List
+import asyncio
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, List, Literal, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.controllers.chat import ChatController, MessageController
 from app.models.chat import Chat
-from app.routers.utilities import get_db_session, get_current_user
+from app.database import run_in_session
+from app.message_events import MessageEvents
+from app.routers.utilities import (
+    get_db_session,
+    get_current_user,
+    get_message_events,
+    get_session_factory,
+    SchemaResponse,
+    list_router_for_actor_factory,
+)
 from app.schemas.chat_schemas import (
     ChatCreate,
     ChatRead,
+    ChatTokenCount,
+    MessageBatchCreate,
+    MessageBatchRead,
     MessageCreate,
     MessageRead,
     MessageUpdate,
@@ -20,45 +37,35 @@ from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
 router = APIRouter(prefix="/chats", tags=["chats"])
 
 
-@router.get("/", response_model=CollectionResponse)
-def list_chats(
-    perPage: int = None,
-    page: int = None,
-    query: str = None,
-    orderBy: str = None,
-    orderDir: str = None,
-    db_session: Session = Depends(get_db_session),
-    actor: ScopedUser = Depends(get_current_user),
-):
-    query_args = {}
-    # drop the None values
-    for key in ["perPage", "page", "orderBy", "orderDir"]:
-        if locals()[key] is not None:
-            query_args[key] = locals()[key]
-    request = CollectionRequest(actor=actor, **query_args)
-    controller = ChatController(db_session)
-    return controller.list_for_actor(request)
+list_chats = list_router_for_actor_factory(ChatController)
+router.get(
+    "/",
+    response_model=CollectionResponse,
+    description="get a collection of chats scoped to the current actor",
+)(list_chats)
 
 
 @router.get("/{chat_id}", response_model=ChatRead)
-def get_chat(
+async def get_chat(
     chat_id: str,
     db: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    controller = ChatController(db)
-    chat = controller.get_chat_for_actor(chat_id, actor)
-    return chat
+    return await run_in_session(
+        db, lambda session: ChatController(session).get_chat_for_actor(chat_id, actor)
+    )
 
 
 @router.post("/")
-def create_chat(
+async def create_chat(
     chat_data: ChatCreate,
     db_session: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    controller = ChatController(db_session)
-    chat = controller.create_chat_for_actor(chat_data, actor)
+    chat = await run_in_session(
+        db_session,
+        lambda session: ChatController(session).create_chat_for_actor(chat_data, actor),
+    )
     return ChatRead(
         id=chat.id,
         name=chat.name,
@@ -69,64 +76,264 @@ def create_chat(
 
 @router.put("/{chat_id}", response_model=ChatRead)
 @router.patch("/{chat_id}", response_model=ChatRead)
-def update_chat(
+async def update_chat(
     chat_id: str,
     chat_data: ChatCreate,
     db: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    controller = ChatController(db)
-    return controller.update_chat_for_actor(chat_id, chat_data, actor)
+    return await run_in_session(
+        db,
+        lambda session: ChatController(session).update_chat_for_actor(
+            chat_id, chat_data, actor
+        ),
+    )
 
 
 @router.delete("/{chat_id}")
-def delete_chat(
+async def delete_chat(
     chat_id: str,
     db: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    controller = ChatController(db)
-    chat = controller.get_chat_for_actor(chat_id, actor)
-    chat.deleted = True
-    chat.update(db)
+    def _delete(session: Session):
+        chat = ChatController(session).get_chat_for_actor(chat_id, actor)
+        chat.deleted = True
+        chat.update(session)
+
+    await run_in_session(db, _delete)
     return {"message": "Chat deleted successfully"}
 
 
 @router.post("/{chat_id}/messages", response_model=MessageRead)
-def add_message(
+async def add_message(
     chat_id: str,
     message_data: MessageCreate,
     db: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    controller = ChatController(db)
-    return controller.add_message(chat_id, message_data, actor)
+    return await run_in_session(
+        db,
+        lambda session: ChatController(session).add_message(
+            chat_id, message_data, actor
+        ),
+    )
+
+
+@router.post("/{chat_id}/messages:batch", response_model=MessageBatchRead)
+async def add_messages(
+    chat_id: str,
+    batch: MessageBatchCreate,
+    db: Session = Depends(get_db_session),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """add many messages in one transaction, e.g. to import a transcript"""
+    ids = await run_in_session(
+        db,
+        lambda session: ChatController(session).add_messages(
+            chat_id, batch.messages, actor
+        ),
+    )
+    return MessageBatchRead(ids=ids)
+
+
+@router.get("/{chat_id}/export")
+async def export_messages(
+    chat_id: str,
+    gzip: bool = False,
+    db: Session = Depends(get_db_session),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """the whole chat as newline-delimited JSON, one message per line"""
+
+    def _chat_uid(session: Session) -> UUID:
+        return ChatController(session).get_chat_for_actor(chat_id, actor).uid
+
+    chat_uid = await run_in_session(db, _chat_uid)
+
+    def _records(session: Session) -> Iterator[dict]:
+        return MessageController(session).export_chat_messages(chat_uid)
+
+    return _ndjson_response(session_factory, _records, f"{chat_id}.ndjson", gzip)
+
+
+@router.get("/{chat_id}/history")
+async def get_chat_history(
+    chat_id: str,
+    at: datetime,
+    gzip: bool = False,
+    db: Session = Depends(get_db_session),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """the chat's messages as they stood at a point in time, as newline-delimited
+    JSON rebuilt from the change archive"""
+
+    def _chat_uid(session: Session) -> UUID:
+        return ChatController(session).get_chat_for_actor(chat_id, actor).uid
+
+    chat_uid = await run_in_session(db, _chat_uid)
+
+    def _records(session: Session) -> Iterator[dict]:
+        return MessageController(session).chat_history(chat_uid, at)
+
+    filename = f"{chat_id}-{at.isoformat()}.ndjson"
+    return _ndjson_response(session_factory, _records, filename, gzip)
+
+
+@router.get("/{chat_id}/transcript")
+async def get_transcript(
+    chat_id: str,
+    maxTokens: Optional[int] = None,
+    truncate: Literal["tail", "keep_system"] = "tail",
+    db_session: Session = Depends(get_db_session),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """the chat as an OpenAI compatible chat completion message array
+    with maxTokens, only the latest messages that fit; truncate=keep_system keeps
+    the system messages too and fits the latest into what they leave
+    """
+
+    def _transcript(session: Session) -> List[dict]:
+        chat = ChatController(session).get_chat_for_actor(chat_id, actor)
+        return MessageController(session).chat_transcript(
+            chat.uid, max_tokens=maxTokens, truncate=truncate
+        )
+
+    return SchemaResponse(await run_in_session(db_session, _transcript))
+
+
+@router.get("/{chat_id}/tokens", response_model=ChatTokenCount)
+async def get_token_count(
+    chat_id: str,
+    db_session: Session = Depends(get_db_session),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """how many tokens the chat takes up, without downloading it"""
+
+    def _token_count(session: Session) -> ChatTokenCount:
+        chat = ChatController(session).get_chat_for_actor(chat_id, actor)
+        return MessageController(session).chat_token_count(chat.uid)
+
+    return SchemaResponse(await run_in_session(db_session, _token_count))
+
+
+def _ndjson_response(
+    session_factory: sessionmaker,
+    records: Callable[[Session], Iterator[dict]],
+    filename: str,
+    gzip: bool,
+) -> StreamingResponse:
+    """stream records one per line, from a session of the response's own"""
+
+    def _lines() -> Iterator[bytes]:
+        with session_factory() as session:
+            for record in records(session):
+                yield (json.dumps(record, default=str) + "\n").encode()
+
+    def _gzipped(lines: Iterator[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(wbits=31)
+        for line in lines:
+            if chunk := compressor.compress(line):
+                yield chunk
+        yield compressor.flush()
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    body = _lines()
+    if gzip:
+        body = _gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+
+KEEP_ALIVE_SECONDS = 15
+
+
+@router.get("/{chat_id}/events")
+async def stream_message_events(
+    chat_id: str,
+    request: Request,
+    db: Session = Depends(get_db_session),
+    events: MessageEvents = Depends(get_message_events),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """new, edited and deleted messages in the chat as server-sent events"""
+
+    def _chat_uid(session: Session) -> UUID:
+        return ChatController(session).get_chat_for_actor(chat_id, actor).uid
+
+    chat_uid = await run_in_session(db, _chat_uid)
+
+    async def _events() -> AsyncIterator[str]:
+        async with events.subscribe(chat_uid) as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield event
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=headers)
 
 
 @router.get("/{chat_id}/messages", response_model=CollectionResponse)
-def list_messages(
+async def list_messages(
     chat_id: str,
     perPage: int = None,
     page: int = None,
     query: str = None,
     orderBy: str = None,
     orderDir: str = None,
+    after: str = None,
+    before: str = None,
+    count: Literal["exact", "estimated", "none"] = None,
     db_session: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
     query_args = {}
     # drop the None values
-    for key in ["perPage", "page", "orderBy", "orderDir"]:
+    keys = ["perPage", "page", "query", "orderBy", "orderDir", "after", "before"]
+    for key in keys + ["count"]:
         if locals()[key] is not None:
             query_args[key] = locals()[key]
     request = CollectionRequest(actor=actor, **query_args)
-    controller = MessageController(db_session)
-    return controller.list_chat_messages_for_actor(chat_id, request)
+    collection = await run_in_session(
+        db_session,
+        lambda session: MessageController(session).list_chat_messages_for_actor(
+            chat_id, request
+        ),
+    )
+    return SchemaResponse(collection)
+
+
+@router.get("/{chat_id}/messages:search", response_model=CollectionResponse)
+async def search_messages(
+    chat_id: str,
+    q: str,
+    perPage: int = 10,
+    page: int = 1,
+    db_session: Session = Depends(get_db_session),
+    actor: ScopedUser = Depends(get_current_user),
+):
+    """full text search over the chat's messages, best match first"""
+    collection = await run_in_session(
+        db_session,
+        lambda session: MessageController(session).search_messages_for_actor(
+            actor, q, chat_id=chat_id, page=page, per_page=perPage
+        ),
+    )
+    return SchemaResponse(collection)
 
 
 @router.put("/{chat_id}/messages/{message_id}", response_model=MessageRead)
 @router.patch("/{chat_id}/messages/{message_id}", response_model=MessageRead)
-def update_message(
+async def update_message(
     chat_id: str,
     message_id: str,
     message_data: MessageUpdate,
@@ -135,24 +342,29 @@ def update_message(
 ):
     message_data.id = message_id
     message_data.chat_id = chat_id
-    controller = MessageController(db)
-    message = controller.update_message_for_actor(message_data, actor)
-    extra = {}
-    match message.type:
-        case "user_message":
-            extra["persona"] = message.persona
-        case "assistant_message":
-            extra["tool_calls_requested"] = message.tool_calls_requested
-        case "tool_message":
-            extra["tool_call_response"] = message.tool_call_response
-        case _:
-            pass
-    return MessageRead(
-        id=message.id,
-        name=message.name,
-        chat_id=chat_id,
-        type=message.type,
-        timestamp=message.timestamp,
-        content=message.content,
-        **extra,
-    )
+
+    def _update(session: Session) -> MessageRead:
+        # relationships are read here so lazy loads happen inside the session
+        controller = MessageController(session)
+        message = controller.update_message_for_actor(message_data, actor)
+        extra = {}
+        match message.type:
+            case "user_message":
+                extra["persona"] = message.persona
+            case "assistant_message":
+                extra["tool_calls_requested"] = message.tool_calls_requested
+            case "tool_message":
+                extra["tool_call_response"] = message.tool_call_response
+            case _:
+                pass
+        return MessageRead(
+            id=message.id,
+            name=message.name,
+            chat_id=chat_id,
+            type=message.type,
+            timestamp=message.timestamp,
+            content=message.content,
+            **extra,
+        )
+
+    return await run_in_session(db, _update)
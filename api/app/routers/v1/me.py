@@ -1,9 +1,11 @@
 from typing import Annotated, Generator, Optional
 from fastapi import APIRouter, Depends
 
+from app.database import run_in_session
 from app.routers.utilities import get_db_session
 from app.schemas.user_schemas import UpdateUser
 from app.controllers.user import UpdateUserFlow
+from app.passwords import password_hasher
 from app.schemas.user_schemas import ScopedUser, PydanticScopedUser
 from app.routers.utilities import get_current_user, get_db_session
 
@@ -19,5 +21,12 @@ async def update_self(
     actor: ScopedUser = Depends(get_current_user),
 ) -> Optional[PydanticScopedUser]:
     """update a user's own profile"""
-    controller = UpdateUserFlow(db_session)
-    return controller.update_user(actor, updates)
+    password_hash = None
+    if updates.password:
+        password_hash = await password_hasher.hash(updates.password)
+    return await run_in_session(
+        db_session,
+        lambda session: UpdateUserFlow(session).update_user(
+            actor, updates, password_hash
+        ),
+    )
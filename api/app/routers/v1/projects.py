@@ -1,70 +1,112 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.models.project import Project
+from app.controllers.chat import MessageController
 from app.controllers.project import ProjectController
+from app.database import run_in_session
+from app.embeddings import EmbeddingProvider, get_embedding_provider
+from app.http_errors import bad_request
 
 from app.schemas.project_schemas import ProjectCreate, ProjectRead
 from app.schemas.user_schemas import ScopedUser
-from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
+from app.schemas.collection_schemas import CollectionResponse
 
-from app.routers.utilities import get_db_session, get_current_user
+from app.routers.utilities import (
+    get_db_session,
+    get_current_user,
+    list_router_for_actor_factory,
+    SchemaResponse,
+)
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
 @router.post("/")
-def create_project(
+async def create_project(
     project_data: ProjectCreate,
     db_session: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ) -> ProjectRead:
-    # since the scoped user is from the jwt and detached, we need to connect it
-    db_session.merge(actor.organization)
-    ## TODO: this goes in a controller since it's business logic
-    project = Project(
-        organization_id=actor.organization.id,
-        # especially this part
-        creator_id=actor.id,
-        editor_id=actor.id,
-        avatar_url=str(project_data.avatar_url),
-        **project_data.model_dump(exclude_none=True, exclude={"avatar_url"})
-    ).create(db_session)
-    db_session.add(project)
-    db_session.refresh(project)
-    return ProjectRead(
-        id=project.id,
-        name=project.name,
-        avatarUrl=project.avatar_url,
-        description=project.description,
-        organizationId=project.organization.id,
+    def _create(session: Session) -> ProjectRead:
+        ## TODO: this goes in a controller since it's business logic
+        project = Project(
+            organization_id=actor.organization_id,
+            # especially this part
+            creator_id=actor.id,
+            editor_id=actor.id,
+            avatar_url=str(project_data.avatar_url),
+            **project_data.model_dump(exclude_none=True, exclude={"avatar_url"})
+        ).create(session)
+        session.add(project)
+        session.refresh(project)
+        return ProjectRead(
+            id=project.id,
+            name=project.name,
+            avatarUrl=project.avatar_url,
+            description=project.description,
+            organizationId=project.organization_id,
+        )
+
+    return await run_in_session(db_session, _create)
+
+
+list_projects = list_router_for_actor_factory(ProjectController)
+router.get(
+    "/",
+    response_model=CollectionResponse,
+    description="get a collection of projects scoped to the current actor",
+)(list_projects)
+
+
+@router.get("/{project_id}", response_model=ProjectRead)
+async def read_project(
+    project_id: str,
+    actor: ScopedUser = Depends(get_current_user),
+    db_session: Session = Depends(get_db_session),
+):
+    return await run_in_session(
+        db_session,
+        lambda session: ProjectController(session).read_for_actor(actor, project_id),
     )
 
 
-@router.get("/", response_model=CollectionResponse)
-def list_projects(
-    perPage: int = None,
-    page: int = None,
-    query: str = None,
-    orderBy: str = None,
-    orderDir: str = None,
+@router.get("/{project_id}/messages:search", response_model=CollectionResponse)
+async def search_messages(
+    project_id: str,
+    q: str,
+    perPage: int = 10,
+    page: int = 1,
     db_session: Session = Depends(get_db_session),
     actor: ScopedUser = Depends(get_current_user),
 ):
-    query_args = {}
-    # drop the None values
-    for key in ["perPage", "page", "orderBy", "orderDir"]:
-        if locals()[key] is not None:
-            query_args[key] = locals()[key]
-    request = CollectionRequest(actor=actor, **query_args)
-    controller = ProjectController(db_session)
-    return controller.list_for_actor(request)
+    """full text search over the messages in every chat of the project"""
+    collection = await run_in_session(
+        db_session,
+        lambda session: MessageController(session).search_messages_for_actor(
+            actor, q, project_id=project_id, page=page, per_page=perPage
+        ),
+    )
+    return SchemaResponse(collection)
 
 
-@router.get("/{project_id}", response_model=ProjectRead)
-def read_project(
+@router.get("/{project_id}/messages/similar", response_model=CollectionResponse)
+async def similar_messages(
     project_id: str,
-    actor: ScopedUser = Depends(get_current_user),
+    q: str,
+    limit: int = 10,
     db_session: Session = Depends(get_db_session),
+    actor: ScopedUser = Depends(get_current_user),
+    provider: Optional[EmbeddingProvider] = Depends(get_embedding_provider),
 ):
-    controller = ProjectController(db_session)
-    return controller.read_for_actor(actor, project_id)
+    """the messages in the project closest in meaning to q, nearest first"""
+    if provider is None:
+        bad_request(message="Similarity search is not enabled")
+    collection = await run_in_session(
+        db_session,
+        lambda session: MessageController(session).similar_messages_for_actor(
+            actor, project_id, q, provider, limit=limit
+        ),
+    )
+    return SchemaResponse(collection)
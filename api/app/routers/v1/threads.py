@@ -1,7 +1,8 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 from fastapi import APIRouter, Depends
 
 from app.controllers.thread import ThreadController, ThreadMessageController
+from app.database import run_in_session
 from app.routers.utilities import (
     list_router_for_actor_factory,
     create_router_for_actor_factory,
@@ -10,6 +11,7 @@ from app.routers.utilities import (
     delete_router_for_actor_factory,
     get_db_session,
     get_current_user,
+    SchemaResponse,
 )
 from app.schemas.thread_schemas import ThreadRead, ThreadCreate, ThreadUpdate
 from app.schemas.collection_schemas import CollectionResponse, CollectionRequest
@@ -60,24 +62,33 @@ router.delete(
     response_model=CollectionResponse,
     description="get a collection of messages in a thread",
 )
-def get_thread_messages(
+async def get_thread_messages(
     thread_id: str,
     perPage: int = None,
     page: int = None,
     query: str = None,
     orderBy: str = None,
     orderDir: str = None,
+    after: str = None,
+    before: str = None,
+    count: Literal["exact", "estimated", "none"] = None,
     db_session: "Session" = Depends(get_db_session),
     actor: "ScopedUser" = Depends(get_current_user),
 ):
     query_args = {}
     # drop the None values
-    for key in ["perPage", "page", "orderBy", "orderDir"]:
+    keys = ["perPage", "page", "query", "orderBy", "orderDir", "after", "before"]
+    for key in keys + ["count"]:
         if locals()[key] is not None:
             query_args[key] = locals()[key]
     request = CollectionRequest(actor=actor, **query_args)
-    controller = ThreadMessageController(db_session)
-    return controller.list_messages_for_actor(thread_id, request)
+    collection = await run_in_session(
+        db_session,
+        lambda session: ThreadMessageController(session).list_messages_for_actor(
+            thread_id, request
+        ),
+    )
+    return SchemaResponse(collection)
 
 
 # add message
@@ -86,14 +97,18 @@ def get_thread_messages(
     response_model=ThreadRead,
     description="add a message to a thread",
 )
-def add_thread_message(
+async def add_thread_message(
     thread_id: str,
     message_id: str,
     actor: "ScopedUser" = Depends(get_current_user),
     db_session: "Session" = Depends(get_db_session),
 ):
-    controller = ThreadMessageController(db_session)
-    return controller.add_message_for_actor(thread_id, message_id, actor)
+    return await run_in_session(
+        db_session,
+        lambda session: ThreadMessageController(session).add_message_for_actor(
+            thread_id, message_id, actor
+        ),
+    )
 
 
 # remove message
@@ -102,11 +117,15 @@ def add_thread_message(
     response_model=ThreadRead,
     description="remove a message from a thread",
 )
-def remove_thread_message(
+async def remove_thread_message(
     thread_id: str,
     message_id: str,
     actor: "ScopedUser" = Depends(get_current_user),
     db_session: "Session" = Depends(get_db_session),
 ):
-    controller = ThreadMessageController(db_session)
-    return controller.remove_message_for_actor(thread_id, message_id, actor)
+    return await run_in_session(
+        db_session,
+        lambda session: ThreadMessageController(session).remove_message_for_actor(
+            thread_id, message_id, actor
+        ),
+    )
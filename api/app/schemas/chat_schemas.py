@@ -102,29 +102,66 @@ class MessageCreate(BaseSchema):
         description="The tool call associated with the response from executing the tool call",
     )
 
-    @model_validator(mode="before")
-    def check_event_type_params(cls, values):
+    @model_validator(mode="after")
+    def check_event_type_params(self):
+        # after validation, so the fields are set whether they came in by name or alias
         try:
-            vtype = values["type"]
-        except (KeyError, TypeError):
-            return values
-        try:
-            if vtype == EventType.tool_message:
+            if self.type == EventType.tool_message:
                 assert (
-                    values.get("tool_call_response", None) is not None
+                    self.tool_call_response is not None
                 ), "tool_call_response is required for tool_message events"
                 assert (
-                    values.get("tool_calls_requested", None) is None
+                    self.tool_calls_requested is None
                 ), "tool_calls_requested is not allowed for tool_message events"
-            elif not vtype == EventType.assistant_message:
+            elif not self.type == EventType.assistant_message:
                 assert (
-                    values.get("tool_calls_requested", None) is None
+                    self.tool_calls_requested is None
                 ), "tool_calls_requested is not allowed for non-assistant_message events"
-            return values
+            return self
         except AssertionError as e:
             raise ValueError(e)
 
 
+class MessageBatchCreate(BaseSchema):
+    messages: List[MessageCreate] = Field(
+        ...,
+        min_length=1,
+        max_length=10_000,
+        description="The messages to add, in chat order",
+    )
+
+    @model_validator(mode="after")
+    def check_unique_request_ids(self):
+        # calls and responses are matched up by request id, a repeat would shadow one
+        requested = [
+            str(tool_call.request_id)
+            for message in self.messages
+            for tool_call in message.tool_calls_requested or []
+            if tool_call is not None
+        ]
+        responded = [
+            str(message.tool_call_response.request_id)
+            for message in self.messages
+            if message.tool_call_response is not None
+        ]
+        for field, request_ids in (
+            ("tool_calls_requested", requested),
+            ("tool_call_response", responded),
+        ):
+            seen = set()
+            for request_id in request_ids:
+                if request_id in seen:
+                    raise ValueError(f"request_id {request_id} repeats in {field}")
+                seen.add(request_id)
+        return self
+
+
+class MessageBatchRead(BaseSchema):
+    ids: List[str] = Field(
+        ..., description="The ids of the created messages, in the order they were sent"
+    )
+
+
 class MessageRead(MessageCreate):
     id: str = Field(
         ...,
@@ -152,6 +189,27 @@ class MessageRead(MessageCreate):
     )
 
 
+class MessageSearchResult(MessageRead):
+    rank: float = Field(description="How well the message matches, higher is better")
+    snippet: str = Field(
+        description="The best matching fragments of the content, matches in <mark>"
+    )
+
+
+class SimilarMessage(MessageRead):
+    distance: float = Field(
+        description="Cosine distance from the query, 0 is identical, lower is closer"
+    )
+
+
+class ChatTokenCount(BaseSchema):
+    tokenizer: str = Field(description="The tokenizer the messages were counted with")
+    message_count: int
+    token_count: int = Field(
+        description="Tokens the messages take up, including the per message overhead"
+    )
+
+
 class MessageUpdate(MessageRead):
     id: Optional[str] = Field(
         default=None,
@@ -22,9 +22,36 @@ class CollectionRequest(BaseSchema):
         default=None,
         description="The power-query formatted search query to filter the collection",
     )
+    after: Optional[str] = Field(
+        default=None,
+        description="A nextCursor value; returns the items after it instead of a page",
+    )
+    before: Optional[str] = Field(
+        default=None,
+        description="A prevCursor value; returns the items before it instead of a page",
+    )
+    count: Optional[Literal["exact", "estimated", "none"]] = Field(
+        default="exact",
+        description="How pages is totalled: exact, estimated by the planner, or none",
+    )
 
 
 class CollectionResponse(BaseSchema):
-    pages: int = Field(description="The total number of pages in the collection")
+    pages: Optional[int] = Field(
+        default=None,
+        description="The total number of pages, empty when count is none",
+    )
     items: List = Field(description="The items in the collection")
-    page: int = Field(description="The current page number")
+    page: Optional[int] = Field(
+        default=None,
+        description="The current page number, empty when paging by cursor",
+    )
+    has_more: bool = Field(
+        default=False, description="Whether more items follow this page"
+    )
+    next_cursor: Optional[str] = Field(
+        default=None, description="Pass as `after` to fetch the following items"
+    )
+    prev_cursor: Optional[str] = Field(
+        default=None, description="Pass as `before` to fetch the preceding items"
+    )
@@ -1,4 +1,5 @@
-from typing import Any, Optional, TYPE_CHECKING, Type
+from dataclasses import dataclass
+from typing import Optional, TYPE_CHECKING, Type
 from uuid import UUID
 from pydantic import Field
 
@@ -65,53 +66,87 @@ class UserRead(ReadUser):
     """TODO: deprcate - one or the other here"""
 
 
+@dataclass(frozen=True, slots=True)
 class ScopedUser:
-    """a user scoped to an organization"""
-
-    user: "User"
-    organization: Optional["Organization"] = None
-
-    def __init__(self, user: "User", organization: Optional["Organization"] = None):
-        self.user = user
-        self.organization = organization
-
-    def __getattr__(self, attr: str) -> Any:
-        try:
-            return self.__getattribute__(attr)
-        except AttributeError as e:
-            if hasattr(self.user, attr):
-                return getattr(self.user, attr)
-            raise e
+    """a user scoped to an organization, as claimed by their auth token
+    plain uids and claims rather than ORM instances, so there is nothing to merge
+    into a session and it can be shared between requests (see get_current_user).
+    """
+
+    uid: UUID
+    email_address: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    organization_uid: Optional[UUID] = None
+    organization_name: Optional[str] = None
+
+    @property
+    def id(self) -> str:
+        return f"user-{self.uid}"
+
+    @property
+    def organization_id(self) -> Optional[str]:
+        if self.organization_uid:
+            return f"organization-{self.organization_uid}"
+        return None
 
     @classmethod
     def from_jwt(cls, decoded: dict) -> "ScopedUser":
         """create from a decoded auth JWT"""
-        user_uid = UUID(decoded["sub"].split("user-")[1])
-        org = None
-        if decoded["org"]:
-            org_uid = UUID(decoded["org"]["id"].split("organization-")[1])
-            org = Organization(uid=org_uid, name=decoded["org"]["name"])
-        return ScopedUser(
-            user=User(
-                uid=user_uid,
-                email_address=decoded["user"]["email_address"],
-                first_name=decoded["user"]["first_name"],
-                last_name=decoded["user"]["last_name"],
-                avatar_url=decoded["user"]["avatar_url"],
+        user = decoded["user"]
+        org = decoded["org"] or {}
+        return cls(
+            uid=UUID(decoded["sub"].split("user-")[1]),
+            email_address=user["email_address"],
+            first_name=user["first_name"],
+            last_name=user["last_name"],
+            avatar_url=user["avatar_url"],
+            organization_uid=(
+                UUID(org["id"].split("organization-")[1]) if org else None
             ),
-            organization=org,
+            organization_name=org.get("name"),
         )
 
-    def refresh(self, db_session: "Session") -> "ScopedUser":
-        """refresh the user object from the database"""
-        return ScopedUser(
-            user=User.read(db_session, self.user.id),
-            organization=Organization.read(db_session, self.organization.id),
+    @classmethod
+    def from_models(
+        cls, user: "User", organization: Optional["Organization"] = None
+    ) -> "ScopedUser":
+        """create from loaded User and Organization instances"""
+        return cls(
+            uid=user.uid,
+            email_address=user.email_address,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            avatar_url=user.avatar_url,
+            organization_uid=getattr(organization, "uid", None),
+            organization_name=getattr(organization, "name", None),
         )
 
+    def refresh(self, db_session: "Session") -> "ScopedUser":
+        """refresh the user and organization from the database"""
+        organization = None
+        if self.organization_uid:
+            organization = Organization.read(db_session, self.organization_uid)
+        return self.from_models(User.read(db_session, self.id), organization)
+
     def to_pydantic(self) -> Type["BaseSchema"]:
-        """convert to a Pydantic model, no longer supports the graduated attr lookup"""
-        return PydanticScopedUser(user=self.user, organization=self.organization)
+        """convert to a Pydantic model"""
+        organization = None
+        if self.organization_uid:
+            organization = OrganizationRead(
+                id=self.organization_id, name=self.organization_name
+            )
+        return PydanticScopedUser(
+            user=ReadUser(
+                id=self.id,
+                email_address=self.email_address,
+                first_name=self.first_name,
+                last_name=self.last_name,
+                avatar_url=self.avatar_url,
+            ),
+            organization=organization,
+        )
 
 
 class PydanticScopedUser(BaseSchema):
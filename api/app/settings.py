@@ -20,12 +20,77 @@ class Settings(BaseSettings):
     db_name: str
     db_user: str
     db_password: str
+    db_pool_size: int = Field(
+        default=10, description="Connections kept open in the pool for each worker"
+    )
+    db_pool_max_overflow: int = Field(
+        default=20,
+        description="Extra connections the pool may open beyond db_pool_size under load",
+    )
+    db_pool_timeout: int = Field(
+        default=30, description="Seconds to wait for a pooled connection before failing"
+    )
+    db_pool_recycle: int = Field(
+        default=1800,
+        description="Seconds before a pooled connection is replaced, -1 to never recycle",
+    )
+    db_pool_pre_ping: bool = Field(
+        default=True,
+        description="If True connections are tested before checkout so dropped connections are replaced",
+    )
+    db_async: bool = Field(
+        default=False,
+        description="If True requests get an AsyncSession on asyncpg instead of a threadpool-bound Session",
+    )
+    db_slow_query_ms: int = Field(
+        default=500, description="Statements slower than this are logged as warnings"
+    )
+    collection_count_cache_ttl: int = Field(
+        default=0,
+        description="Seconds to cache exact collection counts per filter and organization, 0 to disable",
+    )
+    transcript_cache_ttl: int = Field(
+        default=600,
+        description="Seconds to keep a chat's rendered transcript for incremental rebuilds, 0 to disable",
+    )
+    tokenizer: str = Field(
+        default="estimate",
+        description="Counts message tokens, a key of app.tokenizers.TOKENIZERS",
+    )
+    tokenizer_ranks_file: Optional[str] = Field(
+        default=None,
+        description="The tiktoken style merge ranks file the bpe tokenizer loads",
+    )
+    embedding_provider: Optional[str] = Field(
+        default="hashing",
+        description="Embeds messages for similarity search, a key of app.embeddings.EMBEDDING_PROVIDERS. None turns it off",
+    )
+    embedding_batch_size: int = Field(
+        default=100, description="Messages read and embedded per backfill batch"
+    )
 
     jwt_secret_key: str
+    password_hash_workers: int = Field(
+        default=2,
+        description="Threads per worker that hash and verify passwords, the rest queue",
+    )
+    argon2_time_cost: int = Field(
+        default=3, description="argon2 iterations, changing it rehashes on next login"
+    )
+    argon2_memory_cost: int = Field(
+        default=65536,
+        description="argon2 memory in KiB per hash, changing it rehashes on next login",
+    )
+    argon2_parallelism: int = Field(
+        default=4, description="argon2 lanes per hash, changing it rehashes on login"
+    )
     smtp_email_host: Optional[str] = None
     smtp_email_port: Optional[int] = None
     smtp_email_user: Optional[str] = None
     smtp_email_password: Optional[str] = None
+    smtp_email_starttls: bool = Field(
+        default=True, description="If True the smtp connection is upgraded to TLS"
+    )
 
 
 settings = Settings()
@@ -0,0 +1,108 @@
+"""counts the tokens of messages stored without a count
+
+messages are counted as they are written. the rest, rows from before counts were
+stored and every row after `UPDATE message SET token_count = NULL` for a new
+tokenizer, are counted by one pass over the message table when a worker starts;
+the tokenizer is a setting, so switching it means a restart anyway. until the pass
+reaches them, reads count them in memory and leave the row alone.
+"""
+
+import asyncio
+from typing import Callable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_sessionmaker
+from app.logger import get_logger
+from app.models.message import Message
+from app.tokenizers import get_tokenizer
+
+logger = get_logger(__name__)
+
+
+class TokenCountBackfill:
+    """store token counts for the messages missing one
+    Args:
+        session_factory: opens the sessions the pass works in, defaults to the
+            application sessionmaker
+        batch_size (int): messages read and counted per batch
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: int = 1000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        try:
+            counted = await run_in_threadpool(self.run_pass)
+        except Exception:
+            logger.exception("token count backfill failed")
+            return
+        if counted:
+            logger.info("counted tokens for %d messages", counted)
+
+    def run_pass(self) -> int:
+        """count every message missing a count, returning how many were"""
+        counted = 0
+        cursor: Optional[UUID] = None
+        while True:
+            batch_counted, cursor = self.count_batch(cursor)
+            counted += batch_counted
+            if cursor is None:
+                return counted
+
+    def count_batch(self, cursor: Optional[UUID] = None) -> Tuple[int, Optional[UUID]]:
+        """count the next batch after cursor (a message uid), returning how many
+        were counted and the cursor for the next batch, None once there is none
+        """
+        session_factory = self.session_factory or get_sessionmaker()
+        query = (
+            select(Message.uid, Message.content)
+            .where(Message.token_count.is_(None))
+            .order_by(Message.uid)
+            .limit(self.batch_size)
+        )
+        if cursor is not None:
+            query = query.where(Message.uid > cursor)
+        with session_factory() as session:
+            rows = session.execute(query).all()
+            if not rows:
+                return 0, None
+            counts = get_tokenizer().count([content for _, content in rows])
+            # an edit since the read has stored a count of the new content
+            session.execute(
+                update(Message).where(Message.token_count.is_(None)),
+                [
+                    {"uid": uid, "token_count": count}
+                    for (uid, _), count in zip(rows, counts)
+                ],
+            )
+            session.commit()
+        next_cursor = rows[-1][0] if len(rows) == self.batch_size else None
+        return len(rows), next_cursor
+
+
+token_backfill = TokenCountBackfill()
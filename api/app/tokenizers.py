@@ -0,0 +1,107 @@
+"""token counting for chat messages
+
+messages store their token count, computed once when they are written, so a
+chat's size (and where to cut it to fit a context window) is a sum in SQL rather
+than a re-tokenization. the configured tokenizer (settings.tokenizer) is looked
+up in TOKENIZERS, add an entry there to plug in another. a count is only as good
+as its tokenizer: after switching, `UPDATE message SET token_count = NULL` and
+app.token_backfill counts them again when the workers restart.
+"""
+
+import re
+from base64 import b64decode
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.settings import settings
+
+# GPT style pre-tokenization: contractions, words, up to three digits, runs of
+# punctuation and whitespace. BPE merges never cross these boundaries
+PIECE = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+"
+)
+
+
+class Tokenizer:
+    """counts the tokens in texts, one count per text and in the same order"""
+
+    name: str = "base"
+    # chat formats wrap every message in a few tokens of their own
+    message_overhead: int = 4
+
+    def count(self, texts: List[str]) -> List[int]:
+        return [sum(map(self._count_piece, PIECE.findall(text))) for text in texts]
+
+    def _count_piece(self, piece: str) -> int:
+        raise NotImplementedError
+
+
+class EstimatingTokenizer(Tokenizer):
+    """pre-tokenizes like a BPE tokenizer and estimates each piece from its length
+    needs no vocabulary; common words are one token, long ones a token per 8 letters
+    """
+
+    name = "estimate"
+
+    def _count_piece(self, piece: str) -> int:
+        stripped = piece.strip()
+        if not stripped or stripped.isdigit():
+            return 1
+        if stripped[0].isalpha():
+            return 1 + (len(stripped) - 1) // 8
+        return 1 + (len(stripped) - 1) // 2
+
+
+class BytePairTokenizer(Tokenizer):
+    """byte level BPE over a merge ranks table
+    Args:
+        ranks (Dict[bytes, int]): every token, lower ranks merge first
+        name (str): stored nowhere, only tells tokenizers apart in responses
+    """
+
+    def __init__(self, ranks: Dict[bytes, int], name: str = "bpe"):
+        self.ranks = ranks
+        self.name = name
+        # chats repeat themselves, most pieces have been seen before
+        self._count_bytes = lru_cache(maxsize=65536)(self._merge)
+
+    @classmethod
+    def from_file(cls, path: str) -> "BytePairTokenizer":
+        """load a tiktoken style ranks file, a base64 token and its rank per line"""
+        ranks = {}
+        for line in Path(path).read_text().splitlines():
+            if line:
+                token, rank = line.split()
+                ranks[b64decode(token)] = int(rank)
+        return cls(ranks, name=f"bpe-{Path(path).stem}")
+
+    def _count_piece(self, piece: str) -> int:
+        return self._count_bytes(piece.encode())
+
+    def _merge(self, piece: bytes) -> int:
+        if piece in self.ranks:
+            return 1
+        parts = [piece[index : index + 1] for index in range(len(piece))]
+        while len(parts) > 1:
+            best_rank, best = None, None
+            for index in range(len(parts) - 1):
+                rank = self.ranks.get(parts[index] + parts[index + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best = rank, index
+            if best is None:
+                break
+            parts[best : best + 2] = [parts[best] + parts[best + 1]]
+        return len(parts)
+
+
+TOKENIZERS: Dict[str, Callable[[], Tokenizer]] = {
+    "estimate": EstimatingTokenizer,
+    "bpe": lambda: BytePairTokenizer.from_file(settings.tokenizer_ranks_file),
+}
+
+
+@lru_cache
+def get_tokenizer() -> Tokenizer:
+    """the configured tokenizer"""
+    return TOKENIZERS[settings.tokenizer]()
@@ -0,0 +1,68 @@
+"""compiled validators for tool call arguments
+
+compiling a tool's json schema is far dearer than validating against it, so each
+tool's validator is compiled once and cached by tool uid along with the
+updated_at it was compiled from. a batch of tool calls checks that version
+against the row it reads anyway, then validation is a dict lookup per call.
+ToolController drops the entry when it changes a tool.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+from jsonschema import Draft202012Validator, validators
+from jsonschema.protocols import Validator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.models.tool import Tool
+
+# (updated_at, validator) keyed on tool uid. versioned, so the ttl only bounds
+# how long an unused tool's validator is kept
+validator_cache = TTLCache(maxsize=1024, ttl=3600)
+
+
+def arguments_schema(json_schema: dict) -> dict:
+    """the part of an OAI tool definition that describes its arguments
+    takes {"type": "function", "function": {...}}, {"name": ..., "parameters": ...}
+    or the parameters schema itself
+    """
+    definition = json_schema.get("function", json_schema)
+    return definition.get("parameters", definition)
+
+
+def compile_validator(json_schema: dict) -> Validator:
+    """a validator for the tool's arguments, raises SchemaError if it isn't a schema"""
+    schema = arguments_schema(json_schema or {})
+    ValidatorClass = validators.validator_for(schema, default=Draft202012Validator)
+    ValidatorClass.check_schema(schema)
+    return ValidatorClass(schema)
+
+
+def get_validators(
+    db_session: Session, tool_versions: Dict[UUID, Optional[datetime]]
+) -> Dict[UUID, Validator]:
+    """validators for the given tool versions (uid: updated_at), from the cache
+    when the version matches. the schemas of the rest are read in one query
+    """
+    found = {}
+    for tool_uid, updated_at in tool_versions.items():
+        entry = validator_cache.get(tool_uid)
+        if entry is not None and entry[0] == updated_at:
+            found[tool_uid] = entry[1]
+    missing = [tool_uid for tool_uid in tool_versions if tool_uid not in found]
+    if missing:
+        query = select(Tool.uid, Tool.updated_at, Tool.json_schema).where(
+            Tool.uid.in_(missing)
+        )
+        for tool_uid, updated_at, json_schema in db_session.execute(query):
+            found[tool_uid] = compile_validator(json_schema)
+            validator_cache.set(tool_uid, (updated_at, found[tool_uid]))
+    return found
+
+
+def invalidate(tool_uid: UUID) -> None:
+    """forget the tool's validator, its schema has changed"""
+    validator_cache.pop(tool_uid)
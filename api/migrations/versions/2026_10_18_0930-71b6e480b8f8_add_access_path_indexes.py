@@ -0,0 +1,83 @@
+"""add_access_path_indexes
+
+Revision ID: 71b6e480b8f8
+Revises: d17ad032891f
+Create Date: 2026-10-18 09:30:12.204188
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "71b6e480b8f8"
+down_revision: Union[str, None] = "d17ad032891f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOT_DELETED = sa.text("NOT deleted")
+
+# (name, table, columns, partial index predicate), mirrors the models' __table_args__
+INDEXES = (
+    (
+        "ix_message_chat_timestamp",
+        "message",
+        ["_chat_uid", "timestamp", "uid"],
+        NOT_DELETED,
+    ),
+    (
+        "ix_message_thread_timestamp",
+        "message",
+        ["_thread_uid", "timestamp"],
+        sa.text("_thread_uid IS NOT NULL"),
+    ),
+    (
+        "ix_project_organization_created_at",
+        "project",
+        ["_organization_uid", "created_at"],
+        NOT_DELETED,
+    ),
+    ("ix_chat_project_created_at", "chat", ["_project_uid", "created_at"], NOT_DELETED),
+    ("ix_thread_chat", "thread", ["_chat_uid"], NOT_DELETED),
+    ("ix_tool_project", "tool", ["_project_uid"], NOT_DELETED),
+    ("ix_persona_organization", "persona", ["_organization_uid"], NOT_DELETED),
+    (
+        "ix_organizations_users_organization",
+        "organizations_users",
+        ["_organization_uid"],
+        None,
+    ),
+    ("ix_organizations_users_user", "organizations_users", ["_user_uid"], None),
+    ("ix_tool_call_assistant_message", "tool_call", ["_assistant_message_uid"], None),
+    (
+        "ix_tool_call_tool_message",
+        "tool_call",
+        ["_tool_message_uid"],
+        sa.text("_tool_message_uid IS NOT NULL"),
+    ),
+)
+
+
+def upgrade() -> None:
+    # concurrently, so existing deployments keep serving writes while these build
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
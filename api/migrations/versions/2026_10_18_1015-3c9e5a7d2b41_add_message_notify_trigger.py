@@ -0,0 +1,51 @@
+"""add_message_notify_trigger
+
+Revision ID: 3c9e5a7d2b41
+Revises: 71b6e480b8f8
+Create Date: 2026-10-18 10:15:47.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e5a7d2b41"
+down_revision: Union[str, None] = "71b6e480b8f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a copy of app.models.message.NOTIFY_MESSAGE_CHANGE(_TRIGGER) as of this revision
+NOTIFY_MESSAGE_CHANGE = """\
+CREATE OR REPLACE FUNCTION notify_message_change() RETURNS TRIGGER AS $$
+  BEGIN
+    PERFORM pg_notify(
+      'message_events',
+      json_build_object(
+        'op', lower(TG_OP),
+        'uid', NEW.uid,
+        'chat_uid', NEW._chat_uid,
+        'deleted', NEW.deleted
+      )::text
+    );
+    RETURN NEW;
+  END;
+$$ language plpgsql;
+"""
+NOTIFY_MESSAGE_CHANGE_TRIGGER = """\
+CREATE OR REPLACE TRIGGER trg_notify_message_change
+AFTER INSERT OR UPDATE ON "message"
+FOR EACH ROW EXECUTE FUNCTION notify_message_change();
+"""
+
+
+def upgrade() -> None:
+    op.execute(NOTIFY_MESSAGE_CHANGE)
+    op.execute(NOTIFY_MESSAGE_CHANGE_TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS trg_notify_message_change ON "message"')
+    op.execute("DROP FUNCTION IF EXISTS notify_message_change()")
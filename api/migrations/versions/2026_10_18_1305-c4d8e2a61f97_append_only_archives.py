@@ -0,0 +1,172 @@
+"""append_only_archives
+
+Revision ID: c4d8e2a61f97
+Revises: 9f2b6c1e8d53
+Create Date: 2026-10-18 13:05:22.907311
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d8e2a61f97"
+down_revision: Union[str, None] = "9f2b6c1e8d53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a copy of app.models.archives.MAKE_ARCHIVE_OF_CHANGES as of this revision
+MAKE_ARCHIVE_OF_CHANGES = """\
+CREATE OR REPLACE FUNCTION make_archive_of_changes() RETURNS TRIGGER AS $$
+  -- Expects one argument, the record_type, the model class name e.g. 'User'
+  -- Append-only: the next version comes off ix_archives_record_version.
+  -- The write holds the row lock on the record until commit, so concurrent
+  -- changes to one record take their versions in turn
+  DECLARE
+    _record_id uuid;
+    _version bigint;
+  BEGIN
+    IF TG_OP = 'DELETE' THEN
+      _record_id := OLD.uid;
+    ELSE
+      _record_id := NEW.uid;
+    END IF;
+
+    SELECT coalesce(max(version), 0) + 1 INTO _version
+    FROM archives
+    WHERE table_name = TG_TABLE_NAME AND record_id = _record_id;
+
+    INSERT INTO archives (
+      table_name, record_type, record_id, version, operation,
+      old_values, new_values, recorded_at
+    )
+    VALUES (
+      TG_TABLE_NAME, TG_ARGV[0], _record_id, _version, TG_OP,
+      CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE to_jsonb(OLD) END,
+      CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE to_jsonb(NEW) END,
+      now()
+    );
+
+    IF TG_OP = 'DELETE' THEN
+      RETURN OLD;
+    END IF;
+    RETURN NEW;
+  END;
+$$ language plpgsql;
+"""
+
+# the function as eba8f9baf56f left it, for downgrade
+MAKE_ARCHIVE_OF_CHANGES_MOST_RECENT = """\
+CREATE OR REPLACE FUNCTION make_archive_of_changes() RETURNS TRIGGER AS $$
+  BEGIN
+    UPDATE archives
+    SET most_recent = FALSE
+    WHERE
+      table_name = TG_TABLE_NAME
+      AND most_recent = TRUE
+      AND record_type = record_type
+      AND record_id = (
+        CASE WHEN TG_OP = 'DELETE'
+          THEN OLD.uid
+          ELSE NEW.uid
+        END
+      );
+
+    IF TG_OP = 'INSERT' THEN
+      INSERT INTO archives (
+        table_name, record_type, record_id, operation, new_values, most_recent, recorded_at
+      )
+      VALUES (
+        TG_TABLE_NAME, TG_ARGV[0], NEW.uid, TG_OP, to_jsonb(NEW), TRUE, now()
+      );
+      RETURN NEW;
+
+    ELSIF TG_OP = 'UPDATE' THEN
+      INSERT INTO archives (
+        table_name, record_type, record_id, operation, new_values, old_values, most_recent, recorded_at
+      )
+      VALUES (
+        TG_TABLE_NAME, TG_ARGV[0], NEW.uid, TG_OP, to_jsonb(NEW), to_jsonb(OLD), TRUE, now()
+      );
+      RETURN NEW;
+
+    ELSIF TG_OP = 'DELETE' THEN
+      INSERT INTO archives (
+        table_name, record_type, record_id, operation, old_values, most_recent, recorded_at
+      )
+      VALUES (
+        TG_TABLE_NAME, TG_ARGV[0], OLD.uid, TG_OP, to_jsonb(OLD), TRUE, now()
+      );
+      RETURN OLD;
+
+    END IF;
+  END;
+$$ language plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """number the existing history, then stop rewriting it
+    the table is locked while this runs; archived writes wait, they don't fail
+    """
+    op.execute(sa.text("LOCK TABLE archives IN SHARE ROW EXCLUSIVE MODE"))
+    op.add_column("archives", sa.Column("version", sa.BigInteger(), nullable=True))
+    op.execute(
+        sa.text(
+            """\
+UPDATE archives SET version = numbered.version
+FROM (
+  SELECT id, row_number() OVER (
+    PARTITION BY table_name, record_id ORDER BY recorded_at, id
+  ) AS version
+  FROM archives
+) AS numbered
+WHERE archives.id = numbered.id
+"""
+        )
+    )
+    op.alter_column("archives", "version", nullable=False)
+    op.create_index(
+        "ix_archives_record_version",
+        "archives",
+        ["table_name", "record_id", "version"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_archives_recorded_at",
+        "archives",
+        ["recorded_at"],
+        postgresql_using="brin",
+    )
+    op.execute(sa.text(MAKE_ARCHIVE_OF_CHANGES))
+    op.drop_column("archives", "most_recent")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "archives",
+        sa.Column("most_recent", sa.BOOLEAN(), server_default="FALSE", nullable=False),
+    )
+    op.execute(
+        sa.text(
+            """\
+UPDATE archives SET most_recent = TRUE
+FROM (
+  SELECT table_name, record_id, max(version) AS version
+  FROM archives
+  GROUP BY table_name, record_id
+) AS latest
+WHERE archives.table_name = latest.table_name
+  AND archives.record_id = latest.record_id
+  AND archives.version = latest.version
+"""
+        )
+    )
+    op.alter_column("archives", "most_recent", server_default=None)
+    op.execute(sa.text(MAKE_ARCHIVE_OF_CHANGES_MOST_RECENT))
+    op.drop_index("ix_archives_recorded_at", table_name="archives")
+    op.drop_index("ix_archives_record_version", table_name="archives")
+    op.drop_column("archives", "version")
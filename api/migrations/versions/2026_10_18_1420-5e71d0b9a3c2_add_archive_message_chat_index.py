@@ -0,0 +1,46 @@
+"""add_archive_message_chat_index
+
+Revision ID: 5e71d0b9a3c2
+Revises: c4d8e2a61f97
+Create Date: 2026-10-18 14:20:38.114502
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e71d0b9a3c2"
+down_revision: Union[str, None] = "c4d8e2a61f97"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # concurrently, the archive is the biggest table there is
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_archives_message_chat",
+            "archives",
+            [
+                sa.text("(coalesce(new_values, old_values) ->> '_chat_uid')"),
+                "record_id",
+                sa.text("version DESC"),
+            ],
+            postgresql_where=sa.text("table_name = 'message'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_archives_message_chat",
+            table_name="archives",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,57 @@
+"""add_message_search
+
+Revision ID: 8b3f1d6e4a27
+Revises: 5e71d0b9a3c2
+Create Date: 2026-10-18 15:30:04.671325
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3f1d6e4a27"
+down_revision: Union[str, None] = "5e71d0b9a3c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # in public, so gin_trgm_ops resolves whatever the search_path
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public")
+    # mirrors Message.search_vector, SEARCH_CONFIG is 'english'. this rewrites the
+    # table once, content is only parsed again when it changes
+    op.execute(
+        "ALTER TABLE message ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_message_search_vector",
+            "message",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_message_content_trgm",
+            "message",
+            ["content"],
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in ("ix_message_content_trgm", "ix_message_search_vector"):
+            op.drop_index(
+                name, table_name="message", postgresql_concurrently=True, if_exists=True
+            )
+    op.drop_column("message", "search_vector")
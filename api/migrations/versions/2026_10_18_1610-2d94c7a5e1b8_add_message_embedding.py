@@ -0,0 +1,78 @@
+"""add_message_embedding
+
+Revision ID: 2d94c7a5e1b8
+Revises: 8b3f1d6e4a27
+Create Date: 2026-10-18 16:10:51.392817
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2d94c7a5e1b8"
+down_revision: Union[str, None] = "8b3f1d6e4a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # db_setup.sql installs it too, this covers databases made elsewhere
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector WITH SCHEMA public")
+    op.create_table(
+        "message_embedding",
+        sa.Column("_message_uid", sa.UUID(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("content_hash", sa.String(), nullable=False),
+        # EMBEDDING_DIMENSIONS
+        sa.Column("embedding", Vector(384), nullable=False),
+        sa.Column("uid", sa.UUID(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "deleted", sa.Boolean(), server_default=sa.text("FALSE"), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["_message_uid"],
+            ["message.uid"],
+            name="fk_message_embedding_message_id",
+            onupdate="CASCADE",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("uid"),
+    )
+    op.create_index(
+        "ix_message_embedding_message",
+        "message_embedding",
+        ["_message_uid"],
+        unique=True,
+    )
+    # built while the table is empty, the backfill fills it in afterwards
+    op.create_index(
+        "ix_message_embedding_hnsw",
+        "message_embedding",
+        ["embedding"],
+        postgresql_using="hnsw",
+        postgresql_with={"m": 16, "ef_construction": 64},
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_message_embedding_hnsw", table_name="message_embedding")
+    op.drop_index("ix_message_embedding_message", table_name="message_embedding")
+    op.drop_table("message_embedding")
@@ -0,0 +1,29 @@
+"""add_message_token_count
+
+Revision ID: a7c35e0f9d16
+Revises: 2d94c7a5e1b8
+Create Date: 2026-10-18 16:50:27.804913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c35e0f9d16"
+down_revision: Union[str, None] = "2d94c7a5e1b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # nullable with no default, so no rewrite; app.token_backfill counts existing
+    # messages when the workers start
+    op.add_column("message", sa.Column("token_count", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("message", "token_count")
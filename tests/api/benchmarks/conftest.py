@@ -0,0 +1,16 @@
+"""report what the benchmarks measured once the run is over"""
+
+
+def pytest_terminal_summary(terminalreporter):
+    reports = [
+        report
+        for report in terminalreporter.getreports("passed")
+        if report.user_properties
+    ]
+    if not reports:
+        return
+    terminalreporter.section("benchmark results")
+    for report in reports:
+        terminalreporter.write_line(report.nodeid)
+        for name, value in report.user_properties:
+            terminalreporter.write_line(f"    {name}: {value}")
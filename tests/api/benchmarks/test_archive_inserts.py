@@ -0,0 +1,128 @@
+"""archive work per message insert as the archive grows, append-only vs most_recent"""
+
+import os
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from pytest import mark as m
+from sqlalchemy import insert, text
+
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+
+pytestmark = m.benchmark
+
+# archive rows for other records, seeded cumulatively before each measurement.
+# set BENCHMARK_ARCHIVE_ROWS=1000000 to go to production sizes
+ARCHIVE_SIZES = (0, int(os.environ.get("BENCHMARK_ARCHIVE_ROWS", 10_000)))
+INSERTS = 200
+# the old trigger scans the whole archive per write, keep its sample small
+LEGACY_INSERTS = 20
+
+SEED = text(
+    """\
+INSERT INTO archives (
+  table_name, record_type, record_id, version, operation, new_values, recorded_at
+)
+SELECT 'message', 'Message', gen_random_uuid(), 1, 'INSERT', '{}'::jsonb, now()
+FROM generate_series(1, :rows)
+"""
+)
+
+# what this transaction has done to the archive so far
+ARCHIVE_ACTIVITY = text(
+    """\
+SELECT
+  n_tup_ins AS inserted,
+  n_tup_upd AS updated,
+  seq_tup_read + coalesce(idx_tup_fetch, 0) AS read
+FROM pg_stat_xact_user_tables
+WHERE relid = 'archives'::regclass
+"""
+)
+
+# the trigger function before append-only archives, less its comments
+LEGACY_FUNCTION = """\
+CREATE OR REPLACE FUNCTION make_archive_of_changes_legacy() RETURNS TRIGGER AS $$
+  BEGIN
+    UPDATE archives
+    SET most_recent = FALSE
+    WHERE
+      table_name = TG_TABLE_NAME
+      AND most_recent = TRUE
+      AND record_type = record_type
+      AND record_id = NEW.uid;
+    INSERT INTO archives (
+      table_name, record_type, record_id, operation, new_values, most_recent,
+      recorded_at
+    )
+    VALUES (
+      TG_TABLE_NAME, TG_ARGV[0], NEW.uid, TG_OP, to_jsonb(NEW), TRUE, now()
+    );
+    RETURN NEW;
+  END;
+$$ language plpgsql;
+"""
+
+
+def _archive_activity(db_session, chat_uid, count: int) -> dict:
+    """archive rows inserted, updated and read by count message inserts"""
+    now = datetime.now(timezone.utc)
+    rows = [
+        dict(
+            uid=uuid4(),
+            _chat_uid=chat_uid,
+            type=EventType.user_message,
+            content=f"message {index}",
+            timestamp=now,
+        )
+        for index in range(count)
+    ]
+    # one statement per message, like the api writes them
+    for row in rows:
+        db_session.execute(insert(Message).values(**row))
+    activity = db_session.execute(ARCHIVE_ACTIVITY).one()._asdict()
+    db_session.commit()
+    return activity
+
+
+@m.describe("when writing messages into a growing archive")
+class TestArchiveInsertBenchmark:
+
+    @m.it("reads no more of the archive per insert as it grows")
+    def test_growth(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="archive", organization_id=org.id).create(db_session)
+        chat_uid = Chat(name="archive", project_id=project.id).create(db_session).uid
+
+        activity = {}
+        seeded = 0
+        for size in ARCHIVE_SIZES:
+            if size > seeded:
+                db_session.execute(SEED, {"rows": size - seeded})
+                db_session.execute(text("ANALYZE archives"))
+                db_session.commit()
+                seeded = size
+            activity[size] = _archive_activity(db_session, chat_uid, INSERTS)
+
+        # the same archive as it was, under the old trigger and without the indexes
+        # that came with or after append-only archives
+        for statement in (
+            "DROP INDEX ix_archives_record_version",
+            "DROP INDEX ix_archives_message_chat",
+            "ALTER TABLE archives ALTER COLUMN version DROP NOT NULL",
+            "ALTER TABLE archives ADD COLUMN most_recent BOOLEAN DEFAULT TRUE",
+            LEGACY_FUNCTION,
+            "CREATE OR REPLACE TRIGGER trg_make_archive_of_changes_for_message "
+            'AFTER INSERT ON "message" FOR EACH ROW '
+            "EXECUTE FUNCTION make_archive_of_changes_legacy('Message')",
+        ):
+            db_session.execute(text(statement))
+        db_session.commit()
+        legacy = _archive_activity(db_session, chat_uid, LEGACY_INSERTS)
+
+        for size, counts in activity.items():
+            assert counts == {"inserted": INSERTS, "updated": 0, "read": 0}, size
+        # every write scanned every snapshot taken before it
+        assert legacy["read"] >= LEGACY_INSERTS * seeded
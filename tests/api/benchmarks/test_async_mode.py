@@ -0,0 +1,114 @@
+"""GET /chats/ throughput on the threadpool (sync) path vs the asyncpg path"""
+
+import asyncio
+from time import perf_counter
+from typing import Tuple
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.app import app
+from app.database import create_pooled_async_engine, create_pooled_engine
+from app.models.chat import Chat
+from app.models.project import Project
+from app.query_metrics import track_queries
+from app.routers.utilities import get_db_session
+from app.settings import settings
+
+pytestmark = m.benchmark
+
+REQUESTS = 500
+CONCURRENCY = 50
+# uncounted, so every request runs the same statements whatever count_cache holds
+PARAMS = {"count": "none"}
+
+
+async def _load(client: AsyncClient, headers: dict) -> Tuple[int, float]:
+    """the statements run by REQUESTS concurrent requests and their requests/sec"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one_request():
+        async with semaphore:
+            response = await client.get("/chats/", params=PARAMS, headers=headers)
+            assert response.status_code == 200
+
+    start = perf_counter()
+    with track_queries() as stats:
+        await asyncio.gather(*(one_request() for _ in range(REQUESTS)))
+    return stats.count, REQUESTS / (perf_counter() - start)
+
+
+@m.describe("when serving GET /chats/ in sync and async database modes")
+class TestAsyncModeBenchmark:
+
+    @pytest.fixture
+    def chats(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="benchmark", organization_id=org.id).create(db_session)
+        for index in range(25):
+            Chat(name=f"chat {index}", project_id=project.id).create(db_session)
+
+    @m.it("reports requests/sec for both modes, with the same page and queries")
+    async def test_async_mode_throughput(
+        self, request, record_property, chats, auth_headers
+    ):
+        schema = request.node.name
+        sync_engine = create_pooled_engine(
+            "langstory_test",
+            connect_args={"options": f"-csearch_path={schema},public"},
+        )
+        async_engine = create_pooled_async_engine(
+            "langstory_test",
+            connect_args={"server_settings": {"search_path": f"{schema},public"}},
+        )
+        sync_sessions = sessionmaker(bind=sync_engine)
+        async_sessions = async_sessionmaker(bind=async_engine)
+
+        def sync_session():
+            with sync_sessions() as session:
+                yield session
+
+        async def async_session():
+            async with async_sessions() as session:
+                yield session
+
+        pages = {}
+        queries = {}
+        throughput = {}
+        original_mode = settings.db_async
+        client = AsyncClient(app=app, base_url="http://test", follow_redirects=True)
+        try:
+            for label, db_async, dependency in (
+                ("sync", False, sync_session),
+                ("async", True, async_session),
+            ):
+                settings.db_async = db_async
+                app.dependency_overrides[get_db_session] = dependency
+                pages[label] = (
+                    await client.get("/chats/", params=PARAMS, headers=auth_headers)
+                ).json()
+                # the actor is cached by then
+                with track_queries() as stats:
+                    await client.get("/chats/", params=PARAMS, headers=auth_headers)
+                queries[label] = stats.count
+                load_queries, throughput[label] = await _load(client, auth_headers)
+                # none lost or doubled when requests share the pool concurrently
+                assert load_queries == REQUESTS * stats.count
+        finally:
+            settings.db_async = original_mode
+            app.dependency_overrides.pop(get_db_session, None)
+            await client.aclose()
+            sync_engine.dispose()
+            await async_engine.dispose()
+
+        # reported, not asserted on: throughput depends on the machine
+        for label, requests_per_second in throughput.items():
+            record_property(f"{label} requests/sec", round(requests_per_second))
+        record_property(
+            "async/sync throughput", round(throughput["async"] / throughput["sync"], 2)
+        )
+        assert pages["sync"] == pages["async"]
+        assert queries["sync"] == queries["async"]
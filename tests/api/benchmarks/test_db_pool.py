@@ -0,0 +1,110 @@
+"""GET /chats/ under concurrent load with a new engine per request vs the shared pool"""
+
+import asyncio
+from statistics import quantiles
+from time import perf_counter
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.app import app
+from app.database import create_pooled_engine, database_url
+from app.models.chat import Chat
+from app.models.project import Project
+from app.routers.utilities import get_db_session
+from app.settings import settings
+
+pytestmark = m.benchmark
+
+REQUESTS = 200
+CONCURRENCY = 20
+
+
+def _search_path(schema: str) -> dict:
+    """the test tables live in a schema named after the test"""
+    return {"options": f"-csearch_path={schema},public"}
+
+
+def _count_connections(engine, opened: dict, label: str) -> None:
+    """tally the database connections the engine opens under label"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        opened[label] += 1
+
+
+async def _latency(client: AsyncClient, headers: dict) -> dict:
+    """p50 and p99 of REQUESTS concurrent requests, in ms"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    timings = []
+
+    async def timed_request():
+        async with semaphore:
+            start = perf_counter()
+            response = await client.get("/chats/", headers=headers)
+            timings.append(perf_counter() - start)
+            assert response.status_code == 200
+
+    await asyncio.gather(*(timed_request() for _ in range(REQUESTS)))
+    cuts = quantiles(timings, n=100)
+    return {"p50_ms": round(cuts[49] * 1000, 1), "p99_ms": round(cuts[98] * 1000, 1)}
+
+
+@m.describe("when serving GET /chats/ under concurrent load")
+class TestPoolBenchmark:
+
+    @pytest.fixture
+    def chats(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="benchmark", organization_id=org.id).create(db_session)
+        for index in range(25):
+            Chat(name=f"chat {index}", project_id=project.id).create(db_session)
+
+    @m.it("reports p50/p99 latency and bounds the connections the shared pool opens")
+    async def test_pool_connections(
+        self, request, record_property, chats, auth_headers
+    ):
+        schema = request.node.name
+        opened = {"engine per request": 0, "shared pool": 0}
+        pooled_engine = create_pooled_engine(
+            "langstory_test", connect_args=_search_path(schema)
+        )
+        _count_connections(pooled_engine, opened, "shared pool")
+        pooled = sessionmaker(bind=pooled_engine)
+
+        def engine_per_request():
+            # what get_db_session did before the shared pool
+            engine = create_engine(
+                database_url("langstory_test"), connect_args=_search_path(schema)
+            )
+            _count_connections(engine, opened, "engine per request")
+            with sessionmaker(bind=engine)() as session:
+                yield session
+            engine.dispose()
+
+        def shared_pool():
+            with pooled() as session:
+                yield session
+
+        client = AsyncClient(app=app, base_url="http://test", follow_redirects=True)
+        try:
+            for label, dependency in (
+                ("engine per request", engine_per_request),
+                ("shared pool", shared_pool),
+            ):
+                app.dependency_overrides[get_db_session] = dependency
+                # reported, not asserted on: latency depends on the machine
+                for name, value in (await _latency(client, auth_headers)).items():
+                    record_property(f"{label} {name}", value)
+        finally:
+            app.dependency_overrides.pop(get_db_session, None)
+            await client.aclose()
+            pooled_engine.dispose()
+
+        assert opened["engine per request"] == REQUESTS
+        assert opened["shared pool"] <= min(
+            CONCURRENCY, settings.db_pool_size + settings.db_pool_max_overflow
+        )
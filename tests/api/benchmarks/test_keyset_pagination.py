@@ -0,0 +1,78 @@
+"""deep pages of chat messages: OFFSET pages vs keyset cursors"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import insert
+
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+from app.query_metrics import track_queries
+
+pytestmark = m.benchmark
+
+MESSAGES = 20_000
+PER_PAGE = 10
+DEPTHS = (1, 100, 1_000, 1_999)
+
+
+async def _get_page(client: AsyncClient, url: str, params: dict, headers: dict):
+    """the page's items and the statements it took"""
+    with track_queries() as stats:
+        response = await client.get(url, params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json(), stats.count
+
+
+@m.describe("when reading deep pages of a large chat")
+class TestKeysetPaginationBenchmark:
+
+    @pytest.fixture
+    def chat(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="benchmark", organization_id=org.id).create(db_session)
+        chat = Chat(name="long chat", project_id=project.id).create(db_session)
+        start = datetime.now(timezone.utc)
+        db_session.execute(
+            insert(Message),
+            [
+                {
+                    "_chat_uid": chat.uid,
+                    "type": EventType.user_message,
+                    "content": f"message {index}",
+                    "timestamp": start + timedelta(seconds=index),
+                }
+                for index in range(MESSAGES)
+            ],
+        )
+        db_session.commit()
+        return chat
+
+    @m.it("reads every depth through a cursor in the same number of queries")
+    async def test_deep_pages(self, override_app, chat, auth_headers):
+        url = f"/chats/{chat.id}/messages"
+        # uncounted, a page count would be its own query
+        base = {"perPage": PER_PAGE, "orderBy": "timestamp", "count": "none"}
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        queries = {}
+        try:
+            for depth in DEPTHS:
+                previous, _ = await _get_page(
+                    client, url, {**base, "page": depth}, auth_headers
+                )
+                offset_page, _ = await _get_page(
+                    client, url, {**base, "page": depth + 1}, auth_headers
+                )
+                cursor_page, queries[depth] = await _get_page(
+                    client, url, {**base, "after": previous["nextCursor"]}, auth_headers
+                )
+                assert cursor_page["items"] == offset_page["items"]
+        finally:
+            await client.aclose()
+
+        assert len(set(queries.values())) == 1
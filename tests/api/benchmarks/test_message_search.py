@@ -0,0 +1,89 @@
+"""searching a large chat: the gin indexes vs scanning every row"""
+
+import os
+
+from pytest import mark as m
+from sqlalchemy import select, text
+
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.project import Project
+
+pytestmark = m.benchmark
+
+# a thousand fold more is what the indexes are for, BENCHMARK_MESSAGES=1000000
+MESSAGES = int(os.environ.get("BENCHMARK_MESSAGES", 100_000))
+WORDS = (
+    "castle dragon river forest knight tavern harbor ship storm lantern "
+    "mountain village market tower bridge garden wolf raven crown sword"
+).split()
+
+# one message in a thousand mentions the griffin. triggers are off while seeding,
+# neither the archive nor listeners need the fake messages
+SEED = text(
+    """\
+INSERT INTO message (uid, _chat_uid, type, content, timestamp)
+SELECT
+  gen_random_uuid(), :chat_uid, 'user_message',
+  concat_ws(' ',
+    (:words)[1 + i % 20], (:words)[1 + (i / 20) % 20], (:words)[1 + (i / 400) % 20],
+    CASE WHEN i % 1000 = 0 THEN 'griffin' END,
+    'message', i
+  ),
+  now() + i * interval '1 second'
+FROM generate_series(1, :rows) AS i
+"""
+)
+
+
+def _plan(db_session, query, scan: bool = False) -> dict:
+    """the planner's choice for the query, or its best without the indexes"""
+    if scan:
+        db_session.execute(text("SET LOCAL enable_bitmapscan = off"))
+        db_session.execute(text("SET LOCAL enable_indexscan = off"))
+    compiled = query.compile(
+        dialect=db_session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db_session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    db_session.rollback()
+    return plan[0]["Plan"]
+
+
+def _index_names(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+@m.describe("when searching a large chat")
+class TestMessageSearchBenchmark:
+
+    @m.it("plans words and substrings through the gin indexes")
+    def test_search(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="search", organization_id=org.id).create(db_session)
+        chat_uid = Chat(name="search", project_id=project.id).create(db_session).uid
+        db_session.execute(text('ALTER TABLE "message" DISABLE TRIGGER USER'))
+        db_session.execute(
+            SEED, {"chat_uid": chat_uid, "words": WORDS, "rows": MESSAGES}
+        )
+        db_session.execute(text('ALTER TABLE "message" ENABLE TRIGGER USER'))
+        db_session.commit()
+        db_session.execute(text('ANALYZE "message"'))
+        db_session.commit()
+
+        words = select(Message.uid).where(Message.search_lookup("griffin"))
+        substring = select(Message.uid).where(Message.content.ilike("%riffi%"))
+        assert len(db_session.execute(words).all()) == MESSAGES // 1000
+        assert len(db_session.execute(substring).all()) == MESSAGES // 1000
+        db_session.rollback()
+
+        for index, query in (
+            ("ix_message_search_vector", words),
+            ("ix_message_content_trgm", substring),
+        ):
+            indexed = _plan(db_session, query)
+            scanned = _plan(db_session, query, scan=True)
+            assert index in _index_names(indexed)
+            assert indexed["Total Cost"] < scanned["Total Cost"] / 10
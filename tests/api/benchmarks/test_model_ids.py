@@ -0,0 +1,52 @@
+"""prefixed id formatting and parsing for a page of 10k messages"""
+
+from datetime import datetime, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+from pytest import mark as m
+
+from app.models.all import Message
+from app.models.message import EventType
+from app.schemas.chat_schemas import MessageRead
+
+pytestmark = m.benchmark
+
+MESSAGES = 10_000
+
+
+@m.describe("when serializing a large page of messages")
+class TestModelIdsBenchmark:
+
+    @m.it("formats and parses ids without per-row name munging")
+    def test_ids(self):
+        chat_uid = uuid4()
+        now = datetime.now(timezone.utc)
+        messages = [
+            Message(
+                uid=uuid4(),
+                _chat_uid=chat_uid,
+                type=EventType.user_message,
+                content=f"message {index}",
+                timestamp=now,
+            )
+            for index in range(MESSAGES)
+        ]
+
+        # the prefixes were worked out when the classes were mapped
+        with patch("app.models.base.depascalize") as depascalize:
+            ids = [message.id for message in messages]
+            chat_ids = [message.chat_id for message in messages]
+            for message in messages:
+                MessageRead(
+                    id=message.id,
+                    type=message.type,
+                    timestamp=message.timestamp,
+                    role=message.role,
+                    content=message.content,
+                    chat_id=message.chat_id,
+                )
+            uids = [Message.to_uid(id_) for id_ in ids]
+        assert depascalize.call_count == 0
+        assert uids == [message.uid for message in messages]
+        assert chat_ids[0] == f"chat-{chat_uid}"
@@ -0,0 +1,31 @@
+"""power filter parsing, cold vs cached, with nested groupings"""
+
+from pytest import mark as m
+from sqlalchemy import select
+
+from app.models.all import Thread
+from app.power_filter import compile_filter, parse, parse_for_model
+
+pytestmark = m.benchmark
+
+ITERATIONS = 2_000
+QUERY = (
+    "name:standup* created_at:>2024-01-01 "
+    "(name:retro (name:planning* created_at:<2025-01-01) (name:'sprint review')) "
+    "(chat:support (chat:sales name:demo*))"
+)
+
+
+@m.describe("when filtering with a nested power query")
+class TestPowerFilterBenchmark:
+
+    @m.it("only pays for parsing the first time a query is seen")
+    def test_parse_cache(self):
+        parse.cache_clear()
+        parse_for_model.cache_clear()
+        for _ in range(ITERATIONS):
+            tree = parse_for_model(QUERY, Thread)
+            compile_filter(tree, Thread, select(Thread))
+        assert parse.cache_info().misses == 1
+        assert parse_for_model.cache_info().misses == 1
+        assert parse_for_model.cache_info().hits == ITERATIONS - 1
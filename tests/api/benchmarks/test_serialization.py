@@ -0,0 +1,85 @@
+"""rendering a 1,000 message page: validated schemas vs the trusted fast path"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from pytest import mark as m
+
+from app.models.all import Message
+from app.models.message import EventType
+from app.routers.utilities import SchemaResponse
+from app.schemas.chat_schemas import MessageRead
+from app.schemas.collection_schemas import CollectionResponse
+
+pytestmark = m.benchmark
+
+MESSAGES = 1_000
+
+
+class CountingValidator:
+    """wraps a model's validator, counting the rows it validates"""
+
+    def __init__(self, validator):
+        self.validator = validator
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self.validator, name)
+
+    def validate_python(self, *args, **kwargs):
+        self.calls += 1
+        return self.validator.validate_python(*args, **kwargs)
+
+
+def _fields(message: Message) -> dict:
+    return dict(
+        id=message.id,
+        type=message.type,
+        timestamp=message.timestamp,
+        role=message.role,
+        content=message.content,
+        chat_id=message.chat_id,
+    )
+
+
+def _validated(messages) -> bytes:
+    """what a list endpoint did before: validate per row, then FastAPI's
+    response_model dump, re-validate and encode"""
+    items = [MessageRead(**_fields(message)) for message in messages]
+    response = CollectionResponse(items=items, page=1, pages=1)
+    dumped = response.model_dump(by_alias=True)
+    revalidated = CollectionResponse.model_validate(dumped)
+    encoded = jsonable_encoder(revalidated, by_alias=True)
+    return json.dumps(encoded).encode()
+
+
+def _trusted(messages) -> bytes:
+    items = [MessageRead.model_construct(**_fields(message)) for message in messages]
+    return SchemaResponse(CollectionResponse(items=items, page=1, pages=1)).body
+
+
+@m.describe("when rendering a large page of messages")
+class TestSerializationBenchmark:
+
+    @m.it("renders the same json without validating the rows on the trusted path")
+    def test_page(self, monkeypatch):
+        chat_uid = uuid4()
+        start = datetime.now(timezone.utc)
+        messages = [
+            Message(
+                uid=uuid4(),
+                _chat_uid=chat_uid,
+                type=EventType.user_message,
+                content=f"message {index}",
+                timestamp=start + timedelta(seconds=index),
+            )
+            for index in range(MESSAGES)
+        ]
+        validator = CountingValidator(MessageRead.__pydantic_validator__)
+        monkeypatch.setattr(MessageRead, "__pydantic_validator__", validator)
+        trusted = _trusted(messages)
+        assert validator.calls == 0
+        assert json.loads(trusted) == json.loads(_validated(messages))
+        assert validator.calls == MESSAGES
@@ -0,0 +1,42 @@
+from pytest import mark as m
+from sqlalchemy import delete, select
+
+from app.models.archives import Archives
+from app.models.chat import Chat
+from app.models.project import Project
+
+
+@m.describe("when archiving changes")
+class TestArchives:
+
+    @m.it("appends a numbered version per change and never rewrites history")
+    def test_versions(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="history", organization_id=org.id).create(db_session)
+        chat = Chat(name="v1", project_id=project.id).create(db_session)
+        chat.name = "v2"
+        chat.update(db_session)
+        chat_uid = chat.uid
+        db_session.execute(delete(Chat).where(Chat.uid == chat_uid))
+        db_session.commit()
+
+        history = db_session.scalars(
+            select(Archives)
+            .where(Archives.table_name == "chat", Archives.record_id == chat_uid)
+            .order_by(Archives.version)
+        ).all()
+        assert [(row.version, row.operation) for row in history] == [
+            (1, "INSERT"),
+            (2, "UPDATE"),
+            (3, "DELETE"),
+        ]
+        assert history[0].new_values["name"] == "v1"
+        assert history[1].old_values["name"] == "v1"
+        assert history[1].new_values["name"] == "v2"
+        assert history[2].new_values is None
+
+        # the project's history is numbered on its own
+        project_versions = db_session.scalars(
+            select(Archives.version).where(Archives.record_id == project.uid)
+        ).all()
+        assert project_versions == [1]
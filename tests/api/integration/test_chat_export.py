@@ -0,0 +1,103 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+
+from app.controllers.chat import MessageController
+from app.models.chat import Chat
+from app.models.project import Project
+from app.models.tool import Tool
+
+
+@m.describe("when exporting a chat")
+class TestChatExport:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="export", organization_id=org.id).create(db_session)
+        chat = Chat(name="transcript", project_id=project.id).create(db_session)
+        tool = Tool(
+            name="lookup", project_id=project.id, json_schema={"type": "object"}
+        ).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        start = datetime.now(timezone.utc)
+        messages = []
+        for index in range(0, 30, 3):
+            timestamps = [
+                (start + timedelta(seconds=index + offset)).isoformat()
+                for offset in range(3)
+            ]
+            messages += [
+                {
+                    "type": "user_message",
+                    "content": f"q{index}",
+                    "timestamp": timestamps[0],
+                },
+                {
+                    "type": "assistant_message",
+                    "content": f"a{index}",
+                    "timestamp": timestamps[1],
+                    "toolCallsRequested": [
+                        {"toolId": tool.id, "requestId": f"call-{index}"}
+                    ],
+                },
+                {
+                    "type": "tool_message",
+                    "content": f"r{index}",
+                    "timestamp": timestamps[2],
+                    "toolCallResponse": {
+                        "toolId": tool.id,
+                        "requestId": f"call-{index}",
+                    },
+                },
+            ]
+        # reversed so the export has to sort by timestamp, not insert order
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages[::-1]},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        yield client, auth_headers, chat, [message["content"] for message in messages]
+
+    @m.it("streams every message in timestamp order with its tool calls")
+    async def test_export(self, setup_client):
+        client, headers, chat, contents = setup_client
+        response = await client.get(f"/chats/{chat.id}/export", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [record["content"] for record in records] == contents
+        assistant, tool = records[1], records[2]
+        assert assistant["name"] == "Assistant"
+        requested = assistant["toolCallsRequested"]
+        assert [call["requestId"] for call in requested] == ["call-0"]
+        assert tool["toolCallResponse"]["id"] == requested[0]["id"]
+
+    @m.it("compresses the stream on request")
+    async def test_gzip(self, setup_client):
+        client, headers, chat, contents = setup_client
+        response = await client.get(
+            f"/chats/{chat.id}/export", params={"gzip": True}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        # httpx decodes content-encoding transparently
+        lines = response.text.splitlines()
+        assert [json.loads(line)["content"] for line in lines] == contents
+
+    @m.it("fetches relations once per batch, not once per message")
+    async def test_batched_relations(self, setup_client, db_session, max_queries):
+        _, _, chat, contents = setup_client
+        chat_uid = chat.uid
+        db_session.expunge_all()
+        controller = MessageController(db_session)
+        # 30 messages in batches of 10: one cursor plus a tool call lookup per batch
+        with max_queries(4):
+            records = list(controller.export_chat_messages(chat_uid, batch_size=10))
+        assert [record["content"] for record in records] == contents
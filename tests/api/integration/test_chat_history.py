@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import insert, text, update
+
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+
+
+@m.describe("when reading a chat's history")
+class TestChatHistory:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="history", organization_id=org.id).create(db_session)
+        chat = Chat(name="audited", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, chat
+
+    def _add(self, db_session, chat_uid, content, offset):
+        uid = uuid4()
+        db_session.execute(
+            insert(Message).values(
+                uid=uid,
+                _chat_uid=chat_uid,
+                type=EventType.user_message,
+                content=content,
+                timestamp=datetime(2024, 6, 1, tzinfo=timezone.utc)
+                + timedelta(seconds=offset),
+            )
+        )
+        db_session.commit()
+        return uid
+
+    async def _history(self, client, headers, chat, at):
+        response = await client.get(
+            f"/chats/{chat.id}/history",
+            params={"at": at.isoformat()},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        return [json.loads(line)["content"] for line in response.text.splitlines()]
+
+    @m.it("shows the messages as they were at the given time")
+    async def test_point_in_time(self, setup_client, db_session):
+        client, headers, chat = setup_client
+        first = self._add(db_session, chat.uid, "first", 0)
+        second = self._add(db_session, chat.uid, "second", 1)
+        self._add(db_session, chat.uid, "third", 2)
+        before = db_session.scalar(text("SELECT now()"))
+        db_session.commit()
+
+        db_session.execute(
+            update(Message).where(Message.uid == first).values(content="edited")
+        )
+        db_session.execute(
+            update(Message).where(Message.uid == second).values(deleted=True)
+        )
+        db_session.commit()
+        self._add(db_session, chat.uid, "fourth", 3)
+
+        assert await self._history(client, headers, chat, before) == [
+            "first",
+            "second",
+            "third",
+        ]
+        assert await self._history(
+            client, headers, chat, datetime.now(timezone.utc)
+        ) == ["edited", "third", "fourth"]
+
+    @m.it("refuses chats outside the actor's organization")
+    async def test_unknown_chat(self, setup_client):
+        client, headers, _ = setup_client
+        response = await client.get(
+            "/chats/chat-00000000-0000-0000-0000-000000000000/history",
+            params={"at": datetime.now(timezone.utc).isoformat()},
+            headers=headers,
+        )
+        assert response.status_code == 404
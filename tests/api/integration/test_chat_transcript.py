@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import event, insert, update
+
+from app.controllers.chat import MessageController, transcript_cache
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+from app.models.tool import Tool
+
+
+@m.describe("when rendering a chat transcript")
+class TestChatTranscript:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="transcript", organization_id=org.id).create(db_session)
+        chat = Chat(name="transcript", project_id=project.id).create(db_session)
+        tool = Tool(
+            name="lookup", project_id=project.id, json_schema={"type": "object"}
+        ).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        messages = [
+            {"type": "system_message", "content": "be brief"},
+            {"type": "user_message", "content": "look it up", "name": "Ada L."},
+            {
+                "type": "assistant_message",
+                "content": "",
+                "toolCallsRequested": [
+                    {
+                        "toolId": tool.id,
+                        "requestId": "call-1",
+                        "parameters": {"term": "x"},
+                    }
+                ],
+            },
+            {
+                "type": "tool_message",
+                "content": "found",
+                "toolCallResponse": {"toolId": tool.id, "requestId": "call-1"},
+            },
+        ]
+        for offset, message in enumerate(messages):
+            message["timestamp"] = (start + timedelta(seconds=offset)).isoformat()
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        transcript_cache.clear()
+        yield client, auth_headers, chat, start
+        transcript_cache.clear()
+
+    def _append(self, db_session, chat, content, timestamp):
+        uid = uuid4()
+        db_session.execute(
+            insert(Message).values(
+                uid=uid,
+                _chat_uid=chat.uid,
+                type=EventType.user_message,
+                content=content,
+                timestamp=timestamp,
+            )
+        )
+        db_session.commit()
+        return uid
+
+    @m.it("renders OpenAI style messages with tool calls resolved")
+    async def test_transcript(self, setup_client):
+        client, headers, chat, _ = setup_client
+        response = await client.get(f"/chats/{chat.id}/transcript", headers=headers)
+        assert response.status_code == 200
+        assert response.json() == [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": "look it up", "name": "Ada_L_"},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": "call-1",
+                        "type": "function",
+                        "function": {"name": "lookup", "arguments": '{"term": "x"}'},
+                    }
+                ],
+            },
+            {"role": "tool", "content": "found", "tool_call_id": "call-1"},
+        ]
+
+    @m.it("renders only what was appended since the last call")
+    async def test_incremental(self, setup_client, db_session, monkeypatch):
+        _, _, chat, start = setup_client
+        controller = MessageController(db_session)
+        rendered = []
+        render = MessageController._to_transcript_message
+
+        def _counting(self, message, *args):
+            rendered.append(message.content)
+            return render(self, message, *args)
+
+        monkeypatch.setattr(MessageController, "_to_transcript_message", _counting)
+        assert len(controller.chat_transcript(chat.uid)) == 4
+        assert len(rendered) == 4
+
+        self._append(db_session, chat, "and then?", start + timedelta(minutes=1))
+        transcript = controller.chat_transcript(chat.uid)
+        assert transcript[-1] == {"role": "user", "content": "and then?"}
+        assert rendered[4:] == ["and then?"]
+
+        assert len(controller.chat_transcript(chat.uid)) == 5
+        assert len(rendered) == 5
+
+    @m.it("re-renders from an edited message on")
+    async def test_edit(self, setup_client, db_session):
+        _, _, chat, start = setup_client
+        controller = MessageController(db_session)
+        uid = self._append(
+            db_session, chat, "first draft", start + timedelta(minutes=1)
+        )
+        controller.chat_transcript(chat.uid)
+
+        db_session.execute(
+            update(Message).where(Message.uid == uid).values(content="final")
+        )
+        db_session.commit()
+        assert controller.chat_transcript(chat.uid)[-1]["content"] == "final"
+
+        db_session.execute(
+            update(Message).where(Message.uid == uid).values(deleted=True)
+        )
+        db_session.commit()
+        assert len(controller.chat_transcript(chat.uid)) == 4
+
+    @m.it("builds a long transcript in a constant number of queries")
+    async def test_queries(self, setup_client, db_session, max_queries):
+        _, _, chat, start = setup_client
+        for index in range(50):
+            self._append(db_session, chat, f"m{index}", start + timedelta(hours=index))
+        db_session.expunge_all()
+        bound = []
+
+        def _count_parameters(conn, cursor, statement, parameters, *args):
+            bound.append(len(parameters))
+
+        bind = db_session.get_bind()
+        event.listen(bind, "before_cursor_execute", _count_parameters)
+        try:
+            # versions, messages, tool calls, tool names; no personas in this chat
+            with max_queries(4):
+                transcript = MessageController(db_session).chat_transcript(chat.uid)
+        finally:
+            event.remove(bind, "before_cursor_execute", _count_parameters)
+        assert len(transcript) == 54
+        # selected by chat, not by listing every message's uid
+        assert max(bound) < 10
+        with max_queries(1):
+            MessageController(db_session).chat_transcript(chat.uid)
@@ -0,0 +1,69 @@
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+
+from app.controllers.mixins.collection_mixin import count_cache
+from app.models.chat import Chat
+from app.models.project import Project
+from app.settings import settings
+
+
+@m.describe("when choosing how a collection is counted")
+class TestCollectionCounts:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="counts", organization_id=org.id).create(db_session)
+        for index in range(12):
+            Chat(name=f"chat {index}", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers
+
+    @m.it("totals pages exactly by default")
+    async def test_exact(self, setup_client):
+        client, headers = setup_client
+        data = (
+            await client.get("/chats/", params={"perPage": 5}, headers=headers)
+        ).json()
+        assert data["pages"] == 3
+        assert data["hasMore"] is True
+
+    @m.it("skips the count and reports hasMore from a lookahead row")
+    async def test_none(self, setup_client):
+        client, headers = setup_client
+        params = {"perPage": 5, "count": "none"}
+        first = (await client.get("/chats/", params=params, headers=headers)).json()
+        last = (
+            await client.get("/chats/", params={**params, "page": 3}, headers=headers)
+        ).json()
+        assert first["pages"] is None
+        assert (len(first["items"]), first["hasMore"]) == (5, True)
+        assert (len(last["items"]), last["hasMore"]) == (2, False)
+
+    @m.it("estimates pages from the planner")
+    async def test_estimated(self, setup_client):
+        client, headers = setup_client
+        data = (
+            await client.get(
+                "/chats/", params={"perPage": 5, "count": "estimated"}, headers=headers
+            )
+        ).json()
+        assert isinstance(data["pages"], int)
+        assert len(data["items"]) == 5
+
+    @m.it("serves repeat exact counts from the cache when enabled")
+    async def test_cached(self, setup_client):
+        client, headers = setup_client
+        old_ttl = settings.collection_count_cache_ttl
+        count_cache.clear()
+        try:
+            settings.collection_count_cache_ttl = 30
+            for _ in range(3):
+                await client.get("/chats/", params={"perPage": 5}, headers=headers)
+            assert (count_cache.misses, count_cache.hits) == (1, 2)
+        finally:
+            settings.collection_count_cache_ttl = old_ttl
+            count_cache.clear()
@@ -0,0 +1,127 @@
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from pytest import mark as m
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.email_outbox import EmailOutbox
+from app.models.outbound_email import OutboundEmail
+from app.settings import settings
+
+
+class Inbox:
+    """an aiosmtpd handler keeping what it is sent"""
+
+    def __init__(self):
+        self.envelopes = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        self.sessions.add(id(session))
+        return "250 Message accepted for delivery"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@m.describe("when sending email from the outbox")
+class TestEmailOutbox:
+
+    @pytest.fixture
+    def smtp_server(self):
+        inbox = Inbox()
+        controller = Controller(
+            inbox,
+            hostname="127.0.0.1",
+            port=_free_port(),
+            authenticator=lambda *args: AuthResult(success=True),
+            auth_require_tls=False,
+        )
+        old_settings = settings.model_dump(exclude_none=True)
+        settings.smtp_email_host = controller.hostname
+        settings.smtp_email_port = controller.port
+        settings.smtp_email_user = "outbox@langstory.test"
+        settings.smtp_email_password = "password"
+        settings.smtp_email_starttls = False
+        controller.start()
+        try:
+            yield inbox, controller
+        finally:
+            controller.stop()
+            for k, v in old_settings.items():
+                setattr(settings, k, v)
+
+    @pytest.fixture
+    def outbox(self, db_session):
+        outbox = EmailOutbox(
+            session_factory=sessionmaker(bind=db_session.get_bind()),
+            batch_size=10,
+            backoff=30,
+            max_attempts=2,
+        )
+        yield outbox
+        outbox.close()
+
+    def _enqueue(self, outbox, db_session, count):
+        return [
+            outbox.enqueue(
+                db_session,
+                to_address=f"user{index}@langstory.test",
+                subject=f"hello {index}",
+                text_body="plain",
+                html_body="<p>html</p>",
+            )
+            for index in range(count)
+        ]
+
+    @m.it("sends a batch over one smtp connection")
+    def test_batch(self, db_session, outbox, smtp_server):
+        inbox, _ = smtp_server
+        emails = self._enqueue(outbox, db_session, 3)
+        assert outbox.send_batch() == 3
+        assert [envelope.rcpt_tos for envelope in inbox.envelopes] == [
+            [email.to_address] for email in emails
+        ]
+        assert len(inbox.sessions) == 1
+        db_session.expire_all()
+        assert all(email.sent_at for email in db_session.scalars(select(OutboundEmail)))
+        # nothing is due any more
+        assert outbox.send_batch() == 0
+
+    @m.it("reconnects when the kept connection has gone away")
+    def test_reconnect(self, db_session, outbox, smtp_server):
+        inbox, _ = smtp_server
+        self._enqueue(outbox, db_session, 1)
+        outbox.send_batch()
+        outbox._smtp.sock.close()
+        self._enqueue(outbox, db_session, 1)
+        assert outbox.send_batch() == 1
+        assert len(inbox.envelopes) == 2
+
+    @m.it("backs off after a failure and gives up after max_attempts")
+    def test_retry(self, db_session, outbox, smtp_server):
+        # nothing listens here
+        settings.smtp_email_port = _free_port()
+        (queued,) = self._enqueue(outbox, db_session, 1)
+        before = datetime.now(timezone.utc)
+        assert outbox.send_batch() == 1
+        email = db_session.get(OutboundEmail, queued.uid, populate_existing=True)
+        assert email.attempts == 1 and email.last_error
+        assert email.next_attempt_at >= before + timedelta(seconds=30)
+        # not due yet
+        assert outbox.send_batch() == 0
+
+        email.next_attempt_at = before
+        db_session.commit()
+        assert outbox.send_batch() == 1
+        email = db_session.get(OutboundEmail, queued.uid, populate_existing=True)
+        assert email.attempts == 2
+        assert email.failed_at is not None and email.sent_at is None
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from pytest import mark as m
+from sqlalchemy import select, text
+
+from app.controllers.auth import JWTTokenFlow
+from app.controllers.chat import MessageController
+from app.controllers.project import ProjectController
+from app.database import explain
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.project import Project
+from app.models.tool_call import ToolCall
+from app.schemas.user_schemas import ScopedUser
+
+
+@m.describe("when planning the hot collection queries")
+class TestIndexes:
+
+    @pytest.fixture
+    def actor(self, db_session, org_member, auth_headers):
+        token = auth_headers["Authorization"].split(" ", 1)[1]
+        return ScopedUser.from_jwt(JWTTokenFlow.decode_token(token))
+
+    @pytest.fixture
+    def chat(self, db_session, org_member):
+        _, org = org_member
+        project = Project(name="indexes", organization_id=org.id).create(db_session)
+        return Chat(name="indexed", project_id=project.id).create(db_session)
+
+    def _plan(self, db_session, query) -> str:
+        # tiny test tables are always cheapest to scan, so ask whether the
+        # planner *can* use an index rather than whether it would at this size
+        db_session.execute(text("SET LOCAL enable_seqscan = off"))
+        return json.dumps(db_session.scalar(explain(query)))
+
+    @m.it("pages chat messages off the chat/timestamp index")
+    def test_messages(self, db_session, actor, chat):
+        _, page_query, _ = MessageController(db_session)._build_paginated_query(
+            Message,
+            actor,
+            1,
+            25,
+            "timestamp",
+            "asc",
+            None,
+            select(Message).where(Message._chat_uid == chat.uid),
+        )
+        assert "ix_message_chat_timestamp" in self._plan(db_session, page_query)
+
+    @m.it("pages projects off the organization index")
+    def test_projects(self, db_session, actor):
+        _, page_query, _ = ProjectController(db_session)._build_paginated_query(
+            Project, actor, 1, 25, None, None, None, None
+        )
+        assert "ix_project_organization_created_at" in self._plan(
+            db_session, page_query
+        )
+
+    @m.it("rebuilds a chat's history off the archive's message/chat index")
+    def test_chat_history(self, db_session, chat):
+        query = MessageController(db_session)._history_query(
+            chat.uid, datetime.now(timezone.utc)
+        )
+        assert "ix_archives_message_chat" in self._plan(db_session, query)
+
+    @m.it("searches message content by index, words and substrings")
+    def test_message_search(self, db_session):
+        query = select(Message.uid).where(Message.search_lookup("dragon"))
+        assert "ix_message_search_vector" in self._plan(db_session, query)
+        query = select(Message.uid).where(Message.content.ilike("%drago%"))
+        assert "ix_message_content_trgm" in self._plan(db_session, query)
+
+    @m.it("finds a message's tool calls by index")
+    def test_tool_calls(self, db_session):
+        query = select(ToolCall).where(ToolCall._assistant_message_uid == uuid4())
+        assert "ix_tool_call_assistant_message" in self._plan(db_session, query)
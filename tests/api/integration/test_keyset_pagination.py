@@ -0,0 +1,99 @@
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import update
+
+from app.models.chat import Chat
+from app.models.project import Project
+
+
+@m.describe("when paging chats with cursors")
+class TestKeysetPagination:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="paging", organization_id=org.id).create(db_session)
+        for index in range(23):
+            Chat(name=f"chat {index}", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers
+
+    @m.it("walks the same items as page numbers, forwards and back")
+    async def test_cursor_walk(self, setup_client):
+        client, headers = setup_client
+        by_page = []
+        for page in (1, 2, 3):
+            response = await client.get(
+                "/chats/", params={"perPage": 10, "page": page}, headers=headers
+            )
+            by_page.extend(item["id"] for item in response.json()["items"])
+
+        by_cursor = []
+        pages = []
+        params = {"perPage": 10}
+        while True:
+            data = (await client.get("/chats/", params=params, headers=headers)).json()
+            pages.append(data)
+            by_cursor.extend(item["id"] for item in data["items"])
+            if not data["nextCursor"]:
+                break
+            params = {"perPage": 10, "after": data["nextCursor"]}
+
+        assert by_cursor == by_page
+        assert len(by_cursor) == 23
+        assert [len(page["items"]) for page in pages] == [10, 10, 3]
+        assert pages[1]["page"] is None
+
+        response = await client.get(
+            "/chats/",
+            params={"perPage": 10, "before": pages[2]["prevCursor"]},
+            headers=headers,
+        )
+        assert response.json()["items"] == pages[1]["items"]
+
+    @m.it("keeps rows with a NULL sort value on cursor pages")
+    async def test_null_order_values(self, setup_client, db_session):
+        client, headers = setup_client
+        # a few described chats, the rest sort as NULL
+        for index in range(5):
+            db_session.execute(
+                update(Chat)
+                .where(Chat.name == f"chat {index}")
+                .values(description=f"described {index}")
+            )
+        db_session.commit()
+
+        for order_dir in ("asc", "desc"):
+            base = {"perPage": 4, "orderBy": "description", "orderDir": order_dir}
+            by_page = []
+            for page in range(1, 7):
+                response = await client.get(
+                    "/chats/", params={**base, "page": page}, headers=headers
+                )
+                by_page.extend(item["id"] for item in response.json()["items"])
+
+            by_cursor = []
+            params = base
+            while True:
+                response = await client.get("/chats/", params=params, headers=headers)
+                assert response.status_code == 200
+                data = response.json()
+                by_cursor.extend(item["id"] for item in data["items"])
+                if not data["nextCursor"]:
+                    break
+                params = {**base, "after": data["nextCursor"]}
+
+            assert len(by_page) == 23
+            assert by_cursor == by_page, order_dir
+
+    @m.it("rejects a cursor it did not mint")
+    async def test_bad_cursor(self, setup_client):
+        client, headers = setup_client
+        response = await client.get(
+            "/chats/", params={"after": "not-a-cursor"}, headers=headers
+        )
+        assert response.status_code == 400
+        assert response.json() == {"detail": {"message": "invalid pagination cursor"}}
@@ -0,0 +1,62 @@
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy.orm import Session
+
+from app.controllers.auth import authenticate
+from app.models.user import User
+from app.passwords import PasswordHasher, password_hasher
+
+
+@m.describe("when logging in with a username and password")
+class TestLogin:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session):
+        client = AsyncClient(
+            app=override_app,
+            follow_redirects=True,
+            base_url="http://test/auth/username-password",
+        )
+        # hashed before the argon2 settings were raised
+        stale = PasswordHasher(time_cost=1, memory_cost=1024, parallelism=1)
+        user = User(
+            email_address="login@mail.em",
+            password=stale.context.hash("passwordof8"),
+        ).create(db_session)
+        yield client, user
+
+    @m.it("rehashes a stale password on a successful login")
+    async def test_rehash(self, setup_client, db_session):
+        client, user = setup_client
+        response = await client.post(
+            "/login", data={"username": user.email_address, "password": "passwordof8"}
+        )
+        assert response.status_code == 200
+        # the fixture's user was detached by create, read the row again
+        stored = db_session.get(User, user.uid, populate_existing=True)
+        assert not password_hasher.context.needs_update(stored.password)
+        assert password_hasher.context.verify("passwordof8", stored.password)
+
+    @m.it("commits the new hash through the session it authenticates with")
+    async def test_rehash_in_session(self, setup_client, db_session):
+        _, user = setup_client
+        authenticated = await authenticate(
+            db_session, user.email_address, "passwordof8"
+        )
+        assert authenticated.uid == user.uid
+        # a session of its own only sees what was committed
+        with Session(bind=db_session.get_bind()) as session:
+            stored = session.get(User, user.uid)
+            assert not password_hasher.context.needs_update(stored.password)
+            assert password_hasher.context.verify("passwordof8", stored.password)
+
+    @m.it("refuses the wrong password and leaves the hash alone")
+    async def test_wrong_password(self, setup_client, db_session):
+        client, user = setup_client
+        response = await client.post(
+            "/login", data={"username": user.email_address, "password": "incorrect"}
+        )
+        assert response.status_code == 401
+        stored = db_session.get(User, user.uid, populate_existing=True)
+        assert stored.password == user.password
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import select
+
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.project import Project
+from app.models.tool import Tool
+from app.models.tool_call import ToolCall
+
+
+@m.describe("when importing a batch of messages")
+class TestMessageBatch:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="import", organization_id=org.id).create(db_session)
+        chat = Chat(name="transcript", project_id=project.id).create(db_session)
+        tool = Tool(
+            name="lookup", project_id=project.id, json_schema={"type": "object"}
+        ).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, chat, tool
+
+    def _transcript(self, turns: int, tool_id: str) -> list:
+        start = datetime.now(timezone.utc)
+        messages = []
+        for index in range(turns):
+            timestamp = (start + timedelta(seconds=index)).isoformat()
+            match index % 3:
+                case 0:
+                    messages.append(
+                        {
+                            "type": "user_message",
+                            "content": f"q{index}",
+                            "timestamp": timestamp,
+                        }
+                    )
+                case 1:
+                    messages.append(
+                        {
+                            "type": "assistant_message",
+                            "content": f"a{index}",
+                            "timestamp": timestamp,
+                            "toolCallsRequested": [
+                                {"toolId": tool_id, "requestId": f"call-{index}"}
+                            ],
+                        }
+                    )
+                case 2:
+                    messages.append(
+                        {
+                            "type": "tool_message",
+                            "content": f"r{index}",
+                            "timestamp": timestamp,
+                            "toolCallResponse": {
+                                "toolId": tool_id,
+                                "requestId": f"call-{index - 1}",
+                            },
+                        }
+                    )
+        return messages
+
+    @m.it("inserts every message and tool call with a fixed number of queries")
+    async def test_batch(self, setup_client, db_session, max_queries):
+        client, headers, chat, tool = setup_client
+        messages = self._transcript(300, tool.id)
+        with max_queries(6):
+            response = await client.post(
+                f"/chats/{chat.id}/messages:batch",
+                json={"messages": messages},
+                headers=headers,
+            )
+        assert response.status_code == 200
+        ids = response.json()["ids"]
+        assert len(ids) == 300
+
+        stored = db_session.scalars(
+            select(Message).where(Message._chat_uid == chat.uid)
+        ).all()
+        by_id = {message.id: message for message in stored}
+        contents = [message["content"] for message in messages]
+        assert [by_id[id_].content for id_ in ids] == contents
+        linked = db_session.scalars(
+            select(ToolCall).where(ToolCall._tool_message_uid.is_not(None))
+        ).all()
+        assert len(linked) == 100
+
+    @m.it("rejects a batch that references a tool outside the organization")
+    async def test_unknown_tool(self, setup_client):
+        client, headers, chat, _ = setup_client
+        messages = self._transcript(3, "tool-123e4567-e89b-12d3-a456-426614174000")
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages},
+            headers=headers,
+        )
+        assert response.status_code == 404
+
+    @m.it("rejects a request id used twice in one batch")
+    async def test_duplicate_request_id(self, setup_client):
+        client, headers, chat, tool = setup_client
+        messages = self._transcript(6, tool.id)
+        messages[4]["toolCallsRequested"][0]["requestId"] = "call-1"
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages},
+            headers=headers,
+        )
+        assert response.status_code == 422
+
+    @m.it("only records responses against assistant messages in the chat")
+    async def test_foreign_assistant_message(self, setup_client, db_session):
+        client, headers, chat, tool = setup_client
+        other = Chat(name="other", project_id=chat.project_id).create(db_session)
+        response = await client.post(
+            f"/chats/{other.id}/messages:batch",
+            json={"messages": self._transcript(2, tool.id)},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assistant_uid = Message.to_uid(response.json()["ids"][1])
+
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={
+                "messages": [
+                    {
+                        "type": "tool_message",
+                        "content": "result",
+                        "timestamp": datetime.now(timezone.utc).isoformat(),
+                        "toolCallResponse": {
+                            "toolId": tool.id,
+                            "requestId": "call-1",
+                            "assistantMessageId": f"assistantmessage-{assistant_uid}",
+                        },
+                    }
+                ]
+            },
+            headers=headers,
+        )
+        assert response.status_code == 404
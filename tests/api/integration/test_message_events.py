@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+
+from app.models.chat import Chat
+from app.models.project import Project
+
+
+@m.describe("when streaming chat message events")
+class TestMessageEvents:
+
+    @pytest.fixture
+    async def setup_client(
+        self, override_app, message_events, db_session, org_member, auth_headers
+    ):
+        _, org = org_member
+        project = Project(name="events", organization_id=org.id).create(db_session)
+        chat = Chat(name="live", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, chat, message_events
+
+    @m.it("pushes a new message to the chat's subscribers")
+    async def test_new_message(self, setup_client):
+        client, headers, chat, events = setup_client
+        async with events.subscribe(chat.uid) as queue:
+            response = await client.post(
+                f"/chats/{chat.id}/messages",
+                json={
+                    "type": "user_message",
+                    "content": "hello",
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                },
+                headers=headers,
+            )
+            assert response.status_code == 200
+            frame = await asyncio.wait_for(queue.get(), timeout=5)
+        fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+        assert fields["id"] == response.json()["id"]
+        assert fields["event"] == "message.created"
+        assert json.loads(fields["data"])["content"] == "hello"
+
+    @m.it("streams a new message from the events endpoint")
+    async def test_endpoint(self, setup_client):
+        client, headers, chat, events = setup_client
+
+        async def _subscribed(count: int):
+            while len(events._subscribers.get(chat.uid, ())) < count:
+                await asyncio.sleep(0.01)
+
+        # a queue of our own tells us when the stream has been sent the event
+        async with events.subscribe(chat.uid) as queue:
+            stream = asyncio.create_task(
+                client.get(f"/chats/{chat.id}/events", headers=headers)
+            )
+            await asyncio.wait_for(_subscribed(2), timeout=5)
+            response = await client.post(
+                f"/chats/{chat.id}/messages",
+                json={
+                    "type": "user_message",
+                    "content": "hello",
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                },
+                headers=headers,
+            )
+            assert response.status_code == 200
+            await asyncio.wait_for(queue.get(), timeout=5)
+            # the test client returns once the body ends, which stopping ends
+            await events.stop()
+            streamed = await asyncio.wait_for(stream, timeout=5)
+
+        assert streamed.status_code == 200
+        assert streamed.headers["content-type"].startswith("text/event-stream")
+        frames = [
+            frame
+            for frame in streamed.text.split("\n\n")
+            if frame and not frame.startswith(":")
+        ]
+        fields = dict(line.split(": ", 1) for line in frames[0].splitlines())
+        assert fields["id"] == response.json()["id"]
+        assert fields["event"] == "message.created"
+        assert json.loads(fields["data"])["content"] == "hello"
+
+    @m.it("ends open streams when the listener stops")
+    async def test_stop(self, setup_client):
+        _, _, chat, events = setup_client
+        async with events.subscribe(chat.uid) as queue:
+            await events.stop()
+            assert await asyncio.wait_for(queue.get(), timeout=1) is None
+
+    @m.it("refuses chats outside the actor's organization")
+    async def test_unknown_chat(self, setup_client):
+        client, headers, _, _ = setup_client
+        response = await client.get(
+            "/chats/chat-00000000-0000-0000-0000-000000000000/events", headers=headers
+        )
+        assert response.status_code == 404
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import insert
+
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+
+
+@m.describe("when searching messages")
+class TestMessageSearch:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="search", organization_id=org.id).create(db_session)
+        chats = [
+            Chat(name=name, project_id=project.id).create(db_session)
+            for name in ("first", "second")
+        ]
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, project, chats
+
+    def _add(self, db_session, chat, *contents):
+        start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        db_session.execute(
+            insert(Message),
+            [
+                dict(
+                    uid=uuid4(),
+                    _chat_uid=chat.uid,
+                    type=EventType.user_message,
+                    content=content,
+                    timestamp=start + timedelta(seconds=offset),
+                )
+                for offset, content in enumerate(contents)
+            ],
+        )
+        db_session.commit()
+
+    @m.it("ranks matches and marks them in the snippet")
+    async def test_chat(self, setup_client, db_session):
+        client, headers, _, (chat, _) = setup_client
+        self._add(
+            db_session,
+            chat,
+            "the dragon slept",
+            "dragons guard the hoard, every dragon guards its hoard",
+            "nothing to see here",
+        )
+        response = await client.get(
+            f"/chats/{chat.id}/messages:search",
+            params={"q": "dragon hoard"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert [item["content"] for item in body["items"]] == [
+            "dragons guard the hoard, every dragon guards its hoard"
+        ]
+        assert "<mark>hoard</mark>" in body["items"][0]["snippet"]
+        assert body["items"][0]["chatId"] == chat.id
+        assert body["hasMore"] is False
+
+        response = await client.get(
+            f"/chats/{chat.id}/messages:search",
+            params={"q": "dragon", "perPage": 1},
+            headers=headers,
+        )
+        body = response.json()
+        assert len(body["items"]) == 1
+        assert body["items"][0]["content"].startswith("dragons guard")
+        assert body["hasMore"] is True
+
+    @m.it("searches every chat of a project")
+    async def test_project(self, setup_client, db_session):
+        client, headers, project, (first, second) = setup_client
+        self._add(db_session, first, "a castle by the sea")
+        self._add(db_session, second, "castles in the air")
+        response = await client.get(
+            f"/projects/{project.id}/messages:search",
+            params={"q": "castle"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert {item["chatId"] for item in response.json()["items"]} == {
+            first.id,
+            second.id,
+        }
+
+    @m.it("filters a chat's messages with the search: term")
+    async def test_power_filter(self, setup_client, db_session):
+        client, headers, _, (chat, _) = setup_client
+        self._add(db_session, chat, "the knights rode north", "the ship sailed")
+        response = await client.get(
+            f"/chats/{chat.id}/messages",
+            params={"query": "search:knight"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert [item["content"] for item in response.json()["items"]] == [
+            "the knights rode north"
+        ]
+
+    @m.it("refuses chats and projects outside the actor's organization")
+    async def test_unknown(self, setup_client):
+        client, headers, _, _ = setup_client
+        for path in (
+            "/chats/chat-00000000-0000-0000-0000-000000000000/messages:search",
+            "/projects/project-00000000-0000-0000-0000-000000000000/messages:search",
+        ):
+            response = await client.get(path, params={"q": "x"}, headers=headers)
+            assert response.status_code == 404
@@ -0,0 +1,50 @@
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+
+from app.models.project import Project
+from app.models.tool import Tool
+from app.query_metrics import track_queries
+
+
+@m.describe("when listing projects with tools")
+class TestProjectQueries:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        # Base.create closes the session, which detaches the org; keep its id
+        org = db_session.merge(org_member[1])
+        yield client, auth_headers, org.id
+
+    def _add_projects(self, db_session, org_id: str, count: int):
+        for index in range(count):
+            project = Project(name=f"project {index}", organization_id=org_id).create(
+                db_session
+            )
+            for tool_index in range(3):
+                Tool(
+                    name=f"tool {tool_index}",
+                    project_id=project.id,
+                    json_schema={"type": "object"},
+                ).create(db_session)
+
+    async def _count_queries(self, client, url, headers) -> int:
+        with track_queries() as stats:
+            response = await client.get(url, headers=headers)
+        assert response.status_code == 200
+        return stats.count
+
+    @m.it("uses the same number of queries for 1 project as for 10")
+    async def test_no_n_plus_one(self, db_session, setup_client):
+        client, headers, org_id = setup_client
+        self._add_projects(db_session, org_id, 1)
+        single = await self._count_queries(client, "/projects/", headers)
+        self._add_projects(db_session, org_id, 9)
+        page = await self._count_queries(client, "/projects/", headers)
+        assert page == single
+
+        response = await client.get("/projects/", headers=headers)
+        assert all(len(item["tools"]) == 3 for item in response.json()["items"])
@@ -0,0 +1,37 @@
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+
+from app.models.chat import Chat
+from app.models.project import Project
+
+
+@m.describe("when a request runs SQL")
+class TestQueryMetrics:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="metrics", organization_id=org.id).create(db_session)
+        for index in range(5):
+            Chat(name=f"chat {index}", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers
+
+    @m.it("reports database time in the Server-Timing header")
+    async def test_server_timing(self, setup_client):
+        client, headers = setup_client
+        response = await client.get("/chats/", headers=headers)
+        timing = response.headers["server-timing"]
+        assert timing.startswith("db;dur=")
+        assert '"2 queries"' in timing
+
+    @m.it("lists chats in a count and a page query")
+    async def test_chat_list_budget(self, setup_client, max_queries):
+        client, headers = setup_client
+        with max_queries(2):
+            await client.get("/chats/", headers=headers)
+        with max_queries(1):
+            await client.get("/chats/", params={"count": "none"}, headers=headers)
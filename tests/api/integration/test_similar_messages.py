@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.embedding_backfill import EmbeddingBackfill
+from app.embeddings import HashingEmbedder, get_embedding_provider
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.message_embedding import MessageEmbedding
+from app.models.project import Project
+
+
+@m.describe("when finding similar messages")
+class TestSimilarMessages:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="similar", organization_id=org.id).create(db_session)
+        chats = [
+            Chat(name=name, project_id=project.id).create(db_session)
+            for name in ("first", "second")
+        ]
+        override_app.dependency_overrides[get_embedding_provider] = HashingEmbedder
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, project, chats
+        del override_app.dependency_overrides[get_embedding_provider]
+
+    @pytest.fixture
+    def backfill(self, db_session):
+        return EmbeddingBackfill(
+            session_factory=sessionmaker(bind=db_session.get_bind()),
+            provider=HashingEmbedder(),
+            batch_size=2,
+        )
+
+    def _add(self, db_session, chat, *contents):
+        start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        rows = [
+            dict(
+                uid=uuid4(),
+                _chat_uid=chat.uid,
+                type=EventType.user_message,
+                content=content,
+                timestamp=start + timedelta(seconds=offset),
+            )
+            for offset, content in enumerate(contents)
+        ]
+        db_session.execute(insert(Message), rows)
+        db_session.commit()
+        return [row["uid"] for row in rows]
+
+    @m.it("embeds every message in batches, and edited ones again")
+    def test_backfill(self, db_session, setup_client, backfill):
+        _, _, _, (chat, _) = setup_client
+        uids = self._add(db_session, chat, "one", "two", "three", "four", "five")
+        assert backfill.run_pass() == 5
+        assert backfill.run_pass() == 0
+
+        db_session.execute(
+            update(Message).where(Message.uid == uids[0]).values(content="uno")
+        )
+        db_session.commit()
+        assert backfill.run_pass() == 1
+        assert len(db_session.scalars(select(MessageEmbedding)).all()) == 5
+
+    @m.it("returns the project's nearest messages first")
+    async def test_similar(self, db_session, setup_client, backfill):
+        client, headers, project, (first, second) = setup_client
+        self._add(db_session, first, "the dragon sleeps on its gold", "bread")
+        self._add(db_session, second, "a sleeping dragon", "the market at noon")
+        backfill.run_pass()
+
+        response = await client.get(
+            f"/projects/{project.id}/messages/similar",
+            params={"q": "sleeping dragon", "limit": 2},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [item["content"] for item in items] == [
+            "a sleeping dragon",
+            "the dragon sleeps on its gold",
+        ]
+        assert items[0]["distance"] < items[1]["distance"]
+
+    @m.it("refuses projects outside the actor's organization")
+    async def test_unknown_project(self, setup_client):
+        client, headers, _, _ = setup_client
+        response = await client.get(
+            "/projects/project-00000000-0000-0000-0000-000000000000/messages/similar",
+            params={"q": "dragon"},
+            headers=headers,
+        )
+        assert response.status_code == 404
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import update
+
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+from app.models.thread import Thread
+
+
+@m.describe("when reading and editing thread messages")
+class TestThreadMessages:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="threads", organization_id=org.id).create(db_session)
+        chat = Chat(name="chat", project_id=project.id).create(db_session)
+        thread = Thread(name="thread", chat_id=chat.id).create(db_session)
+        start = datetime.now(timezone.utc)
+        messages = [
+            Message(
+                chat_id=chat.id,
+                type=EventType.user_message,
+                content="x" * 10_000,
+                timestamp=start + timedelta(seconds=index),
+            ).create(db_session)
+            for index in range(3)
+        ]
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        yield client, auth_headers, thread, [message.id for message in messages]
+
+    @m.it("adds and removes messages and lists their ids in timestamp order")
+    async def test_add_remove(self, setup_client):
+        client, headers, thread, message_ids = setup_client
+        for message_id in reversed(message_ids):
+            response = await client.post(
+                f"/threads/{thread.id}/messages/{message_id}", headers=headers
+            )
+            assert response.status_code == 200
+        assert response.json()["messageIds"] == message_ids
+
+        response = await client.delete(
+            f"/threads/{thread.id}/messages/{message_ids[1]}", headers=headers
+        )
+        assert response.json()["messageIds"] == [message_ids[0], message_ids[2]]
+
+        listed = (await client.get("/threads/", headers=headers)).json()["items"]
+        assert listed[0]["messageIds"] == [message_ids[0], message_ids[2]]
+
+    @m.it("filters a thread's messages by the power filter query")
+    async def test_query(self, setup_client):
+        client, headers, thread, message_ids = setup_client
+        for message_id in message_ids:
+            await client.post(
+                f"/threads/{thread.id}/messages/{message_id}", headers=headers
+            )
+        url = f"/threads/{thread.id}/messages"
+        listed = (await client.get(url, headers=headers)).json()["items"]
+        assert len(listed) == len(message_ids)
+
+        filtered = await client.get(
+            url, params={"query": "content:nothing"}, headers=headers
+        )
+        assert filtered.status_code == 200
+        assert filtered.json()["items"] == []
+
+    @m.it("leaves deleted messages out of the thread's message ids")
+    async def test_deleted(self, setup_client, db_session):
+        client, headers, thread, message_ids = setup_client
+        for message_id in message_ids:
+            response = await client.post(
+                f"/threads/{thread.id}/messages/{message_id}", headers=headers
+            )
+        assert response.json()["messageIds"] == message_ids
+
+        db_session.execute(
+            update(Message)
+            .where(Message.uid == Message.to_uid(message_ids[1]))
+            .values(deleted=True)
+        )
+        db_session.commit()
+        response = await client.get(f"/threads/{thread.id}", headers=headers)
+        assert response.json()["messageIds"] == [message_ids[0], message_ids[2]]
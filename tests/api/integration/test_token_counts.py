@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.controllers.chat import transcript_cache
+from app.models.chat import Chat
+from app.models.message import EventType, Message
+from app.models.project import Project
+from app.token_backfill import TokenCountBackfill
+
+# with the estimating tokenizer: one token a word, four more per message
+CONTENTS = ["be brief", "a b c", "d e f", "g h i", "j k l"]
+
+
+@m.describe("when counting a chat's tokens")
+class TestTokenCounts:
+
+    @pytest.fixture
+    async def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="tokens", organization_id=org.id).create(db_session)
+        chat = Chat(name="tokens", project_id=project.id).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        messages = [
+            {
+                "type": "system_message" if index == 0 else "user_message",
+                "content": content,
+                "timestamp": (start + timedelta(seconds=index)).isoformat(),
+            }
+            for index, content in enumerate(CONTENTS)
+        ]
+        response = await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        transcript_cache.clear()
+        yield client, auth_headers, chat
+        transcript_cache.clear()
+
+    async def _transcript(self, client, headers, chat, **params):
+        response = await client.get(
+            f"/chats/{chat.id}/transcript", params=params, headers=headers
+        )
+        assert response.status_code == 200
+        return [message["content"] for message in response.json()]
+
+    @m.it("stores each message's count when it is written")
+    async def test_stored(self, setup_client, db_session):
+        _, _, chat = setup_client
+        counts = db_session.scalars(
+            select(Message.token_count)
+            .where(Message._chat_uid == chat.uid)
+            .order_by(Message.timestamp)
+        ).all()
+        assert counts == [2, 3, 3, 3, 3]
+
+    def _add_uncounted(self, db_session, chat, content: str):
+        """a message stored before token counts were"""
+        uid = uuid4()
+        db_session.execute(
+            insert(Message).values(
+                uid=uid,
+                _chat_uid=chat.uid,
+                type=EventType.user_message,
+                content=content,
+                timestamp=datetime(2024, 6, 2, tzinfo=timezone.utc),
+            )
+        )
+        db_session.commit()
+        return uid
+
+    @m.it("sums the chat, counting messages written without a count")
+    async def test_total(self, setup_client, db_session):
+        client, headers, chat = setup_client
+        uid = self._add_uncounted(db_session, chat, "m n o")
+        response = await client.get(f"/chats/{chat.id}/tokens", headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {
+            "tokenizer": "estimate",
+            "messageCount": 6,
+            "tokenCount": 17 + 6 * 4,
+        }
+        response = await client.get(
+            f"/chats/{chat.id}/transcript", params={"maxTokens": 7}, headers=headers
+        )
+        assert [message["content"] for message in response.json()] == ["m n o"]
+        # counted for the responses, the row is left to the backfill
+        stored = db_session.scalar(
+            select(Message.token_count).where(Message.uid == uid)
+        )
+        assert stored is None
+
+    @m.it("stores the missing counts when the backfill runs")
+    async def test_backfill(self, setup_client, db_session):
+        _, _, chat = setup_client
+        uids = [
+            self._add_uncounted(db_session, chat, content)
+            for content in ("m n o", "p q")
+        ]
+        backfill = TokenCountBackfill(
+            session_factory=sessionmaker(bind=db_session.get_bind()), batch_size=1
+        )
+        assert backfill.run_pass() == 2
+        counts = db_session.scalars(
+            select(Message.token_count)
+            .where(Message.uid.in_(uids))
+            .order_by(Message.content)
+        ).all()
+        assert counts == [3, 2]
+        assert backfill.run_pass() == 0
+
+    @m.it("keeps the latest messages that fit")
+    async def test_tail(self, setup_client):
+        client, headers, chat = setup_client
+        assert await self._transcript(client, headers, chat, maxTokens=14) == [
+            "g h i",
+            "j k l",
+        ]
+        assert await self._transcript(client, headers, chat, maxTokens=13) == ["j k l"]
+        assert len(await self._transcript(client, headers, chat)) == 5
+
+    @m.it("keeps the system messages and fills the rest with the latest")
+    async def test_keep_system(self, setup_client):
+        client, headers, chat = setup_client
+        assert await self._transcript(
+            client, headers, chat, maxTokens=14, truncate="keep_system"
+        ) == ["be brief", "j k l"]
+        assert await self._transcript(
+            client, headers, chat, maxTokens=5, truncate="keep_system"
+        ) == ["be brief"]
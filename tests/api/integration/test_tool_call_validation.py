@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from pytest import mark as m
+from sqlalchemy import func, select
+
+from app import tool_validators
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.project import Project
+from app.models.tool import Tool
+from app.tool_validators import validator_cache
+
+PARAMETERS = {
+    "type": "object",
+    "properties": {"city": {"type": "string"}},
+    "required": ["city"],
+}
+
+
+@m.describe("when validating tool call arguments")
+class TestToolCallValidation:
+
+    @pytest.fixture
+    def setup_client(self, override_app, db_session, org_member, auth_headers):
+        _, org = org_member
+        project = Project(name="tools", organization_id=org.id).create(db_session)
+        chat = Chat(name="weather", project_id=project.id).create(db_session)
+        tool = Tool(
+            name="weather",
+            project_id=project.id,
+            json_schema={"name": "weather", "parameters": PARAMETERS},
+        ).create(db_session)
+        client = AsyncClient(
+            app=override_app, follow_redirects=True, base_url="http://test"
+        )
+        validator_cache.clear()
+        yield client, auth_headers, chat, tool
+        validator_cache.clear()
+
+    async def _import(self, client, headers, chat, tool, *arguments):
+        timestamp = datetime.now(timezone.utc).isoformat()
+        messages = [
+            {
+                "type": "assistant_message",
+                "content": "",
+                "timestamp": timestamp,
+                "toolCallsRequested": [
+                    {
+                        "toolId": tool.id,
+                        "requestId": f"call-{index}",
+                        "parameters": args,
+                    }
+                    for index, args in enumerate(arguments)
+                ],
+            }
+        ]
+        return await client.post(
+            f"/chats/{chat.id}/messages:batch",
+            json={"messages": messages},
+            headers=headers,
+        )
+
+    @m.it("rejects a batch with arguments that don't match the tool's schema")
+    async def test_invalid(self, setup_client):
+        client, headers, chat, tool = setup_client
+        response = await self._import(
+            client, headers, chat, tool, {"city": "Oslo"}, {"town": "Oslo"}
+        )
+        assert response.status_code == 400
+        message = response.json()["detail"]["message"]
+        assert "call-1" in message and "city" in message
+
+    @m.it("rejects a single message with arguments that don't match")
+    async def test_invalid_single(self, setup_client, db_session):
+        client, headers, chat, tool = setup_client
+        response = await client.post(
+            f"/chats/{chat.id}/messages",
+            json={
+                "type": "assistant_message",
+                "content": "",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "toolCallsRequested": [
+                    {
+                        "toolId": tool.id,
+                        "requestId": "call-0",
+                        "parameters": {"town": "Oslo"},
+                    }
+                ],
+            },
+            headers=headers,
+        )
+        assert response.status_code == 400
+        assert "call-0" in response.json()["detail"]["message"]
+        stored = db_session.scalar(
+            select(func.count(Message.uid)).where(Message._chat_uid == chat.uid)
+        )
+        assert stored == 0
+
+    @m.it("compiles each tool's schema once however many calls use it")
+    async def test_compiled_once(self, setup_client, monkeypatch):
+        client, headers, chat, tool = setup_client
+        compiled = []
+        compile_validator = tool_validators.compile_validator
+
+        def _counting(json_schema):
+            compiled.append(json_schema)
+            return compile_validator(json_schema)
+
+        monkeypatch.setattr(tool_validators, "compile_validator", _counting)
+        arguments = [{"city": f"city {index}"} for index in range(500)]
+        for _ in range(2):
+            response = await self._import(client, headers, chat, tool, *arguments)
+            assert response.status_code == 200
+        assert len(compiled) == 1
+
+    @m.it("validates against a tool's new schema once it is updated")
+    async def test_updated(self, setup_client):
+        client, headers, chat, tool = setup_client
+        response = await self._import(client, headers, chat, tool, {"city": "Oslo"})
+        assert response.status_code == 200
+
+        response = await client.put(
+            f"/tools/{tool.id}",
+            json={
+                "name": "weather",
+                "projectId": tool.project_id,
+                "jsonSchema": {**PARAMETERS, "required": ["city", "day"]},
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200
+        response = await self._import(client, headers, chat, tool, {"city": "Bergen"})
+        assert response.status_code == 400
+
+    @m.it("refuses a tool whose schema isn't one")
+    async def test_invalid_schema(self, setup_client):
+        client, headers, _, tool = setup_client
+        response = await client.post(
+            "/tools/",
+            json={
+                "name": "broken",
+                "projectId": tool.project_id,
+                "jsonSchema": {"type": "object", "required": "city"},
+            },
+            headers=headers,
+        )
+        assert response.status_code == 400
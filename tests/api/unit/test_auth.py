@@ -1,11 +1,14 @@
 import pytest
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
+from time import monotonic, time
 from jwt.exceptions import ExpiredSignatureError
+from pytest import mark as m
 
 from app.controllers.auth import JWTTokenFlow
 from app.schemas.jtw_schema import JWTBase
 from app.models.user import User
+from app.routers.utilities import actor_cache, get_current_user
 
 
 class TestAuth:
@@ -77,5 +80,35 @@ class TestAuth:
             "XRVOKuHykOtEU_jxSJFS9N6IZIH7I"
         )
         scoped_user = flow.get_scoped_user(artificially_long_scoped_auth_token)
-        assert scoped_user.id == scoped_user.user.id
-        assert scoped_user.organization is None
+        assert scoped_user.id == "user-5d78cc2a-d04c-4e9a-b9cd-bff867d128bc"
+        assert scoped_user.organization_uid is None
+
+
+@m.describe("when the same auth token is used again")
+class TestCurrentUserCache:
+
+    @pytest.fixture
+    def token(self, auth_headers):
+        actor_cache.clear()
+        return auth_headers["Authorization"].split(" ", 1)[1]
+
+    @m.it("decodes it once and hands back the same read-only actor")
+    def test_cached(self, token, monkeypatch):
+        first = get_current_user(token)
+        monkeypatch.setattr(
+            JWTTokenFlow, "decode_token", lambda token: pytest.fail("decoded again")
+        )
+        second = get_current_user(token)
+        assert second is first
+        assert (actor_cache.hits, actor_cache.misses) == (1, 1)
+        with pytest.raises(AttributeError):
+            second.organization_uid = None
+
+    @m.it("forgets it once the token expires")
+    def test_expiry(self, token, monkeypatch):
+        first = get_current_user(token)
+        ttl = JWTTokenFlow.decode_token(token)["exp"] - time()
+        later = monotonic() + ttl + 1
+        monkeypatch.setattr("app.cache.monotonic", lambda: later)
+        assert get_current_user(token) is not first
+        assert actor_cache.misses == 2
@@ -0,0 +1,36 @@
+from pytest import mark as m
+
+from app.cache import TTLCache
+
+
+@m.describe("the in-process TTL cache")
+class TestTTLCache:
+
+    @m.it("returns what was set until the ttl runs out")
+    def test_expiry(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("app.cache.monotonic", lambda: now[0])
+        cache = TTLCache(ttl=10)
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+        now[0] += 11
+        assert cache.get("key") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    @m.it("evicts the least recently used entry when full")
+    def test_lru(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    @m.it("stores nothing when the ttl is zero")
+    def test_disabled(self):
+        cache = TTLCache(ttl=0)
+        cache.set("key", "value")
+        assert cache.get("key") is None
+        assert len(cache) == 0
@@ -0,0 +1,39 @@
+from math import sqrt
+
+from pytest import mark as m
+
+from app.embeddings import HashingEmbedder
+from app.models.message_embedding import EMBEDDING_DIMENSIONS
+
+
+def _cosine(first, second) -> float:
+    return sum(a * b for a, b in zip(first, second))
+
+
+@m.describe("when embedding with the hashing embedder")
+class TestHashingEmbedder:
+
+    @m.it("embeds to unit vectors of the configured size, the same every time")
+    def test_deterministic(self):
+        [first] = HashingEmbedder().embed(["The dragon guards its hoard"])
+        [second] = HashingEmbedder().embed(["the DRAGON guards its hoard!"])
+        assert len(first) == EMBEDDING_DIMENSIONS
+        assert first == second
+        assert abs(sqrt(sum(value * value for value in first)) - 1) < 1e-9
+
+    @m.it("puts texts that share words closer together")
+    def test_similarity(self):
+        query, near, far = HashingEmbedder().embed(
+            [
+                "where does the dragon sleep",
+                "the dragon sleeps on the mountain, where the gold is",
+                "a merchant sells bread at the market",
+            ]
+        )
+        assert _cosine(query, near) > _cosine(query, far)
+
+    @m.it("leaves text with no words as the zero vector")
+    def test_empty(self):
+        assert (
+            HashingEmbedder().embed(["", "..."]) == [[0.0] * EMBEDDING_DIMENSIONS] * 2
+        )
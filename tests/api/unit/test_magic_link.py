@@ -1,8 +1,10 @@
 from pytest import mark as m, raises
 from unittest import mock
+from sqlalchemy import select
 
 from app.settings import settings
 from app.models.user import User
+from app.models.outbound_email import OutboundEmail
 from app.controllers.magic_link import MagicLinkFlow
 
 
@@ -20,7 +22,7 @@ class TestMagicLink:
         finally:
             settings.smtp_email_host = host_orig
 
-    @m.it("attempts to send an email")
+    @m.it("queues an email rather than sending it inline")
     def test_sends_email(self, db_session):
         user = User(
             email_address="some@user.com", first_name="Some", last_name="User"
@@ -31,17 +33,14 @@ class TestMagicLink:
         settings.smtp_email_user = "emailio@test.com"
         settings.smtp_email_password = "password"
         try:
-            with mock.patch("app.controllers.magic_link.smtplib.SMTP") as smtp_mock:
+            with mock.patch("app.email_outbox.smtplib.SMTP") as smtp_mock:
                 magic_link = MagicLinkFlow(db_session)
                 magic_link.send_magic_link(email_address=user.email_address)
-                smtp_mock.assert_called_once_with(
-                    settings.smtp_email_host, settings.smtp_email_port
-                )
-                smtp_mock.return_value.starttls.assert_called_once()
-                smtp_mock.return_value.login.assert_called_once_with(
-                    settings.smtp_email_user, settings.smtp_email_password
-                )
-                smtp_mock.return_value.sendmail.assert_called_once()
+                smtp_mock.assert_not_called()
+            email = db_session.scalars(select(OutboundEmail)).one()
+            assert email.to_address == user.email_address
+            assert "/auth/magic-link/login/" in email.text_body
+            assert email.sent_at is None
         finally:
             for k, v in old_settings.items():
                 setattr(settings, k, v)
@@ -0,0 +1,59 @@
+import asyncio
+
+from pytest import mark as m
+
+from app.passwords import PasswordHasher
+
+# cheap parameters, the tests are about the pool rather than argon2 itself
+CHEAP = dict(time_cost=1, memory_cost=1024, parallelism=1)
+
+
+@m.describe("when hashing passwords on the pool")
+class TestPasswordHasher:
+
+    @m.it("hashes and verifies off the event loop thread")
+    async def test_round_trip(self):
+        hasher = PasswordHasher(workers=1, **CHEAP)
+        try:
+            hashed = await hasher.hash("correct horse")
+            assert await hasher.verify("correct horse", hashed) == (True, None)
+            assert await hasher.verify("wrong horse", hashed) == (False, None)
+        finally:
+            hasher.shutdown()
+
+    @m.it("refuses users without a password")
+    async def test_no_hash(self):
+        hasher = PasswordHasher(workers=1, **CHEAP)
+        assert await hasher.verify("anything", None) == (False, None)
+
+    @m.it("returns a fresh hash when the cost settings have changed")
+    async def test_rehash(self):
+        old, new = PasswordHasher(**CHEAP), PasswordHasher(**{**CHEAP, "time_cost": 2})
+        try:
+            stale = await old.hash("correct horse")
+            valid, fresh = await new.verify("correct horse", stale)
+            assert valid and fresh
+            assert await new.verify("correct horse", fresh) == (True, None)
+            assert new.metrics.rehashed == 1
+        finally:
+            old.shutdown()
+            new.shutdown()
+
+    @m.it("queues hashes beyond the pool size and counts them")
+    async def test_bounded(self):
+        hasher = PasswordHasher(workers=2, **CHEAP)
+        try:
+            hashes = await asyncio.gather(*[hasher.hash(f"pw{i}") for i in range(6)])
+            assert len(set(hashes)) == 6
+            assert hasher.status() == {
+                "workers": 2,
+                "submitted": 6,
+                "started": 6,
+                "completed": 6,
+                "rehashed": 0,
+                "queue_depth": 0,
+                "running": 0,
+            }
+            assert len(hasher._executor._threads) == 2
+        finally:
+            hasher.shutdown()
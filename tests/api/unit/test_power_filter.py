@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+from pytest import mark as m
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.all import Message, Thread
+from app.power_filter import PowerFilterError, compile_filter, parse, parse_for_model
+
+
+def _sql(power_filter: str, ModelClass=Thread) -> str:
+    tree = parse_for_model(power_filter, ModelClass)
+    statement, predicate = compile_filter(tree, ModelClass, select(ModelClass))
+    return str(
+        statement.where(predicate).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+@m.describe("the power filter parser")
+class TestPowerFilter:
+
+    @m.it("ands terms and ors each group against them, at any depth")
+    def test_nesting(self):
+        tree = parse("name:a* (name:b (name:c name:d))")
+        assert [t.value for t in tree.terms] == ["a%"]
+        (group,) = tree.groups
+        assert [t.value for t in group.terms] == ["b"]
+        assert [t.value for t in group.groups[0].terms] == ["c", "d"]
+
+    @m.it("reads operators, quoted values and dates")
+    def test_terms(self):
+        tree = parse_for_model('name:"two words" created_at:>=2024-01-02', Thread)
+        name, created = tree.terms
+        assert (name.operator, name.value) == ("ilike", "two words")
+        assert (created.operator, created.value) == ("__ge__", date(2024, 1, 2))
+
+    @m.it("joins a related model once however often it is searched")
+    def test_related(self):
+        sql = _sql("chat:support (chat:sales name:x)")
+        assert sql.count("JOIN chat") == 1
+
+    @m.it("full text searches models that have it")
+    def test_search(self):
+        tree = parse('search:"refund*" type:user_message')
+        assert tree.terms[0].value == "refund*"
+        sql = _sql('search:"late refund" content:*late*', Message)
+        assert "search_vector @@ websearch_to_tsquery('english', 'late refund')" in sql
+
+    @m.it("rejects queries that don't fit the model")
+    @pytest.mark.parametrize(
+        "power_filter",
+        [
+            "(name:x",
+            "name:x)",
+            "()",
+            "name",
+            "password:x",
+            "bogus:x",
+            "created_at:?",
+            "search:x",
+        ],
+    )
+    def test_rejects(self, power_filter):
+        with pytest.raises(PowerFilterError):
+            parse_for_model(power_filter, Thread)
+
+    @m.it("parses each query once per model")
+    def test_cached(self):
+        query = "name:cached (name:a name:b)"
+        assert parse_for_model(query, Thread) is parse_for_model(query, Thread)
@@ -0,0 +1,23 @@
+import pytest
+from pytest import mark as m
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.query_metrics import instrument_queries, track_queries
+
+
+@m.describe("when timing statements on an instrumented engine")
+class TestInstrumentQueries:
+
+    @m.it("drops the start time of a statement that raised")
+    def test_failed_statement(self):
+        engine = instrument_queries(create_engine("sqlite://"))
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing"))
+            assert connection.info["query_start"] == []
+
+            with track_queries() as stats:
+                connection.execute(text("SELECT 1"))
+            assert stats.count == 1
+            assert connection.info["query_start"] == []
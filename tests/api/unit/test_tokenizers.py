@@ -0,0 +1,46 @@
+from base64 import b64encode
+
+from pytest import mark as m
+
+from app.tokenizers import BytePairTokenizer, EstimatingTokenizer
+
+# every byte, then merges up to "hello" and " world"
+MERGES = (b"he", b"ll", b"hell", b"hello", b" w", b"or", b" wor", b" worl", b" world")
+
+
+def _ranks() -> dict:
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    return ranks
+
+
+@m.describe("when counting tokens")
+class TestTokenizers:
+
+    @m.it("merges byte pairs by rank, never across pieces")
+    def test_bpe(self):
+        tokenizer = BytePairTokenizer(_ranks())
+        # "hello" and " world" are tokens; "xyz" stays three bytes
+        assert tokenizer.count(["hello world", "hello", "xyz", ""]) == [2, 1, 3, 0]
+        # one piece: "hello", "w", "or", "l", "d", there is no "world" without a space
+        assert tokenizer.count(["helloworld"]) == [5]
+
+    @m.it("loads a tiktoken style ranks file")
+    def test_from_file(self, tmp_path):
+        path = tmp_path / "tiny.tiktoken"
+        path.write_text(
+            "\n".join(
+                f"{b64encode(token).decode()} {rank}"
+                for token, rank in _ranks().items()
+            )
+        )
+        tokenizer = BytePairTokenizer.from_file(str(path))
+        assert tokenizer.name == "bpe-tiny"
+        assert tokenizer.count(["hello world"]) == [2]
+
+    @m.it("estimates without a vocabulary")
+    def test_estimate(self):
+        tokenizer = EstimatingTokenizer()
+        assert tokenizer.count(["", "hello", "hello world", "12345"]) == [0, 1, 2, 2]
+        assert tokenizer.count(["internationalization"]) == [3]
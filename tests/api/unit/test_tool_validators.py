@@ -0,0 +1,36 @@
+import pytest
+from jsonschema.exceptions import SchemaError
+from pytest import mark as m
+
+from app.tool_validators import arguments_schema, compile_validator
+
+PARAMETERS = {
+    "type": "object",
+    "properties": {"city": {"type": "string"}},
+    "required": ["city"],
+}
+
+
+@m.describe("when compiling tool schemas")
+class TestToolValidators:
+
+    @m.it("finds the arguments schema in any OAI tool definition shape")
+    def test_arguments_schema(self):
+        definition = {"name": "weather", "parameters": PARAMETERS}
+        assert arguments_schema(PARAMETERS) == PARAMETERS
+        assert arguments_schema(definition) == PARAMETERS
+        assert (
+            arguments_schema({"type": "function", "function": definition}) == PARAMETERS
+        )
+
+    @m.it("validates arguments against the compiled schema")
+    def test_validate(self):
+        validator = compile_validator({"name": "weather", "parameters": PARAMETERS})
+        assert validator.is_valid({"city": "Oslo"})
+        assert not validator.is_valid({"town": "Oslo"})
+        assert compile_validator({}).is_valid({"anything": 1})
+
+    @m.it("refuses a schema that isn't one")
+    def test_invalid(self):
+        with pytest.raises(SchemaError):
+            compile_validator({"type": "object", "required": "city"})
@@ -1,17 +1,30 @@
+from contextlib import contextmanager
+
 import pytest
 from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
 from app.routers.utilities import _create_engine
 from app.app import app
-from app.routers.utilities import get_db_session
-from app.models.all import Base
+from app.routers.utilities import (
+    get_db_session,
+    get_message_events,
+    get_session_factory,
+)
+from app.message_events import MessageEvents
+from app.models.all import Base, Organization, User
+from app.controllers.auth import JWTTokenFlow
+from app.query_metrics import track_queries
 
 
 @pytest.fixture
 def db_session(request):
     function_ = request.node.name
-    engine = _create_engine(database="langstory_test")
+    # every pooled connection needs the schema, not just the one that creates it
+    engine = _create_engine(
+        database="langstory_test",
+        connect_args={"options": f"-csearch_path={function_},public"},
+    )
     with engine.begin() as connection:
         for statement in (
             text(f"CREATE SCHEMA IF NOT EXISTS {function_}"),
@@ -32,4 +45,63 @@ def override_get_db(db_session):
 @pytest.fixture
 def override_app(override_get_db):
     app.dependency_overrides[get_db_session] = lambda: override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: sessionmaker(
+        bind=override_get_db.get_bind()
+    )
     return app
+
+
+@pytest.fixture
+async def message_events(override_app, override_get_db):
+    """a listener of its own, loading events through the test schema"""
+    events = MessageEvents(
+        session_factory=sessionmaker(bind=override_get_db.get_bind()),
+        database="langstory_test",
+    )
+    override_app.dependency_overrides[get_message_events] = lambda: events
+    yield events
+    await events.stop()
+
+
+@pytest.fixture
+def org_member(db_session):
+    """a user that belongs to the default organization"""
+    org = Organization.default(db_session)
+    user = User(
+        email_address="member@langstory.test", first_name="Org", last_name="Member"
+    ).create(db_session)
+    db_session.add(user)
+    user.organizations.append(org)
+    db_session.commit()
+    db_session.refresh(user)
+    return user, org
+
+
+@pytest.fixture
+def auth_headers(db_session, org_member):
+    """bearer headers for org_member scoped to their organization"""
+    user, org = org_member
+    flow = JWTTokenFlow(db_session)
+    refresh = flow.get_refresh_token(user)
+    token = flow.get_auth_token(refresh, org=org.id).token
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def max_queries():
+    """fail if the block runs more SQL statements than allowed
+    Example:
+        with max_queries(3):
+            await client.get("/projects/", headers=auth_headers)
+    """
+
+    @contextmanager
+    def _max_queries(limit: int):
+        with track_queries() as stats:
+            yield stats
+        assert stats.count <= limit, (
+            f"expected at most {limit} queries, ran {stats.count}; "
+            f"slowest: {stats.slowest_statement}"
+        )
+
+    return _max_queries